@@ -2,10 +2,12 @@
 
 import sys
 import os
+import time
 import pickle
 import shutil
 import datetime
 import traceback
+import multiprocessing
 import functools
 import argparse
 from pathlib import Path
@@ -20,7 +22,22 @@ from ui import ui_CamtrawlBrowser
 import trimDeploymentDlg
 import exportVideoDlg
 import progressDlg
+import imageLoader
+import frameCache
+import frameStore
+import frameTable
+import pipelineStats
+import playbackEngine
+import diskCache
+import imageEnhancer
+import frameCompositor
+import fileIndex
+import videoExporter
+import batchExport
+import gridView
+import qualityGovernor
 from MaceFunctions import CamtrawlMetadata
+from MaceFunctions.QImageViewer.QImageViewer import QImageViewer
 import camseldlg
 
 class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
@@ -28,20 +45,41 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
     #  define class signals
     exportProgress = pyqtSignal(int)
 
-    def __init__(self, resetWindowPosition=False, parent=None):
+    def __init__(self, resetWindowPosition=False, decodeWorkers=None, parent=None):
         super(CamtrawlBrowser, self).__init__(parent)
         self.setupUi(self)
 
         #  Set some default properties
         self.enhanceCalExportImages = True
-        self.leftDateTimeLabel = None
-        self.rightDateTimeLabel = None
+        self.hudItems = {}
+        self.hudText = {}
+        self.frameTable = None
+        self.frameTableBuilder = None
+        self.imageIndex = frameTable.ImageIndex()
         self.leftCamera = None
         self.rightCamera = None
         self.lastNumberLoaded = -1
-        self.maxQueuedImages = 2
-        self.leftImageQueue = []
-        self.rightImageQueue = []
+        self.pendingFrame = None
+        self.lastPrefetchStride = 0
+        self.skewThreshold = 0.05
+        self.skewCount = 0
+        self.requestSequence = 0
+        self.displayedSequence = -1
+        self.cacheValidSequence = 0
+        self.prefetchPending = set()
+        self.displayedNumber = {'left':None, 'right':None}
+        self.displayedScale = {'left':1, 'right':1}
+        self.displayedFromStore = {'left':False, 'right':False}
+        self.displayedEnhanceKey = {'left':None, 'right':None}
+        self.enhancers = {}
+        self.enhancement = {}
+        self.enhanceProbe = None
+        self.upgradePending = False
+        self.fullImageSize = {}
+        self.videoExporter = None
+        self.exportText = ''
+        self.snapshotCompositor = None
+        self.snapshotSizes = None
 
         #  create an instance of the CamtrawlMetadata class to handle reading our metadata database
         self.metadata = CamtrawlMetadata.CamTrawlMetadata()
@@ -99,6 +137,138 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         self.dataDir = self.appSettings.value('datadir', QDir.home().path())
         self.copyDir = self.appSettings.value('copydir', QDir.home().path())
 
+        #  long video exports are encoded in parallel processes and joined with ffmpeg.
+        #  By default a core is left for the browser while exporting.
+        self.exportProcesses = int(self.appSettings.value('exportprocesses',
+                max(1, multiprocessing.cpu_count() - 1)))
+        self.ffmpegPath = self.appSettings.value('ffmpegpath', '')
+
+        #  get the number of image decoding threads. The command line argument
+        #  takes precedence over the stored setting.
+        if decodeWorkers is None:
+            decodeWorkers = int(self.appSettings.value('decodeworkers', 2))
+        else:
+            self.appSettings.setValue('decodeworkers', decodeWorkers)
+
+        #  create the image loader which reads and decodes images off the GUI thread
+        self.imageLoader = imageLoader.ImageLoader(nWorkers=decodeWorkers, parent=self)
+        self.imageLoader.frameLoaded.connect(self.displayFrame)
+        self.imageLoader.queueChanged.connect(self.updateQueueDepth)
+
+        #  create the prefetcher and the decoded frame cache. The cache is shared by
+        #  both viewers and the exporters and holds the prefetched frames and the
+        #  recently viewed frames.
+        self.prefetchFrames = int(self.appSettings.value('prefetchframes', 6))
+        self.prefetcher = frameCache.Prefetcher(nAhead=self.prefetchFrames)
+        self.frameCache = frameCache.FrameCache(maxMB=int(self.appSettings.value(
+                'framecachemb', 512)))
+
+        #  deployments on network shares are read through a local disk cache. The
+        #  diskcache setting can be 'auto' (network paths only), 'on', or 'off'.
+        self.diskCacheMode = str(self.appSettings.value('diskcache', 'auto')).lower()
+        cacheDir = self.appSettings.value('diskcachedir', QStandardPaths.writableLocation(
+                QStandardPaths.StandardLocation.CacheLocation) + os.sep + 'deployments')
+        self.diskCache = None
+        self.diskCachePrefetcher = None
+        self.diskCacheFrames = int(self.appSettings.value('diskcacheframes', 50))
+        self.metadataDir = None
+        self.localMetadataSource = None
+        if self.diskCacheMode != 'off':
+            try:
+                self.diskCache = diskCache.DiskCache(cacheDir,
+                        maxMB=int(self.appSettings.value('diskcachemb', 10240)))
+            except:
+                #  we can't use the cache directory
+                self.diskCache = None
+
+        #  images can be decoded at reduced resolution (or shown as thumbnails) while
+        #  scrubbing. When the slider has been idle for the settle delay (in ms), the
+        #  settle timer will reload the images at full resolution.
+        self.reducedDecode = self.appSettings.value('reduceddecode', True, type=bool)
+        self.settleDelay = int(self.appSettings.value('settledelay', 250))
+        self.settleTimer = QTimer(self)
+        self.settleTimer.setSingleShot(True)
+        self.settleTimer.timeout.connect(self.upgradeImages)
+
+        #  the quality governor lowers the decode scale, skips enhancements and widens
+        #  the prefetch window while scrubbing if frames are missing their deadline.
+        #  The deadline when scrubbing (in ms) is set by the scrubdeadline setting and
+        #  when playing back is the playback frame interval.
+        self.qualityGovernor = qualityGovernor.QualityGovernor()
+        self.qualityGovernor.setEnabled(self.appSettings.value('qualitygovernor', True,
+                type=bool))
+        self.scrubDeadline = int(self.appSettings.value('scrubdeadline', 50)) / 1000.
+        self.enhanceSkipped = {}
+
+        #  the thumbnail and review stores are written to the local cache, not the
+        #  deployment, since deployments are often on read only or shared drives
+        self.storeDir = self.appSettings.value('storedir', QStandardPaths.writableLocation(
+                QStandardPaths.StandardLocation.CacheLocation) + os.sep + 'stores')
+
+        #  thumbnails are generated in the background when a deployment is opened
+        #  and are displayed while the user is dragging the slider
+        self.thumbnailWidth = int(self.appSettings.value('thumbnailwidth', 192))
+        self.thumbnailStores = {}
+        self.thumbnailBuilder = None
+        self.thumbnailLabel = QLabel(self)
+        self.statusBar.addPermanentWidget(self.thumbnailLabel)
+
+        #  the image files are validated in the background when a deployment is opened.
+        #  Missing, empty and truncated files are marked on the slider and skipped.
+        #  Checking for truncated files reads every file so by default it is only done
+        #  for deployments that aren't on a network share. Set validatecontents to
+        #  true or false to override this.
+        self.validateContents = str(self.appSettings.value('validatecontents',
+                'auto')).lower()
+        self.fileIndex = None
+        self.badRanges = []
+        self.fileIndexBuilder = None
+        self.fileIndexLabel = QLabel(self)
+        self.statusBar.addPermanentWidget(self.fileIndexLabel)
+
+        #  deployments can be prepared for review which stores display resolution
+        #  frames for each camera. The widths are a comma separated list which
+        #  QSettings may return as a list.
+        reviewWidths = self.appSettings.value('reviewwidths', '1280')
+        if not isinstance(reviewWidths, (list, tuple)):
+            reviewWidths = str(reviewWidths).split(',')
+        self.reviewWidths = [int(w) for w in reviewWidths if str(w).strip()]
+        if not self.reviewWidths:
+            self.reviewWidths = [1280]
+        self.reviewWidths.sort()
+        self.reviewStores = {}
+        self.reviewBuilder = None
+        self.reviewLabel = QLabel(self)
+        self.statusBar.addPermanentWidget(self.reviewLabel)
+        self.actionPrepareReview = QAction('Prepare for Review...', self)
+        self.actionPrepareReview.setEnabled(False)
+        self.actionPrepareReview.triggered.connect(self.prepareForReview)
+        self.menuFile.insertAction(self.actionExit, self.actionPrepareReview)
+
+        #  add labels to the status bar to display the decode queue depth and cache stats
+        self.queueLabel = QLabel(self)
+        self.statusBar.addPermanentWidget(self.queueLabel)
+        self.cacheLabel = QLabel(self)
+        self.statusBar.addPermanentWidget(self.cacheLabel)
+        self.updateQueueDepth(0)
+        self.updateCacheStats()
+
+        #  create the pipeline stats collector and its panel. Timings are only
+        #  collected while the panel is shown or a log is being written.
+        self.pipelineStats = pipelineStats.PipelineStats(parent=self)
+        self.pipelineStats.watchViewer('left', self.gvLeft.viewport())
+        self.pipelineStats.watchViewer('right', self.gvRight.viewport())
+        self.statsPanel = pipelineStats.PipelineStatsPanel(self.pipelineStats, parent=self)
+        self.statsPanel.logToggled.connect(self.togglePipelineLog)
+        self.statsPanel.visibilityChanged.connect(self.updatePipelineStatsState)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.statsPanel)
+        self.statsPanel.hide()
+        self.menuView = QMenu('View', self.menuBar)
+        self.actionPipelineStats = self.statsPanel.toggleViewAction()
+        self.actionPipelineStats.setShortcut(QKeySequence('F12'))
+        self.menuView.addAction(self.actionPipelineStats)
+        self.menuBar.addAction(self.menuView.menuAction())
+
         #  set a couple of button styles for the playback button
         self.green = "QPushButton { background-color: rgb(77,223,77)}"
         self.gray = "QPushButton { background-color: rgb(150,150,150)}"
@@ -132,9 +302,34 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         except:
             pass
 
-        #  create the playback timer
+        #  create the playback timer. Playback is paced by the image times and the
+        #  timer is restarted for each frame.
         self.playTimer = QTimer(self)
+        self.playTimer.setSingleShot(True)
         self.playTimer.timeout.connect(self.moveSlider)
+        self.playbackClock = None
+        self.playbackLabel = QLabel(self)
+        self.statusBar.addPermanentWidget(self.playbackLabel)
+
+        #  playback can either hold real time by dropping frames or show every frame
+        self.actionPlayEveryFrame = QAction('Play Every Frame', self)
+        self.actionPlayEveryFrame.setCheckable(True)
+        self.actionPlayEveryFrame.setChecked(self.appSettings.value('playbackmode',
+                playbackEngine.PlaybackClock.REAL_TIME) ==
+                playbackEngine.PlaybackClock.EVERY_FRAME)
+        self.actionPlayEveryFrame.toggled.connect(self.setPlaybackMode)
+        self.menuView.addAction(self.actionPlayEveryFrame)
+
+        #  the grid view shows all of the deployment's cameras. Its images are loaded
+        #  along with the left and right images by the same decode workers.
+        self.gridView = gridView.GridViewDlg(parent=self)
+        self.gridView.closed.connect(self.gridViewClosed)
+        self.actionGridView = QAction('Grid View', self)
+        self.actionGridView.setCheckable(True)
+        self.actionGridView.setShortcut(QKeySequence('Ctrl+G'))
+        self.actionGridView.setEnabled(False)
+        self.actionGridView.toggled.connect(self.showGridView)
+        self.menuView.addAction(self.actionGridView)
 
         #  create the queue process timer
         self.queueTimer = QTimer(self)
@@ -323,11 +518,27 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         start and end frame numbers.
         '''
 
-        def setVideoSize(size):
-            #  this method just makes sure the size is divisible by 4
-            #  which some codecs require
-            newSize = round(size / 4.) * 4
-            return newSize
+        #  only one video can be exported at a time
+        if self.videoExporter is not None:
+            QMessageBox.warning(self, 'Export Video', 'A video is already being exported.')
+            return
+
+        #  get the image numbers we're exporting
+        numbers = videoExporter.getExportNumbers(self.imageIndex, startFrame, endFrame,
+                frameStep)
+
+        #  long exports are split into segments, which are encoded in parallel and can
+        #  be resumed, only if ffmpeg is available to join them
+        ffmpeg = videoExporter.findFFmpeg(self.ffmpegPath)
+        if ffmpeg is None and len(numbers) > videoExporter.CHECKPOINT_FRAMES:
+            ok = QMessageBox.question(self, 'Export Video', 'ffmpeg wasn\'t found so ' +
+                    'the video will be encoded in a single process and the export ' +
+                    'can\'t be resumed if it is cancelled. Install ffmpeg or set its ' +
+                    'path in the ffmpegpath setting to encode long videos in parallel. ' +
+                    'Do you want to export the video anyway?',
+                    QMessageBox.StandardButton.Yes|QMessageBox.StandardButton.No)
+            if (ok != QMessageBox.StandardButton.Yes):
+                return
 
         #  get the name of the video we are exporting
         videoFilename = QFileDialog.getSaveFileName(self, "Export video", self.copyDir,
@@ -359,109 +570,100 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         #  and multiply by the speed multiplier for the final rate
         videoFPS = self.videoBaseRate * multiplier
 
-        #  set some other export props
-        self.exportHUD = showHud
-        self.frameStep = frameStep
-
-        #  set the video frame bounds
-        self.exportFrame = startFrame
-        self.exportEndFrame = endFrame
-        self.exportedFrames = 0
-        self.exportTotalFrames = round((endFrame - startFrame) / float(frameStep))
-
         #  determine the exported video dimensions
-        self.videoLeftSize = [setVideoSize(self.gvLeft.renderedWidth()),
-                setVideoSize(self.gvLeft.renderedHeight())]
-        self.videoRightSize = [setVideoSize(self.gvRight.renderedWidth()),
-                setVideoSize(self.gvRight.renderedHeight())]
-        videoWidth = self.videoLeftSize[0] + self.videoRightSize[0]
-        videoHeight = self.videoLeftSize[1]
-
-        #  create the video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.videoWriter = cv2.VideoWriter(videoFilename, fourcc,
-                videoFPS, (videoWidth, videoHeight))
-
-        #  check that we were able to open the file
-        if not self.videoWriter.isOpened():
-            QMessageBox.error(self, 'Unable to open video',
-                    'Unable to open video file ' + videoFilename)
-            return
+        videoLeftSize = [videoExporter.setVideoSize(self.gvLeft.renderedWidth()),
+                videoExporter.setVideoSize(self.gvLeft.renderedHeight())]
+        videoRightSize = [videoExporter.setVideoSize(self.gvRight.renderedWidth()),
+                videoExporter.setVideoSize(self.gvRight.renderedHeight())]
+
+        #  describe the export. The exporter renders the frames itself so the images,
+        #  times and enhancements are gathered here. The HUD reports the enhancements
+        #  that are actually applied to the exported frames.
+        enhancers = {viewer:self.getEnhancer(viewer) for viewer in ['left', 'right']}
+        uncompiled = [self.getViewerCamera(viewer) for viewer in enhancers if
+                enhancers[viewer] is None and self.getViewer(viewer).image.enhancementsEnabled]
+        if uncompiled:
+            ok = QMessageBox.question(self, 'Export Video', 'The image enhancements for ' +
+                    ', '.join(uncompiled) + ' can\'t be applied by the video exporter. ' +
+                    'Do you want to export the video without them?',
+                    QMessageBox.StandardButton.Yes|QMessageBox.StandardButton.No)
+            if (ok != QMessageBox.StandardButton.Yes):
+                return
 
-        #  update the UI elements
-        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        sides = []
+        for viewer, size in [['left', videoLeftSize], ['right', videoRightSize]]:
+            camera = self.getViewerCamera(viewer)
+            enhancer = enhancers[viewer]
+            if enhancer is not None:
+                enhanceText = 'Enhancements: On'
+            else:
+                enhanceText = 'Enhancements: Off'
+            sides.append(videoExporter.ExportSide(camera, size,
+                    [videoExporter.getImageFile(self.metadata, self.dataDir, camera, n)
+                    for n in numbers],
+                    [videoExporter.getTimeString(self.metadata, camera, n) for n in numbers],
+                    enhancer=enhancer, fullSize=self.fullImageSize.get(camera),
+                    enhanceText=enhanceText))
+        job = videoExporter.ExportJob(videoFilename, videoFPS, numbers, sides,
+                showHud=showHud)
+
+        #  start the exporter
+        self.videoExporter = videoExporter.VideoExporter(job, cache=self.imageLoader.diskCache,
+                nProcesses=self.exportProcesses, ffmpeg=ffmpeg, parent=self)
+        self.videoExporter.progress.connect(self.exportProgress)
+        self.videoExporter.utilization.connect(self.exportUtilization)
+        self.videoExporter.exportDone.connect(self.videoExportDone)
+        self.videoExporter.start()
+
+        #  update the UI elements. The export runs in the background so the user can
+        #  keep working.
         self.statusBar.showMessage('Exporting Video...')
-        self.abortVideo = False
-        self.progressDlg.setText("Exporting video " + videoFilename)
+        self.exportText = "Exporting video " + videoFilename
+        self.progressDlg.setText(self.exportText)
         self.exportProgress.emit(0)
         self.progressDlg.show()
 
-        #  we use a timer to create frame writing events so we can easily
-        #  cancel the operation
-        self.videoTimer = QTimer(self)
-        self.videoTimer.setSingleShot(True)
-        self.videoTimer.timeout.connect(self.exportVideoFrame)
-        self.videoTimer.start(0)
+
+    def exportUtilization(self, utilization):
+        '''
+        exportUtilization shows how busy each of the export pipeline stages is
+        in the progress dialog. The slowest stage will be near 100%.
+        '''
+        stageText = '  '.join(['%s %d%%' % (stage.capitalize(), round(utilization[stage] * 100))
+                for stage in videoExporter.STAGES])
+        self.progressDlg.setText(self.exportText + '\n' + stageText)
 
 
     def cancelExport(self):
         '''
         cancelExport is set when the user clicks the cancel button
-        on the export video progress dialog. It sets the abortVideo
-        state to true which results in the export stopping at the
-        next export timer event.
+        on the export video progress dialog. It tells the exporter
+        to stop after the frame it is working on.
         '''
-        self.abortVideo = True
+        if self.videoExporter is not None:
+            self.videoExporter.stop()
 
 
-    def exportVideoFrame(self):
-
-        #  advance the slider to update the images
-        nextIndex = self.metadata.imageNumbers.index(self.exportFrame)
-        self.imageSlider.setValue(nextIndex)
+    def videoExportDone(self, completed, message):
+        '''
+        videoExportDone is called when the video exporter finishes
+        '''
+        self.videoExporter.wait()
+        self.videoExporter = None
 
-        pctExported = round(self.exportedFrames / float(self.exportTotalFrames)  * 100.)
-        self.exportProgress.emit(pctExported)
+        #  clean up the UI elements
+        self.imageSlider.removeTick('Start Video')
+        self.imageSlider.removeTick('End Video')
+        self.progressDlg.setText("")
+        self.exportProgress.emit(0)
+        self.progressDlg.hide()
 
-        #  render the images and combine
-        if self.exportHUD:
-            rightFrame = self.gvRight.renderView(width=self.videoRightSize[0],
-                    height=self.videoRightSize[1], asNDarray=True)
-            leftFrame = self.gvLeft.renderView(width=self.videoLeftSize[0],
-                    height=self.videoLeftSize[1], asNDarray=True)
+        #  report the export stats
+        if completed:
+            self.statusBar.showMessage(message, 10000)
         else:
-            rightFrame = self.gvRight.renderScene(width=self.videoRightSize[0],
-                    height=self.videoRightSize[1], asNDarray=True)
-            leftFrame = self.gvLeft.renderScene(width=self.videoLeftSize[0],
-                    height=self.videoLeftSize[1], asNDarray=True)
-        combinedFrame = cv2.hconcat([leftFrame, rightFrame])
-
-        #  remove the alpha layer
-        combinedFrame = cv2.cvtColor(combinedFrame, cv2.COLOR_BGRA2BGR)
-
-        #  write the frame
-        self.videoWriter.write(combinedFrame)
-
-        #  increment the counter
-        self.exportFrame += self.frameStep
-        self.exportedFrames += 1
-
-        if self.exportFrame > self.exportEndFrame or self.abortVideo:
-            #  we're done with this video
-            self.videoWriter.release()
-
-            #  clean up the UI elements
-            self.imageSlider.removeTick('Start Video')
-            self.imageSlider.removeTick('End Video')
-            self.progressDlg.setText("")
-            self.exportProgress.emit(0)
-            self.progressDlg.hide()
             self.statusBar.clearMessage()
-            QApplication.restoreOverrideCursor()
-
-        else:
-            #  we're still going - reset the timer
-            self.videoTimer.start(1)
+            QMessageBox.warning(self, 'Export Video', message)
 
 
     def showTrimDeployment(self):
@@ -482,6 +684,20 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
 
             QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
 
+            #  stop generating thumbnails while we delete images
+            self.stopThumbnails()
+            self.stopReviewStores()
+            self.stopFrameTable()
+            self.stopFileIndex()
+
+            #  images are deleted relative to the metadata path so if we're working on
+            #  a local copy of the metadata, sync it and switch to the deployment's copy
+            if self.localMetadataSource is not None:
+                self.metadata.close()
+                self.syncLocalMetadata()
+                self.metadataDir = self.dataDir
+                self.metadata.open(self.metadataDir)
+
             #  set the clipped images to "discarded" in the metadata database
             self.statusBar.showMessage('Modifying metadata database...')
             self.metadata.setDiscarded(self.metadata.startImage, startFrame - 1)
@@ -494,6 +710,7 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
             #  reload the newly modified metadata
             self.statusBar.showMessage('Querying new metadata database...')
             self.metadata.query()
+            self.imageIndex.update(self.metadata.imageNumbers)
 
             #  and re-load the newly modified deployment
             self.loadDeployment()
@@ -517,9 +734,42 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
             rightAdjustments = self.gvRight.image.getParameters()
             rightAdjustments = pickle.dumps(rightAdjustments,2)
             self.metadata.setImageAdjustments(self.rightCamera, rightAdjustments)
+        if self.actionGridView.isChecked():
+            self.saveGridAdjustments()
 
-        #  close our metadata file
+        #  close our metadata file and copy it back to the deployment if we were
+        #  working on a local copy
         self.metadata.close()
+        if self.localMetadataSource is not None:
+            self.syncLocalMetadata()
+
+
+    def syncLocalMetadata(self):
+        '''
+        syncLocalMetadata copies the local copy of the metadata database back to the
+        deployment. If the deployment's copy was changed by someone else since it was
+        copied, the user is asked if it should be overwritten.
+        '''
+        source = self.localMetadataSource
+        self.localMetadataSource = None
+        try:
+            conflicts = self.diskCache.syncMetadata(source)
+            if conflicts:
+                QApplication.restoreOverrideCursor()
+                ok = QMessageBox.question(self, 'Save Metadata', 'The metadata database ' +
+                        'for this deployment (' + ', '.join(conflicts) + ') was changed ' +
+                        'by someone else while you were working on a local copy. Do you ' +
+                        'want to overwrite it with your changes? If you choose No, your ' +
+                        'changes are kept in the local cache and you will be asked again ' +
+                        'the next time you open this deployment.',
+                        QMessageBox.StandardButton.Yes|QMessageBox.StandardButton.No)
+                if (ok == QMessageBox.StandardButton.Yes):
+                    self.diskCache.syncMetadata(source, force=True)
+        except Exception as e:
+            QMessageBox.warning(self, 'Save Metadata', 'Unable to copy the local metadata ' +
+                    'database back to the deployment: ' + str(e) + '. Your changes are ' +
+                    'kept in the local cache.')
+        self.diskCache.releaseMetadata(source)
 
 
     def closeEvent(self, event):
@@ -530,6 +780,19 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
 
         #  stop the timers
         self.playTimer.stop()
+        self.queueTimer.stop()
+
+        #  stop the image loader and thumbnail threads and any export
+        if self.videoExporter is not None:
+            self.videoExporter.stop()
+            self.videoExporter.wait()
+        self.imageLoader.stop()
+        self.stopThumbnails()
+        self.stopReviewStores()
+        self.stopFrameTable(wait=True)
+        self.stopFileIndex()
+        self.stopDiskCache()
+        self.pipelineStats.stopLog()
 
         #  store the image adjustment parameters in the deployment metadata database
         self.closeDeployment()
@@ -571,8 +834,15 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
 
             #  if we have a deployment open, make sure we update the image settings
             #  in the metadata file before closing it.
+            self.stopThumbnails()
+            self.stopReviewStores()
+            self.stopFrameTable()
+            self.stopFileIndex()
+            self.actionGridView.setChecked(False)
+            self.actionGridView.setEnabled(False)
             if (self.rightCamera or self.leftCamera):
                 self.closeDeployment()
+            self.stopDiskCache()
 
             #  clear the viewers and reset some other vars/props
             self.rightCamera = None
@@ -581,13 +851,25 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
             self.gvLeft.removeAllHudItems()
             self.gvLeft.resetTransform()
             self.leftCamLabel = []
-            self.leftImageQueue = []
             self.gvRight.clearViewer()
             self.gvRight.removeAllHudItems()
             self.gvRight.resetTransform()
             self.rightCamLabel = []
-            self.rightImageQueue = []
+            self.hudItems = {}
+            self.hudText = {}
+            self.pendingFrame = None
             self.lastNumberLoaded = -1
+            self.displayedSequence = -1
+            self.displayedNumber = {'left':None, 'right':None}
+            self.displayedScale = {'left':1, 'right':1}
+            self.displayedEnhanceKey = {'left':None, 'right':None}
+            self.upgradePending = False
+            self.skewCount = 0
+            self.fullImageSize = {}
+            self.enhanceSkipped = {}
+            self.qualityGovernor.reset()
+            self.applyQualityLevel()
+            self.resetFrameCache()
 
             #  disable the GUI elements
             self.imageSlider.setEnabled(False)
@@ -597,6 +879,8 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
             self.pbTrim.setEnabled(False)
             self.pbExportImage.setEnabled(False)
             self.pbExForCal.setEnabled(False)
+            self.stopPlayback()
+            self.actionPrepareReview.setEnabled(False)
             self.gbPlay.setEnabled(False)
             self.gbMarks.setEnabled(False)
             self.pbExportVideo.setEnabled(False)
@@ -606,20 +890,14 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
                 QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
                 self.statusBar.showMessage('Reading metadata...')
                 QApplication.processEvents()
-                self.metadata.open(self.dataDir)
+                self.startDiskCache()
+                self.metadata.open(self.metadataDir)
                 self.metadata.query()
+                self.imageIndex.update(self.metadata.imageNumbers)
                 self.metadata.updateDeployentMetadata()
 
-                #  determine the base video speed. First get the average interval
-                camIntervals = self.metadata.getIntervalAverage()
-
-                #  then determine the minimum interval (which is the maximum rate)
-                minInterval = 9999999
-                for camera in camIntervals:
-                    if minInterval > camIntervals[camera]:
-                        minInterval = camIntervals[camera]
-                #  and then compute FPS
-                self.videoBaseRate = 1.0 / minInterval
+                #  determine the base video speed
+                self.videoBaseRate = videoExporter.getVideoBaseRate(self.metadata)
 
                 #  and load the deployment
                 self.loadDeployment()
@@ -651,8 +929,13 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
             destPath = (exportDir + os.path.sep + imagePrefix + str(frameCount) + '.' + imageExt)
 
             if enhance:
-                #  load the image using the viewer which will apply enhancements if enabled
-                viewObj.setImageFromFile(sourcePath)
+                #  load the image using the viewer which will apply enhancements if enabled.
+                #  The image is taken from the frame cache if we have it.
+                image, scale = self.getCachedImage(camName, frame, 1)
+                if image is None:
+                    image = imageLoader.decodeImage(sourcePath)
+                    self.frameCache.put(self.getCacheKey(camName, frame, 1), image)
+                viewObj.setImageFromNumpy(image)
                 viewObj.saveImage(destPath)
             else:
                 #  we're not applying enhancements so just copy the file
@@ -674,6 +957,7 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
 
         #  update the metadata (probably don't need to do this)
         self.metadata.query()
+        self.imageIndex.update(self.metadata.imageNumbers)
 
         #  get all of the frames with marks
         frames = self.metadata.marks.keys()
@@ -786,6 +1070,7 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         if (adjustments):
             adjustments = pickle.loads(adjustments)
             self.gvRight.image.setParameters(adjustments)
+        self.enhancement = {}
 
         #  update the GUI elements
         self.deployment.setText(self.dataDir.split(os.path.sep)[-1])
@@ -803,6 +1088,8 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         self.pbTrim.setEnabled(True)
         self.pbExportImage.setEnabled(True)
         self.pbExForCal.setEnabled(True)
+        self.actionPrepareReview.setEnabled(True)
+        self.actionGridView.setEnabled(True)
         self.gbPlay.setEnabled(True)
         self.gbMarks.setEnabled(True)
         self.pbExportVideo.setEnabled(True)
@@ -810,7 +1097,10 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         #  add the mark ticks to the scrollbar
         self.imageSlider.removeAllTicks()
         for markLoc in self.metadata.marks:
-            markIdx = self.metadata.imageNumbers.index(markLoc)
+            if markLoc not in self.imageIndex:
+                #  the marked image has been trimmed
+                continue
+            markIdx = self.imageIndex.index(markLoc)
             self.imageSlider.addTick(str(markLoc), markIdx, padding=10,
                     thickness=3, color=[10,10,240])
 
@@ -825,10 +1115,321 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
                 self.rightCamera, size=11, color=[0,250,0], alpha=150,
                 halign='center', valign='top')
 
+        #  create the per frame HUD text - the text is set as each frame is displayed
+        if len(self.hudItems) == 0:
+            self.createFrameHud()
+
         self.changeImage()
         self.statusBar.clearMessage()
         QApplication.restoreOverrideCursor()
 
+        #  build the per frame display data and start generating thumbnails (if needed)
+        self.startFrameTable()
+        self.startFileIndex()
+        self.startThumbnails()
+        self.openReviewStores()
+
+
+    def startThumbnails(self):
+        '''
+        startThumbnails opens the thumbnail stores for each camera and starts the
+        thumbnail builder for any stores that are incomplete. The stores are packed
+        files in the local store directory (see getStoreDir). Since the builder saves
+        its progress as it goes, an interrupted build will resume where it left off.
+        '''
+
+        self.thumbnailStores = {}
+        self.thumbnailBuilder = frameStore.FrameStoreBuilder(self.thumbnailWidth, parent=self)
+        self.thumbnailBuilder.progress.connect(self.updateThumbnailProgress)
+
+        for camera in self.cameras:
+            imageNumbers = list(self.metadata.imageData[camera].keys())
+            imageNumbers.sort()
+            store = frameStore.FrameStore(self.getStoreDir(camera),
+                    'thumbnails_' + str(self.thumbnailWidth))
+            store.open(imageNumbers=imageNumbers)
+            self.thumbnailStores[camera] = store
+
+            #  complete stores are still verified in case images were replaced
+            imagePaths = [self.getImageFile(camera, n) for n in imageNumbers]
+            self.thumbnailBuilder.addJob(store, imageNumbers, imagePaths)
+
+        if len(self.thumbnailBuilder.jobs) > 0:
+            self.thumbnailBuilder.start()
+        else:
+            self.thumbnailLabel.setText('')
+
+
+    def stopThumbnails(self):
+        '''
+        stopThumbnails stops the thumbnail builder and closes the thumbnail stores
+        '''
+        if self.thumbnailBuilder is not None:
+            self.thumbnailBuilder.stop()
+            self.thumbnailBuilder = None
+        for camera in self.thumbnailStores:
+            self.thumbnailStores[camera].close()
+        self.thumbnailStores = {}
+        self.thumbnailLabel.setText('')
+
+
+    def updateThumbnailProgress(self, nDone, total):
+        '''
+        updateThumbnailProgress updates the thumbnail status bar label
+        '''
+        if nDone >= total:
+            self.thumbnailLabel.setText('')
+        else:
+            self.thumbnailLabel.setText('Thumbnails: ' +
+                    str(round(nDone / float(total) * 100.)) + '%')
+
+
+    def getStoreDir(self, camera):
+        '''
+        getStoreDir returns the directory the provided camera's frame stores are
+        written to. The stores are kept under the deployment's cache key so
+        deployments with the same name don't share stores.
+        '''
+        return os.path.join(self.storeDir, diskCache.deploymentKey(self.dataDir), camera)
+
+
+    def getThumbnail(self, camera, number):
+        '''
+        getThumbnail returns a list containing the thumbnail for the provided camera and
+        image number and the ratio of the full image size to the thumbnail size. The
+        thumbnail will be None if it hasn't been generated.
+        '''
+        try:
+            store = self.thumbnailStores[camera]
+            return [store.getFrame(number), store.scale]
+        except KeyError:
+            return [None, 1]
+
+
+    def startDiskCache(self):
+        '''
+        startDiskCache sets up the local disk cache for the deployment if it is on a
+        network share (or the cache is always on). Image files are read through the
+        cache, files ahead of the viewing position are copied in the background, and
+        the metadata database is copied locally. self.metadataDir is set to the
+        directory the metadata should be opened from and self.localMetadataSource is
+        set to the deployment the local copy is synced to when it is closed.
+        '''
+
+        self.metadataDir = self.dataDir
+        if self.diskCache is None:
+            return
+        if self.diskCacheMode == 'auto' and not diskCache.isNetworkPath(self.dataDir):
+            return
+
+        self.diskCache.setDeployment(self.dataDir)
+        self.imageLoader.setDiskCache(self.diskCache)
+        self.diskCachePrefetcher = diskCache.DiskCachePrefetcher(self.diskCache, parent=self)
+        self.diskCachePrefetcher.start()
+
+        #  a crash can leave local changes that were never copied back. Never copy
+        #  them without asking since they'd overwrite the deployment's database.
+        unsynced = self.diskCache.findUnsyncedMetadata(self.dataDir)
+        if unsynced:
+            QApplication.restoreOverrideCursor()
+            message = ('The local copy of this deployment\'s metadata database has ' +
+                    'changes that were never saved to the deployment. ')
+            if any([changed for dbFile, changed in unsynced]):
+                message += ('The deployment\'s database has also been changed since and ' +
+                        'those changes will be lost if you save your local changes. ')
+            ok = QMessageBox.question(self, 'Unsaved Metadata', message + 'Do you want ' +
+                    'to save your local changes to the deployment? If you choose No, ' +
+                    'they are discarded.',
+                    QMessageBox.StandardButton.Yes|QMessageBox.StandardButton.No)
+            if (ok == QMessageBox.StandardButton.Yes):
+                try:
+                    self.diskCache.syncMetadata(self.dataDir, force=True)
+                except Exception as e:
+                    QMessageBox.warning(self, 'Unsaved Metadata', 'Unable to save the ' +
+                            'local changes: ' + str(e) + '. The deployment\'s database ' +
+                            'will be used without copying it locally.')
+                    return
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+
+        localDir = self.diskCache.localizeMetadata(self.dataDir)
+        if localDir is not None:
+            self.metadataDir = localDir
+            self.localMetadataSource = self.dataDir
+
+
+    def stopDiskCache(self):
+        '''
+        stopDiskCache stops the disk cache prefetch thread and stops reading images
+        through the cache
+        '''
+        if self.diskCachePrefetcher is not None:
+            self.diskCachePrefetcher.stop()
+            self.diskCachePrefetcher = None
+        self.imageLoader.setDiskCache(None)
+
+
+    def prefetchDiskCache(self, imageIndex):
+        '''
+        prefetchDiskCache tells the disk cache prefetch thread which files to copy. The
+        files are for the images ahead of the provided index in the direction the user
+        is moving through the images.
+        '''
+        if self.diskCachePrefetcher is None:
+            return
+
+        stride = self.prefetcher.stride()
+        if stride == 0:
+            stride = 1
+        paths = []
+        for i in range(1, self.diskCacheFrames + 1):
+            index = imageIndex + stride * i
+            if index < 0 or index >= len(self.metadata.imageNumbers):
+                break
+            number = self.metadata.imageNumbers[index]
+            for camera in [self.leftCamera, self.rightCamera]:
+                path = self.getImageFile(camera, number)
+                if path:
+                    paths.append(path)
+        self.diskCachePrefetcher.setPaths(paths)
+
+
+    def openReviewStores(self):
+        '''
+        openReviewStores opens the review stores for each camera if the deployment has
+        been prepared for review. Stores that are missing or stale (they don't contain
+        all of the images) are not used and images are decoded from the files. The
+        open stores are verified in the background so frames whose image file was
+        replaced aren't used.
+        '''
+        self.reviewStores = {}
+        self.reviewBuilder = frameStore.FrameStoreBuilder(self.reviewWidths[0], parent=self)
+        for camera in self.cameras:
+            imageNumbers = list(self.metadata.imageData[camera].keys())
+            imageNumbers.sort()
+            self.reviewStores[camera] = []
+            for width in self.reviewWidths:
+                store = frameStore.FrameStore(self.getStoreDir(camera), 'review_' + str(width))
+                if store.open(imageNumbers=imageNumbers):
+                    self.reviewBuilder.addJob(store, imageNumbers, [self.getImageFile(camera, n)
+                            for n in imageNumbers], width=width, build=False)
+                self.reviewStores[camera].append(store)
+
+        if len(self.reviewBuilder.jobs) > 0:
+            self.reviewBuilder.start()
+        else:
+            self.reviewBuilder = None
+
+
+    def prepareForReview(self):
+        '''
+        prepareForReview builds the review stores for each camera. The review stores
+        hold the images at display resolution in memory mapped files so they can be
+        displayed without being decoded. Frames are used as they are built and an
+        interrupted build resumes the next time the deployment is prepared.
+        '''
+
+        ok = QMessageBox.question(self, 'Prepare for Review', 'Preparing the deployment ' +
+                'for review stores each image at ' +
+                ', '.join([str(w) for w in self.reviewWidths]) + ' pixels wide in the ' +
+                'local cache (' + self.storeDir + '). This requires roughly ' +
+                str(self.getReviewStoreSize()) + ' MB of disk space. Do you want to ' +
+                'continue?', QMessageBox.StandardButton.Yes|QMessageBox.StandardButton.No)
+        if (ok == QMessageBox.StandardButton.No):
+            return
+
+        if self.reviewBuilder is not None:
+            self.reviewBuilder.stop()
+
+        self.reviewBuilder = frameStore.FrameStoreBuilder(self.reviewWidths[0], parent=self)
+        self.reviewBuilder.progress.connect(self.updateReviewProgress)
+        for camera in self.reviewStores:
+            imageNumbers = list(self.metadata.imageData[camera].keys())
+            imageNumbers.sort()
+            imagePaths = [self.getImageFile(camera, n) for n in imageNumbers]
+            for width, store in zip(self.reviewWidths, self.reviewStores[camera]):
+                if not store.isComplete():
+                    self.reviewBuilder.addJob(store, imageNumbers, imagePaths, width=width)
+
+        if len(self.reviewBuilder.jobs) > 0:
+            self.reviewBuilder.start()
+        else:
+            self.reviewBuilder = None
+            QMessageBox.information(self, 'Prepare for Review',
+                    'This deployment is already prepared for review.')
+
+
+    def getReviewStoreSize(self):
+        '''
+        getReviewStoreSize returns the approximate size of the review stores in MB.
+        The image aspect ratio is assumed to be 4:3 if we haven't displayed an image.
+        '''
+        nBytes = 0
+        for camera in self.cameras:
+            try:
+                imageWidth, imageHeight = self.fullImageSize[camera]
+                aspect = imageHeight / float(imageWidth)
+            except KeyError:
+                aspect = 0.75
+            nImages = len(self.metadata.imageData[camera])
+            for width in self.reviewWidths:
+                nBytes += nImages * width * int(round(width * aspect)) * 3
+
+        return int(nBytes / 1048576)
+
+
+    def stopReviewStores(self):
+        '''
+        stopReviewStores stops the review store builder and closes the review stores
+        '''
+        if self.reviewBuilder is not None:
+            self.reviewBuilder.stop()
+            self.reviewBuilder = None
+        for camera in self.reviewStores:
+            for store in self.reviewStores[camera]:
+                store.close()
+        self.reviewStores = {}
+        self.reviewLabel.setText('')
+
+
+    def updateReviewProgress(self, nDone, total):
+        '''
+        updateReviewProgress updates the review store status bar label
+        '''
+        if nDone >= total:
+            self.reviewLabel.setText('')
+        else:
+            self.reviewLabel.setText('Preparing for review: ' +
+                    str(round(nDone / float(total) * 100.)) + '%')
+
+
+    def getReviewFrame(self, viewer, number):
+        '''
+        getReviewFrame returns a list containing the smallest review frame for the
+        provided viewer and image number that covers the viewer and the ratio of
+        the full image size to the frame size. The frame is a view into the mapped
+        store so no data is copied. The frame will be None if the deployment hasn't
+        been prepared or the stores don't cover the viewer.
+        '''
+        camera = self.getViewerCamera(viewer)
+        try:
+            stores = self.reviewStores[camera]
+        except KeyError:
+            return [None, 1]
+
+        for store in stores:
+            if store.isOpen() and camera not in self.fullImageSize:
+                #  we haven't displayed an image from this camera - get the size from the store
+                imageSize = store.getImageSize()
+                if imageSize is not None:
+                    self.fullImageSize[camera] = imageSize
+
+            if store.isOpen() and self.coversView(viewer, store.scale):
+                image = store.getFrame(number)
+                if image is not None:
+                    return [image, store.scale]
+
+        return [None, 1]
+
 
     def markPosition(self):
         #  check if this was a shift-click which selects the image for cal
@@ -870,7 +1471,7 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         else:
             (frame, text)=self.metadata.findPreviousMark(imageNumber)
         if (frame != None):
-            nextIndex = self.metadata.imageNumbers.index(frame)
+            nextIndex = self.imageIndex.nearestIndex(frame)
             self.imageSlider.setValue(nextIndex)
             self.marksDescription.setText(text)
 
@@ -880,8 +1481,20 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         imageKeyPressEvent sends key presses within our QImageView/QEchogramView objects
         to our keypress event handler for the central widget. At this point
         QImageView/QEchogramView  has already handled their internal key press handling.
-
+        The viewer's key commands include toggling and adjusting its enhancements.
+        The viewer's images are enhanced by the loader so if the adjustments have
+        changed the frame is reloaded with the new enhancements.
         '''
+        for viewer in self.hudItems:
+            if self.getViewer(viewer) is imgObj:
+                self.enhancement.pop(viewer, None)
+                self.setHudText(viewer, 'enhance', self.getEnhanceText(viewer))
+                if (self.displayedNumber.get(viewer) is not None and
+                        self.getEnhancement(viewer)[0] != self.displayedEnhanceKey[viewer]):
+                    #  the unenhanced and enhanced images are usually cached
+                    self.lastNumberLoaded = -1
+                    self.changeImage()
+
         self.keyPressEvent(ev)
 
 
@@ -906,92 +1519,1026 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
             self.imageSlider.setValue(currentIndex - 10)
 
 
-    def processQueue(self):
+    def processQueue(self, synchronous=False):
+        '''
+        processQueue is called by the queue timer and hands the pending frame off to
+        the image loader. A frame contains the images from both cameras for a single
+        image number and is always presented as a unit. Only the most recently
+        requested frame is pending and the loader cancels any older frames that it
+        hasn't started decoding, so after a fast drag of the slider the only frame
+        that is decoded is the one the user stopped on. If synchronous is True, the
+        pending frame is loaded in the GUI thread at full resolution and displayed
+        before this method returns. This is used when exporting images.
+        '''
+
+        if (self.pendingFrame is not None):
+            #  get the image number and paths
+            number, paths, eventTime = self.pendingFrame
+            self.pendingFrame = None
+            self.requestSequence += 1
+            frame = imageLoader.FrameRequest(number, self.requestSequence)
+            frame.eventTime = eventTime
+
+            for viewer in self.getViewerKeys():
+                camera = self.getViewerCamera(viewer)
+                path = paths.get(viewer)
+                image = None
+                fromStore = False
+                if synchronous:
+                    scale = 1
+                else:
+                    scale = self.getDecodeScale(viewer)
+                enhanceKey, enhancer = self.getEnhancement(viewer)
+                enhanced = None
+                if path:
+                    image, enhanced, scale = self.getCachedFrame(camera, number, scale,
+                            enhanceKey)
+                    if image is None and enhanced is None and not synchronous:
+                        #  use the review frame if the deployment has been prepared
+                        image, storeScale = self.getReviewFrame(viewer, number)
+                        if image is not None:
+                            scale = storeScale
+                            fromStore = True
+                    if (image is None and enhanced is None and not synchronous and
+                            self.imageSlider.isSliderDown()):
+                        #  the user is dragging the slider - show the thumbnail if we
+                        #  have it. The settle timer will load the full image.
+                        image, thumbScale = self.getThumbnail(camera, number)
+                        if image is not None:
+                            scale = thumbScale
+                            fromStore = True
+                request = frame.addImage(viewer, path, scale=scale, image=image)
+                request.fromStore = fromStore
+                self.setEnhancement(request, enhanceKey, enhancer, enhanced)
+
+            if frame.needsDecode() and not synchronous:
+                self.imageLoader.loadFrame(frame)
+            else:
+                #  the images are cached, don't exist, or we're loading synchronously
+                frame.decode(cache=self.imageLoader.diskCache)
+                self.displayFrame(frame)
+
+        #  check if the user has zoomed into an image that was decoded at reduced resolution
+        if not synchronous and not self.imageSlider.isSliderDown():
+            for viewer in self.getViewerKeys():
+                if (self.displayedScale[viewer] > self.getMinimumScale() and
+                        not self.coversView(viewer, self.displayedScale[viewer])):
+                    self.upgradeImages(settled=False)
+                    break
+
 
-        if (len(self.leftImageQueue) > 0):
-            #  get the next left image number and path
-            number, pathLeft = self.leftImageQueue.pop(0)
-            if pathLeft:
-                self.LFile = pathLeft + self.metadata.imageExtension
-                self.gvLeft.setImageFromFile(self.LFile)
-                self.gvLeft.fillExtent()
+    def displayFrame(self, frame):
+        '''
+        displayFrame is called when the image loader has finished decoding a frame.
+        It updates the viewers, HUD text, and sensor data together so the displayed
+        images and data are always from the same image number. Prefetched frames are
+        added to the frame cache and are not displayed.
+        '''
 
-                #  get the UTC corrected time string
-                timeString = (self.metadata.imageData[self.leftCamera][number][1].strftime('%Y-%m-%d %H:%M:%S') +
-                        '.%03d' % (self.metadata.imageData[self.leftCamera][number][1].microsecond / 1000.))
+        #  prefetched frames just go into the cache
+        if frame.prefetch:
+            for viewer in frame.images:
+                request = frame.images[viewer]
+                key = self.getCacheKey(self.getViewerCamera(viewer), frame.number,
+                        request.scale)
+                self.prefetchPending.discard(key)
+                if frame.sequence > self.cacheValidSequence:
+                    if request.image is not None:
+                        self.frameCache.put(key, request.image)
+                    if request.enhanced is not None:
+                        self.frameCache.put(self.getCacheKey(self.getViewerCamera(viewer),
+                                frame.number, request.scale, request.enhanceKey),
+                                request.enhanced)
+            self.updateCacheStats()
+            return
 
-                if (self.leftDateTimeLabel != None):
-                    self.gvLeft.removeHudItem(self.leftDateTimeLabel)
-                    self.gvLeft.removeHudItem(self.leftFrameLabel)
-                    self.gvLeft.removeHudItem(self.leftEnhanceLabel)
+        #  frames can finish out of order when we have more than one worker.
+        #  Discard any frames that are older than the one being displayed.
+        if frame.sequence < self.displayedSequence:
+            return
+        self.displayedSequence = frame.sequence
+        self.upgradePending = False
+
+        #  keep track of frames where one camera's image lagged the other
+        if frame.skew > self.skewThreshold:
+            self.skewCount += 1
+            self.updateQueueDepth(self.imageLoader.queueDepth())
+
+        presentTimes = {}
+        viewers = self.getViewerKeys()
+        for viewer in frame.images:
+            if viewer not in viewers:
+                #  the grid view was closed after this frame was requested
+                continue
+            times = self.presentImage(frame.number, frame.images[viewer])
+            if times is not None and viewer in pipelineStats.VIEWERS:
+                presentTimes[viewer] = times
+        self.pipelineStats.framePresented(frame, presentTimes)
+        self.updateCacheStats()
+
+        #  let the quality governor know how long the frame took
+        if self.isScrubbing() and self.qualityGovernor.addFrame(time.perf_counter() -
+                frame.eventTime, self.getFrameDeadline()):
+            self.applyQualityLevel()
 
-                self.leftDateTimeLabel = self.gvLeft.addHudText(QPointF(0.98,0.99),
-                        timeString, color=[0,250,0], alpha=150, halign='right',
-                        valign='bottom')
+        #  update the attitude/depth info
+        if self.frameTable is not None and frame.number in self.frameTable.rows:
+            #  the sensor strings have been pre-formatted
+            row = self.frameTable.rows[frame.number]
+            self.yaw.setText(self.frameTable.sensorStrings['yaw'][row])
+            self.pitch.setText(self.frameTable.sensorStrings['pitch'][row])
+            self.roll.setText(self.frameTable.sensorStrings['roll'][row])
+            self.depth.setText(self.frameTable.sensorStrings['depth'][row])
+        else:
+            try:
+                attitudeString = self.metadata.sensorData['CTControl']['$OHPR'][frame.number]
+                stringParts = attitudeString.split(',')
+                self.yaw.setText(self.convertFloatToString(stringParts[1]))
+                self.pitch.setText(self.convertFloatToString(stringParts[2]))
+                self.roll.setText(self.convertFloatToString(stringParts[3]))
+                self.depth.setText(self.convertFloatToString(stringParts[5]))
+            except:
+                #  there probably isn't any sensor data available...
+                pass
 
-                self.leftFrameLabel = self.gvLeft.addHudText(QPointF(0.02,0.99),
-                        'Frame: ' + str(number), color=[0,250,0], alpha=150,
-                        halign='left', valign='bottom')
 
-                if (self.gvLeft.image.enhancementsEnabled):
-                    self.leftEnhanceLabel = self.gvLeft.addHudText(QPointF(0.02,0.001),
-                            'Enhancements: On', color=[0,250,0], alpha=150,
-                            halign='left', valign='top')
-                else:
-                    self.leftEnhanceLabel = self.gvLeft.addHudText(QPointF(0.02,0.001),
-                            'Enhancements: Off', color=[0,250,0], alpha=150,
-                            halign='left', valign='top')
+    def presentImage(self, number, request):
+        '''
+        presentImage updates a single viewer and its HUD text. It is called by
+        displayFrame for each of the frame's images. Returns a dict of the times
+        the image presentation started, the scene was updated, and the HUD was
+        updated or None if there was no image to present.
+        '''
+
+        times = {'start':time.perf_counter()}
+
+        camera = self.getViewerCamera(request.viewer)
+        key = self.getCacheKey(camera, number, request.scale)
+        viewer = self.getViewer(request.viewer)
+
+        #  show the enhanced image if we have it. If the loader couldn't enhance the
+        #  image the viewer applies its own enhancements unless the quality governor
+        #  is skipping them, in which case the image is shown as is.
+        skipEnhance = request.enhanced is None and self.skipEnhancements()
+        if request.enhanced is not None:
+            image = request.enhanced
+        else:
+            image = request.image
+
+        if image is None:
+            #  the image doesn't exist or we couldn't read it
+            viewer.clearViewer()
+            self.displayedNumber[request.viewer] = None
+            self.displayedScale[request.viewer] = 1
+            return None
+
+        #  cache the frames and keep track of the full resolution image size. Frames from
+        #  the thumbnail and review stores are not cached since they're already mapped.
+        height, width = image.shape[:2]
+        self.fullImageSize[camera] = [int(round(width * request.scale)),
+                int(round(height * request.scale))]
+        if not request.fromStore and request.scale in imageLoader.DECODE_FLAGS:
+            if request.image is not None:
+                self.frameCache.put(key, request.image)
+            if request.enhanced is not None:
+                self.frameCache.put(self.getCacheKey(camera, number, request.scale,
+                        request.enhanceKey), request.enhanced)
+
+        if request.viewer == 'left':
+            self.LFile = request.filename
+        elif request.viewer == 'right':
+            self.RFile = request.filename
+
+        if (number == self.displayedNumber[request.viewer] and
+                request.scale < self.displayedScale[request.viewer]):
+            #  this is a higher resolution version of the image we're showing. Keep
+            #  the current zoom and position by scaling the view to match.
+            factor = self.displayedScale[request.viewer] / request.scale
+            center = viewer.mapToScene(viewer.viewport().rect().center())
+            self.setViewerImage(viewer, image, request.enhanced is not None or skipEnhance)
+            viewer.scale(1. / factor, 1. / factor)
+            viewer.centerOn(center * factor)
+        else:
+            self.setViewerImage(viewer, image, request.enhanced is not None or skipEnhance)
+            viewer.fillExtent()
+        self.displayedNumber[request.viewer] = number
+        self.displayedScale[request.viewer] = request.scale
+        self.displayedFromStore[request.viewer] = request.fromStore
+        self.displayedEnhanceKey[request.viewer] = request.enhanceKey
+        self.enhanceSkipped[request.viewer] = skipEnhance
+        times['scene'] = time.perf_counter()
+
+        #  get the UTC corrected time string
+        timeString = self.getTimeString(camera, number)
+
+        #  update the HUD text
+        self.setHudText(request.viewer, 'time', timeString)
+        self.setHudText(request.viewer, 'frame', 'Frame: ' + str(number))
+        self.setHudText(request.viewer, 'enhance', self.getEnhanceText(request.viewer))
+        self.setHudText(request.viewer, 'pass', self.getPassText(request))
+        self.setHudText(request.viewer, 'quality', self.getQualityText())
+        times['hud'] = time.perf_counter()
+
+        return times
+
+
+    def setViewerImage(self, viewer, image, enhanced):
+        '''
+        setViewerImage sets a viewer's image. If the image has already been enhanced,
+        the viewer's enhancements are disabled while the image is set so they aren't
+        applied twice. The viewer's enhancement state is restored so the HUD and the
+        viewer's enhancement toggle still reflect it.
+        '''
+        if enhanced:
+            enabled = viewer.image.enhancementsEnabled
+            viewer.image.enhancementsEnabled = False
+            viewer.setImageFromNumpy(image)
+            viewer.image.enhancementsEnabled = enabled
+        else:
+            viewer.setImageFromNumpy(image)
+
+
+    def getEnhanceText(self, viewer):
+        '''
+        getEnhanceText returns the HUD text describing the enhancement state of the
+        provided viewer
+        '''
+        if not self.getViewer(viewer).image.enhancementsEnabled:
+            return 'Enhancements: Off'
+        elif self.enhanceSkipped.get(viewer, False):
+            return 'Enhancements: Skipped'
+        else:
+            return 'Enhancements: On'
+
+
+    def getEnhancement(self, viewer):
+        '''
+        getEnhancement returns a list containing the hash of the provided viewer's
+        image adjustment parameters and the ImageEnhancer for them. Both are None if
+        enhancements are off or can't be expressed as a lookup table, in which case
+        the viewer applies the enhancements itself, or if the quality governor is
+        skipping enhancements. The result is kept until the viewer's adjustments
+        change so the parameters aren't hashed for every frame.
+        '''
+        if self.skipEnhancements():
+            return [None, None]
+
+        if viewer not in self.enhancement:
+            enhancer = self.getEnhancer(viewer)
+            if enhancer is None:
+                self.enhancement[viewer] = [None, None]
             else:
-                self.gvLeft.clearViewer()
-
-        if (len(self.rightImageQueue) > 0):
-            #  get the next right image number and path
-            number, pathRight = self.rightImageQueue.pop(0)
-            if pathRight:
-                self.RFile=pathRight + self.metadata.imageExtension
-                self.gvRight.setImageFromFile(self.RFile)
-                self.gvRight.fillExtent()
-
-                #  get the UTC corrected time string
-                timeString = (self.metadata.imageData[self.rightCamera][number][1].strftime('%Y-%m-%d %H:%M:%S') +
-                        '.%03d' % (self.metadata.imageData[self.rightCamera][number][1].microsecond / 1000.))
-
-                if (self.rightDateTimeLabel != None):
-                    self.gvRight.removeHudItem(self.rightDateTimeLabel)
-                    self.gvRight.removeHudItem(self.rightFrameLabel)
-                    self.gvRight.removeHudItem(self.rightEnhanceLabel)
-
-                self.rightDateTimeLabel = self.gvRight.addHudText(QPointF(0.98,0.99),
-                        timeString, color=[0,250,0], alpha=150, halign='right',
-                        valign='bottom')
-
-                self.rightFrameLabel = self.gvRight.addHudText(QPointF(0.02,0.99),
-                        'Frame: ' + str(number), color=[0,250,0], alpha=150,
-                        halign='left', valign='bottom')
-
-                if (self.gvRight.image.enhancementsEnabled):
-                    self.rightEnhanceLabel = self.gvRight.addHudText(QPointF(0.02,0.001),
-                            'Enhancements: On', color=[0,250,0], alpha=150,
-                            halign='left',valign='top')
-                else:
-                    self.rightEnhanceLabel = self.gvRight.addHudText(QPointF(0.02,0.001),
-                            'Enhancements: Off', color=[0,250,0], alpha=150,
-                            halign='left', valign='top')
+                parameters = self.getViewer(viewer).image.getParameters()
+                self.enhancement[viewer] = [imageEnhancer.parameterHash(parameters),
+                        enhancer]
+
+        return self.enhancement[viewer]
+
+
+    def setEnhancement(self, request, enhanceKey, enhancer, enhanced=None):
+        '''
+        setEnhancement sets the enhancer for an image request. If the enhanced image
+        was cached it is passed in. Otherwise, if the request already has its image
+        (it was cached or is from a store) it is enhanced here. Images that need
+        to be decoded are enhanced by the loader's workers.
+        '''
+        request.enhanceKey = enhanceKey
+        request.enhancer = enhancer
+        request.enhanced = enhanced
+        if enhanced is None:
+            request.enhance()
+
+
+    def getEnhancer(self, viewer):
+        '''
+        getEnhancer returns the ImageEnhancer that reproduces the provided viewer's
+        current image adjustments. The enhancer's lookup table is measured by running
+        probe images through a hidden QImageViewer with the same adjustments so it
+        matches what the viewer displays. None is returned if enhancements are off or
+        the viewer's enhancements can't be expressed as a lookup table. Enhancers are
+        kept by the hash of the adjustment parameters so they are only measured once.
+        '''
+        gv = self.getViewer(viewer)
+        if not gv.image.enhancementsEnabled:
+            return None
+
+        parameters = gv.image.getParameters()
+        enhanceKey = imageEnhancer.parameterHash(parameters)
+        if enhanceKey not in self.enhancers:
+            if self.enhanceProbe is None:
+                probeViewer = QImageViewer()
+                probeViewer.hide()
+                self.enhanceProbe = imageEnhancer.ViewerProbe(probeViewer)
+            self.enhancers[enhanceKey] = imageEnhancer.ImageEnhancer.fromViewer(
+                    self.enhanceProbe(parameters))
+
+        return self.enhancers[enhanceKey]
+
+
+    def createFrameHud(self, viewers=['left', 'right']):
+        '''
+        createFrameHud creates the per frame HUD text items (date/time, frame number,
+        enhancement state, display pass, and quality level) for the provided viewers.
+        The items are created once when the deployment is loaded (or the grid view is
+        shown) and only their text is updated as frames are displayed.
+        '''
+
+        for viewer in viewers:
+            gv = self.getViewer(viewer)
+            self.hudItems[viewer] = {}
+            self.hudText[viewer] = {}
+
+            self.hudItems[viewer]['time'] = gv.addHudText(QPointF(0.98,0.99),
+                    '', color=[0,250,0], alpha=150, halign='right',
+                    valign='bottom')
+            self.hudItems[viewer]['frame'] = gv.addHudText(QPointF(0.02,0.99),
+                    '', color=[0,250,0], alpha=150,
+                    halign='left', valign='bottom')
+            self.hudItems[viewer]['enhance'] = gv.addHudText(QPointF(0.02,0.001),
+                    '', color=[0,250,0], alpha=150,
+                    halign='left', valign='top')
+            self.hudItems[viewer]['pass'] = gv.addHudText(QPointF(0.98,0.001),
+                    '', color=[0,250,0], alpha=150,
+                    halign='right', valign='top')
+            self.hudItems[viewer]['quality'] = gv.addHudText(QPointF(0.98,0.045),
+                    '', color=[0,250,0], alpha=150,
+                    halign='right', valign='top')
+
+            for item in self.hudItems[viewer]:
+                self.hudText[viewer][item] = ''
+
+
+    def getPassText(self, request):
+        '''
+        getPassText returns the HUD text describing which display pass an image is
+        from. Preview images are the reduced resolution decodes and thumbnails that
+        are shown while scrubbing and are replaced when the slider settles. Review
+        frames that cover the viewer and full resolution images are final.
+        '''
+        if request.scale == 1:
+            return 'Full resolution'
+        elif request.fromStore and self.coversView(request.viewer, request.scale):
+            return 'Display resolution'
+        else:
+            return 'Preview 1/%.0f' % request.scale
+
+
+    def getQualityText(self):
+        '''
+        getQualityText returns the HUD text describing the quality governor's level
+        '''
+        if not self.qualityGovernor.enabled:
+            return ''
+
+        return 'Quality: ' + self.qualityGovernor.current()['name']
+
+
+    def skipEnhancements(self):
+        '''
+        skipEnhancements returns True if the quality governor is skipping image
+        enhancements. Enhancements are only skipped while scrubbing.
+        '''
+        return not self.qualityGovernor.current()['enhance'] and self.isScrubbing()
+
+
+    def getFrameDeadline(self):
+        '''
+        getFrameDeadline returns the time, in seconds, a frame has to be displayed in.
+        When playing back this is the playback frame interval.
+        '''
+        if self.playbackClock is not None and self.playbackClock.requestedRate() > 0:
+            return 1. / self.playbackClock.requestedRate()
+
+        return self.scrubDeadline
+
+
+    def applyQualityLevel(self):
+        '''
+        applyQualityLevel is called when the quality governor changes the quality
+        level. The decode scale and enhancement settings are picked up as frames
+        are requested so we only need to update the prefetch window and the HUD.
+        '''
+        level = self.qualityGovernor.current()
+        self.prefetcher.nAhead = max(1, int(round(self.prefetchFrames * level['prefetch'])))
+
+        for viewer in self.hudItems:
+            self.setHudText(viewer, 'quality', self.getQualityText())
+
+
+    def setHudText(self, viewer, item, text):
+        '''
+        setHudText updates the text of one of the per frame HUD items. The item is
+        only updated if the text has changed.
+        '''
+        try:
+            if self.hudText[viewer][item] != text:
+                self.hudItems[viewer][item].setText(text)
+                self.hudText[viewer][item] = text
+        except KeyError:
+            #  the HUD hasn't been created - no deployment is loaded
+            pass
+
+
+    def updatePipelineStatsState(self, visible=False):
+        '''
+        updatePipelineStatsState turns the pipeline timing collection on when the
+        stats panel is shown or a log is being written and off otherwise.
+        '''
+        self.pipelineStats.setEnabled(self.statsPanel.isVisible() or
+                self.pipelineStats.isLogging())
+        if self.statsPanel.isVisible():
+            self.statsPanel.refresh()
+
+
+    def togglePipelineLog(self, start):
+        '''
+        togglePipelineLog starts and stops logging the pipeline timings to a CSV or
+        JSON lines file.
+        '''
+        if start:
+            logFilename = QFileDialog.getSaveFileName(self, 'Log pipeline stats',
+                    self.copyDir, 'CSV files (*.csv);;JSON lines files (*.jsonl)')
+            logFilename = logFilename[0]
+            if logFilename and not self.pipelineStats.startLog(logFilename):
+                QMessageBox.critical(self, 'Log Failure', 'Unable to open log file ' +
+                        logFilename)
+        else:
+            self.pipelineStats.stopLog()
+
+        self.updatePipelineStatsState()
+
+
+    def updateCacheStats(self):
+        '''
+        updateCacheStats updates the status bar frame cache label
+        '''
+        self.cacheLabel.setText('Cache: %d MB/%d MB  Hits: %d  Misses: %d  Evicted: %d' %
+                (self.frameCache.nBytes / 1048576, self.frameCache.maxBytes / 1048576,
+                self.frameCache.hits, self.frameCache.misses, self.frameCache.evictions))
+
+
+    def updateQueueDepth(self, depth):
+        '''
+        updateQueueDepth updates the status bar decode queue depth label
+        '''
+        self.queueLabel.setText('Decode queue: ' + str(depth) + ' (' +
+                str(self.imageLoader.workerCount()) + ' workers)  Prefetch: ' +
+                str(self.imageLoader.prefetchDepth()) + '  Skipped: ' +
+                str(self.imageLoader.cancelledCount()) + '  Skew: ' + str(self.skewCount))
+
+
+    def getViewerCamera(self, viewer):
+        '''
+        getViewerCamera returns the name of the camera displayed in the provided viewer
+        '''
+        if viewer == 'left':
+            return self.leftCamera
+        elif viewer == 'right':
+            return self.rightCamera
+        else:
+            return viewer[5:]
+
+
+    def getViewerKeys(self):
+        '''
+        getViewerKeys returns the keys of the viewers that are loaded for each frame.
+        These are the left and right viewers and, if the grid view is shown, the
+        grid viewers.
+        '''
+        if self.actionGridView.isChecked():
+            return ['left', 'right'] + self.gridView.viewerKeys()
+        else:
+            return ['left', 'right']
+
+
+    def isGridViewer(self, viewer):
+        return viewer.startswith('grid:')
+
+
+    def getViewer(self, viewer):
+        '''
+        getViewer returns the QImageViewer object for the provided viewer key
+        '''
+        if viewer == 'left':
+            return self.gvLeft
+        elif viewer == 'right':
+            return self.gvRight
+        else:
+            return self.gridView.viewers[viewer[5:]]
+
+
+    def getCacheKey(self, camera, number, scale, adjustments=None):
+        '''
+        getCacheKey returns the frame cache key for an image. adjustments is the hash
+        of the image adjustments for enhanced images and None for decoded images.
+        '''
+        return (camera, number, scale, adjustments)
+
+
+    def getCachedFrame(self, camera, number, scale, enhanceKey, count=True):
+        '''
+        getCachedFrame is like getCachedImage but will also return the enhanced
+        image if it is cached. Enhanced images are preferred. It returns a list
+        containing the unenhanced image (or None), the enhanced image (or None), and
+        the scale of the image.
+        '''
+        scales = [cachedScale for cachedScale in [8, 4, 2, 1] if cachedScale <= scale]
+        keys = []
+        if enhanceKey is not None:
+            keys = [self.getCacheKey(camera, number, cachedScale, enhanceKey)
+                    for cachedScale in scales]
+        keys += [self.getCacheKey(camera, number, cachedScale) for cachedScale in scales]
+        key, image = self.frameCache.find(keys, count=count)
+        if image is None:
+            return [None, None, scale]
+        elif key[3] is None:
+            return [image, None, key[2]]
+        else:
+            return [None, image, key[2]]
+
+
+    def getCachedImage(self, camera, number, scale, count=True):
+        '''
+        getCachedImage returns the cached image for the provided camera and image
+        number if it is cached at the requested scale or better. It returns a list
+        containing the image (or None) and the scale of the image. Set count to False
+        if the lookup shouldn't count towards the cache hit and miss stats.
+        '''
+        keys = [self.getCacheKey(camera, number, cachedScale) for cachedScale in
+                [8, 4, 2, 1] if cachedScale <= scale]
+        key, image = self.frameCache.find(keys, count=count)
+        if image is not None:
+            return [image, key[2]]
+
+        return [None, scale]
+
+
+    def isScrubbing(self):
+        '''
+        isScrubbing returns True when the images are changing quickly, when the user
+        is dragging the slider, playing back images, or stepping through images.
+        '''
+        return (self.imageSlider.isSliderDown() or self.playBtn.isChecked() or
+                self.prefetcher.stride() != 0)
+
+
+    def getRequiredScale(self, viewer):
+        '''
+        getRequiredScale returns the largest decode scale that still covers the
+        rendered size of the image in the provided viewer.
+        '''
+        try:
+            imageWidth, imageHeight = self.fullImageSize[self.getViewerCamera(viewer)]
+        except KeyError:
+            #  we haven't loaded an image from this camera yet
+            return 1
+
+        gv = self.getViewer(viewer)
+        viewWidth = gv.renderedWidth()
+        viewHeight = gv.renderedHeight()
+        if viewWidth <= 0 or viewHeight <= 0:
+            viewWidth = gv.width()
+            viewHeight = gv.height()
+
+        return imageLoader.selectDecodeScale(imageWidth, imageHeight, viewWidth,
+                viewHeight)
+
+
+    def coversView(self, viewer, scale):
+        '''
+        coversView returns True if an image at the provided scale is at least as large
+        as the rendered size of the image in the provided viewer.
+        '''
+        try:
+            imageWidth, imageHeight = self.fullImageSize[self.getViewerCamera(viewer)]
+        except KeyError:
+            #  we haven't loaded an image from this camera yet
+            return False
+
+        gv = self.getViewer(viewer)
+        viewWidth = gv.renderedWidth()
+        viewHeight = gv.renderedHeight()
+        if viewWidth <= 0 or viewHeight <= 0:
+            viewWidth = gv.width()
+            viewHeight = gv.height()
+
+        return imageWidth / scale >= viewWidth and imageHeight / scale >= viewHeight
+
+
+    def getDecodeScale(self, viewer):
+        '''
+        getDecodeScale returns the scale that images should be decoded at for the
+        provided viewer. Images are decoded at reduced resolution while scrubbing
+        and at full resolution otherwise. The grid viewers are small so their images
+        are always decoded at the resolution that covers the viewer. The quality
+        governor's minimum scale applies even if reduced resolution decoding is off.
+        '''
+        if self.isGridViewer(viewer) or (self.reducedDecode and self.isScrubbing()):
+            scale = self.getRequiredScale(viewer)
+        else:
+            scale = 1
+
+        return max(scale, self.getMinimumScale())
+
+
+    def getMinimumScale(self):
+        '''
+        getMinimumScale returns the minimum decode scale set by the quality governor.
+        The governor only applies while scrubbing.
+        '''
+        if self.isScrubbing():
+            return self.qualityGovernor.current()['minScale']
+        else:
+            return 1
+
+
+    def upgradeImages(self, settled=True):
+        '''
+        upgradeImages reloads the displayed images at a higher resolution if they were
+        decoded at reduced resolution. When settled is True, the images are reloaded at
+        full resolution. This is called by the settle timer after the slider stops
+        moving. Otherwise the images are reloaded at the scale required to cover the
+        rendered image which is used when the user zooms into the image.
+        '''
+
+        #  don't bother if we have a newer frame pending or we're still playing
+        if (self.pendingFrame is not None or self.upgradePending or
+                self.imageLoader.queueDepth() > 0 or (settled and self.playBtn.isChecked())):
+            return
+
+        #  both viewers should be showing the same image number
+        number = self.displayedNumber['left']
+        if number is None or number != self.displayedNumber['right']:
+            return
+
+        self.requestSequence += 1
+        frame = imageLoader.FrameRequest(number, self.requestSequence)
+        for viewer in self.getViewerKeys():
+            #  images shown while the quality governor was skipping enhancements are
+            #  reloaded with them once it stops
+            enhance = self.enhanceSkipped.get(viewer, False) and not self.skipEnhancements()
+            if ((self.displayedScale[viewer] == 1 and not enhance) or
+                    self.displayedNumber[viewer] != number):
+                continue
+
+            if (self.displayedFromStore[viewer] and not enhance and
+                    self.coversView(viewer, self.displayedScale[viewer])):
+                #  review frames are used at rest as long as they cover the view
+                continue
+
+            if settled and not self.isGridViewer(viewer):
+                scale = 1
             else:
-                self.gvRight.clearViewer()
+                scale = max(self.getRequiredScale(viewer), self.getMinimumScale())
+            if scale >= self.displayedScale[viewer]:
+                if not enhance:
+                    continue
+                scale = self.displayedScale[viewer]
+
+            camera = self.getViewerCamera(viewer)
+            path = self.getImageFile(camera, number)
+            if not path:
+                continue
+            enhanceKey, enhancer = self.getEnhancement(viewer)
+            image, enhanced, scale = self.getCachedFrame(camera, number, scale, enhanceKey)
+            fromStore = False
+            if image is None and enhanced is None:
+                #  a larger review frame may cover the view
+                image, storeScale = self.getReviewFrame(viewer, number)
+                if image is not None and storeScale < self.displayedScale[viewer]:
+                    scale = storeScale
+                    fromStore = True
+                else:
+                    image = None
+            request = frame.addImage(viewer, path, scale=scale, image=image)
+            request.fromStore = fromStore
+            self.setEnhancement(request, enhanceKey, enhancer, enhanced)
 
+        if len(frame.images) == 0:
+            #  nothing to upgrade
+            return
+        elif frame.needsDecode():
+            self.upgradePending = True
+            self.imageLoader.loadFrame(frame)
+        else:
+            self.displayFrame(frame)
 
-        #  update the attitude/depth info
+
+    def getFramePaths(self, number):
+        '''
+        getFramePaths returns a dict, keyed by viewer, of the image files for the
+        provided image number
+        '''
+        return {viewer:self.getImageFile(self.getViewerCamera(viewer), number)
+                for viewer in self.getViewerKeys()}
+
+
+    def getImageFile(self, camera, number):
+        '''
+        getImageFile returns the full path, including the extension, of the image for
+        the provided camera and image number. The path is taken from the file index
+        or the frame table if they have been built. None is returned if the image
+        isn't in the metadata or the file index has flagged the file as bad.
+        '''
+        if self.fileIndex is not None and camera in self.fileIndex.files:
+            try:
+                return self.fileIndex.files[camera][self.fileIndex.rows[number]]
+            except KeyError:
+                pass
+
+        if self.frameTable is not None:
+            try:
+                return self.frameTable.files[camera][self.frameTable.rows[number]]
+            except KeyError:
+                pass
+
+        imagePath = self.getImagePath(camera, number)
+        if imagePath:
+            imagePath = imagePath + self.metadata.imageExtension
+
+        return imagePath
+
+
+    def getTimeString(self, camera, number):
+        '''
+        getTimeString returns the UTC corrected time string for the provided camera
+        and image number. The string is taken from the frame table if it has been built.
+        '''
+        if self.frameTable is not None:
+            try:
+                return str(self.frameTable.timeStrings[camera][self.frameTable.rows[number]])
+            except KeyError:
+                pass
+
+        imageTime = self.metadata.imageData[camera][number][1]
+        return (imageTime.strftime('%Y-%m-%d %H:%M:%S') +
+                '.%03d' % (imageTime.microsecond / 1000.))
+
+
+    def startFrameTable(self):
+        '''
+        startFrameTable starts building the frame table in a background thread. Until
+        the table is ready the per frame display data is computed as each frame is
+        displayed.
+        '''
+        self.stopFrameTable()
+        self.frameTableBuilder = frameTable.FrameTableBuilder(self.metadata, self.dataDir,
+                list(self.cameras), parent=self)
+        self.frameTableBuilder.tableReady.connect(self.frameTableReady)
+        self.frameTableBuilder.start()
+
+
+    def stopFrameTable(self, wait=False):
+        '''
+        stopFrameTable discards the frame table. If the table is being built, the
+        builder is disconnected and left to finish on its own since it works from a
+        copy of the metadata. Set wait to True to wait for it, which we do when the
+        application is closing.
+        '''
+        if self.frameTableBuilder is not None:
+            self.frameTableBuilder.tableReady.disconnect(self.frameTableReady)
+            if wait:
+                self.frameTableBuilder.wait()
+            self.frameTableBuilder = None
+        self.frameTable = None
+
+
+    def frameTableReady(self, table):
+        '''
+        frameTableReady is called when the frame table builder is done
+        '''
+        if self.sender() is not self.frameTableBuilder:
+            #  this table is from a deployment that has since been closed
+            return
+
+        self.frameTable = table
+        self.frameTableBuilder = None
+
+
+    def startFileIndex(self):
+        '''
+        startFileIndex starts validating the deployment's image files in a background
+        thread
+        '''
+        self.stopFileIndex()
+        if self.validateContents == 'auto':
+            checkContents = not diskCache.isNetworkPath(self.dataDir)
+        else:
+            checkContents = self.validateContents in ['true', '1']
+        self.fileIndexBuilder = fileIndex.FileIndexBuilder(self.metadata, self.dataDir,
+                list(self.cameras), checkContents=checkContents, parent=self)
+        self.fileIndexBuilder.progress.connect(self.updateFileIndexProgress)
+        self.fileIndexBuilder.indexReady.connect(self.fileIndexReady)
+
+        #  run the check at a low priority so it doesn't slow down the image loader
+        self.fileIndexBuilder.start(QThread.Priority.LowPriority)
+
+
+    def stopFileIndex(self):
+        '''
+        stopFileIndex stops the file validation thread, discards the file index and
+        removes the bad file ticks from the slider
+        '''
+        if self.fileIndexBuilder is not None:
+            self.fileIndexBuilder.progress.disconnect(self.updateFileIndexProgress)
+            self.fileIndexBuilder.indexReady.disconnect(self.fileIndexReady)
+            self.fileIndexBuilder.stop()
+            self.fileIndexBuilder = None
+        for name in self.badRanges:
+            self.imageSlider.removeTickRange(name)
+        self.badRanges = []
+        self.fileIndex = None
+        self.fileIndexLabel.setText('')
+
+
+    def updateFileIndexProgress(self, nChecked, total):
+        if self.sender() is not self.fileIndexBuilder:
+            return
+        self.fileIndexLabel.setText('Checking files: ' +
+                str(int(round(nChecked / float(max(total, 1)) * 100.))) + '%')
+
+
+    def fileIndexReady(self, index):
+        '''
+        fileIndexReady is called when the file index builder is done. The frames with
+        bad files are marked on the slider and, since getImageFile doesn't return the
+        paths of bad files, the viewers and the prefetcher skip them.
+        '''
+        if self.sender() is not self.fileIndexBuilder:
+            #  this index is from a deployment that has since been closed
+            return
+
+        self.fileIndex = index
+        self.fileIndexBuilder = None
+
+        #  consecutive bad frames are marked with a single band
+        for start, end in index.getBadRanges():
+            name = 'bad' + str(index.numbers[start])
+            self.imageSlider.addTickRange(name, start, end, padding=16, thickness=1,
+                    color=[240,10,10], alpha=180)
+            self.badRanges.append(name)
+
+        nBad = index.nBad()
+        if nBad > 0:
+            self.fileIndexLabel.setText('Bad files: ' + str(nBad))
+            self.fileIndexLabel.setToolTip('Missing, empty or truncated image files ' +
+                    'are marked in red on the slider')
+        else:
+            self.fileIndexLabel.setText('')
+
+        #  update the pending frame's paths in case one of its files is bad
+        if self.pendingFrame is not None:
+            number = self.pendingFrame[0]
+            self.pendingFrame[1] = self.getFramePaths(number)
+
+
+    def showGridView(self, show):
+        '''
+        showGridView shows and hides the grid view. When shown, a viewer is created
+        for each of the deployment's cameras and the current frame is reloaded so
+        the grid viewers are filled.
+        '''
+        if show:
+            cameras = sorted(self.cameras)
+            self.gridView.setCameras(cameras)
+            for camera in cameras:
+                viewer = 'grid:' + camera
+                gv = self.getViewer(viewer)
+                gv.keyPress.connect(self.imageKeyPressEvent)
+
+                #  use the same image adjustments as the main viewers
+                if camera == self.leftCamera:
+                    gv.image.setParameters(self.gvLeft.image.getParameters())
+                elif camera == self.rightCamera:
+                    gv.image.setParameters(self.gvRight.image.getParameters())
+                else:
+                    adjustments = self.metadata.getImageAdjustments(camera)
+                    if (adjustments):
+                        gv.image.setParameters(pickle.loads(adjustments))
+
+                self.displayedNumber[viewer] = None
+                self.displayedScale[viewer] = 1
+                self.displayedFromStore[viewer] = False
+                self.displayedEnhanceKey[viewer] = None
+                self.enhancement.pop(viewer, None)
+            self.createFrameHud(self.gridView.viewerKeys())
+            self.gridView.show()
+
+            #  reload the current frame
+            self.lastNumberLoaded = -1
+            self.changeImage()
+        else:
+            self.saveGridAdjustments()
+            for viewer in self.gridView.viewerKeys():
+                for state in [self.displayedNumber, self.displayedScale,
+                        self.displayedFromStore, self.displayedEnhanceKey,
+                        self.enhancement, self.enhanceSkipped, self.hudItems,
+                        self.hudText]:
+                    state.pop(viewer, None)
+            self.gridView.hide()
+            self.gridView.clear()
+
+            #  make sure the pending frame doesn't load the grid images
+            if self.pendingFrame is not None:
+                self.pendingFrame[1] = self.getFramePaths(self.pendingFrame[0])
+
+
+    def gridViewClosed(self):
+        '''
+        gridViewClosed is called when the user closes the grid view window
+        '''
+        self.actionGridView.setChecked(False)
+
+
+    def saveGridAdjustments(self):
+        '''
+        saveGridAdjustments stores the image adjustment parameters of the grid viewers
+        for the cameras that aren't shown in the left and right viewers
+        '''
+        for camera in self.gridView.cameras:
+            if camera in [self.leftCamera, self.rightCamera]:
+                continue
+            adjustments = self.gridView.viewers[camera].image.getParameters()
+            self.metadata.setImageAdjustments(camera, pickle.dumps(adjustments, 2))
+
+
+    def getImagePath(self, camera, number):
+        '''
+        getImagePath returns the full path, without the extension, of the image for
+        the provided camera and image number. None is returned if the image isn't
+        in the metadata.
+        '''
         try:
-            attitudeString = self.metadata.sensorData['CTControl']['$OHPR'][number]
-            stringParts = attitudeString.split(',')
-            self.yaw.setText(self.convertFloatToString(stringParts[1]))
-            self.pitch.setText(self.convertFloatToString(stringParts[2]))
-            self.roll.setText(self.convertFloatToString(stringParts[3]))
-            self.depth.setText(self.convertFloatToString(stringParts[5]))
+            imageName = self.metadata.imageData[camera][number][2]
+            imagePath = str(self.dataDir + os.path.sep + "images" + os.path.sep +
+                    camera + os.path.sep + imageName)
+            imagePath = os.path.normpath(imagePath)
         except:
-            #  there probably isn't any sensor data available...
-            pass
+            imagePath = None
+
+        return imagePath
+
+
+    def prefetchImages(self, imageIndex):
+        '''
+        prefetchImages updates the prefetcher with the new slider index and queues
+        the frames it predicts will be needed next for both cameras. Prefetched
+        frames are queued at a lower priority than the displayed frames.
+        '''
+
+        indexes = self.prefetcher.update(imageIndex, 0, len(self.metadata.imageNumbers) - 1)
+
+        #  if the direction or stride has changed, the queued prefetch requests are
+        #  for frames we probably won't need so cancel them
+        stride = self.prefetcher.stride()
+        if stride != self.lastPrefetchStride:
+            self.imageLoader.cancelPrefetch()
+            self.prefetchPending = set()
+            self.lastPrefetchStride = stride
+
+        for index in indexes:
+            #  don't let the prefetch requests pile up if the workers can't keep up
+            if self.imageLoader.prefetchDepth() >= 2 * self.prefetcher.nAhead:
+                break
+
+            number = self.metadata.imageNumbers[index]
+            self.requestSequence += 1
+            frame = imageLoader.FrameRequest(number, self.requestSequence, prefetch=True)
+            for viewer in self.getViewerKeys():
+                camera = self.getViewerCamera(viewer)
+                scale = self.getDecodeScale(viewer)
+                key = self.getCacheKey(camera, number, scale)
+                enhanceKey, enhancer = self.getEnhancement(viewer)
+                image, enhanced, cachedScale = self.getCachedFrame(camera, number, scale,
+                        enhanceKey, count=False)
+                if image is None and enhanced is None:
+                    image, storeScale = self.getReviewFrame(viewer, number)
+                if image is not None or enhanced is not None or key in self.prefetchPending:
+                    continue
+                path = self.getImageFile(camera, number)
+                if path:
+                    self.prefetchPending.add(key)
+                    request = frame.addImage(viewer, path, scale=scale)
+                    self.setEnhancement(request, enhanceKey, enhancer)
+
+            if frame.needsDecode():
+                self.imageLoader.loadFrame(frame)
+
+
+    def resetFrameCache(self):
+        '''
+        resetFrameCache empties the frame cache and resets the prefetcher. Prefetch
+        requests that are still in the loader's queue will be ignored when they
+        are returned.
+        '''
+        self.frameCache.clear()
+        self.frameCache.resetCounters()
+        self.updateCacheStats()
+        self.prefetcher.reset()
+        self.prefetchPending = set()
+        self.lastPrefetchStride = 0
+        self.imageLoader.cancelPrefetch()
+        self.cacheValidSequence = self.requestSequence
 
 
     def convertFloatToString(self, val, format='%.1f', badVal='--.-'):
@@ -1012,10 +2559,10 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
 
     def changeImage(self):
         '''
-        This method is called whenever the image number changes. Images are put into a
-        queue to be loaded by a timer event. We do this so we can easily discard images
-        when the user drags the slider so the GUI doesn't get bogged down sequentially
-        loading all of those images.
+        This method is called whenever the image number changes. The new images replace
+        any pending images and are handed to the loader by a timer event. We do this so
+        the images the user drags past are discarded and the GUI doesn't get bogged down
+        sequentially loading all of those images.
         '''
 
         #  get the current image index
@@ -1040,35 +2587,25 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
             self.marksDescription.setText('')
             self.pbDeleteMark.setEnabled(False)
 
-        #  get the left image name
-        try:
-            imageName = self.metadata.imageData[self.leftCamera][number][2]
-            imagePath = str(self.dataDir + os.path.sep + "images" + os.path.sep +
-                    self.leftCamera + os.path.sep + imageName)
-            leftImage = os.path.normpath(imagePath)
-        except:
-            leftImage = None
+        #  get the image names - these replace any frame that hasn't been loaded yet
+        self.pendingFrame = [number, self.getFramePaths(number), time.perf_counter()]
 
-        #  check the length of our left image queue and trim if needed
-        nQueued = len(self.leftImageQueue)
-        if nQueued > self.maxQueuedImages:
-            self.leftImageQueue.pop(0)
-        self.leftImageQueue.append([number, leftImage])
+        #  let the user know if the frame has bad files - they aren't loaded
+        if self.fileIndex is not None:
+            badFiles = [camera + ' image is ' + self.fileIndex.getStatusText(camera, number)
+                    for camera in [self.leftCamera, self.rightCamera]
+                    if self.fileIndex.isBad(camera, number)]
+            if badFiles:
+                self.statusBar.showMessage('Frame ' + str(number) + ': ' +
+                        ', '.join(badFiles), 2000)
 
-        #  get the right image name
-        try:
-            imageName = self.metadata.imageData[self.rightCamera][number][2]
-            imagePath = str(self.dataDir + os.path.sep + "images" + os.path.sep +
-                    self.rightCamera + os.path.sep + imageName)
-            rightImage = os.path.normpath(imagePath)
-        except:
-            rightImage = None
+        #  and queue up the images we expect to need next
+        self.prefetchImages(imageIndex)
+        self.prefetchDiskCache(imageIndex)
 
-        #  check the length of our queue and trim if needed
-        nQueued = len(self.rightImageQueue)
-        if nQueued > self.maxQueuedImages:
-            self.rightImageQueue.pop(0)
-        self.rightImageQueue.append([number, rightImage])
+        #  (re)start the settle timer which will reload reduced resolution images and
+        #  thumbnails at full resolution once the slider stops moving
+        self.settleTimer.start(self.settleDelay)
 
 
     def exportImages(self):
@@ -1093,37 +2630,91 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
         #  update the default output dir
         self.copyDir = os.path.split(exportFilename)[0]
 
-        #  render the images and combine - for now we don't have a way to enable/disable
-        #  HUD export so we're just forcing it.
-        if True: #self.exportHUD:
-            rightFrame = self.gvRight.renderView(asNDarray=True)
-            leftFrame = self.gvLeft.renderView(asNDarray=True)
-        else:
-            rightFrame = self.gvRight.renderScene(width=self.gvRight.width(),
-                    height=self.gvRight.height(), asNDarray=True)
-            leftFrame = self.gvLeft.renderScene(width=self.gvLeft.width(),
-                    height=self.gvLeft.height(), asNDarray=True)
-        combinedFrame = cv2.hconcat([leftFrame, rightFrame])
-
-        #  remove the alpha layer
-        combinedFrame = cv2.cvtColor(combinedFrame, cv2.COLOR_BGRA2BGR)
+        #  make sure the viewers are showing a synchronized, full resolution pair
+        if (self.pendingFrame is not None or
+                self.displayedNumber['left'] != self.displayedNumber['right'] or
+                self.displayedScale['left'] != 1 or self.displayedScale['right'] != 1):
+            self.lastNumberLoaded = -1
+            self.changeImage()
+            self.processQueue(synchronous=True)
+
+        #  render the images into the snapshot buffer. The buffer is reused until the
+        #  viewers are resized. For now we don't have a way to enable/disable HUD
+        #  export so we're just forcing it.
+        sizes = [[self.gvLeft.viewport().width(), self.gvLeft.viewport().height()],
+                [self.gvRight.viewport().width(), self.gvRight.viewport().height()]]
+        if self.snapshotCompositor is None or self.snapshotSizes != sizes:
+            self.snapshotCompositor = frameCompositor.FrameCompositor(sizes)
+            self.snapshotSizes = sizes
+        combinedFrame = self.snapshotCompositor.compose([self.gvLeft, self.gvRight],
+                showHud=True)
 
         #  write the image
         cv2.imwrite(exportFilename, combinedFrame)
 
 
+    def getPlaybackSpeed(self):
+        '''
+        getPlaybackSpeed returns the playback speed multiplier. The speed dial is in
+        frames per second at the deployment's base frame rate so the multiplier is
+        the dial value divided by the base rate.
+        '''
+        return self.playSpeedDial.value() / self.videoBaseRate
+
+
     def speedSet(self):
-        self.playTimer.setInterval(int(1./self.playSpeedDial.value()*1000))
+        if self.playbackClock is not None:
+            self.playbackClock.setSpeed(self.getPlaybackSpeed(), self.imageSlider.value(),
+                    time.perf_counter())
+            self.moveSlider()
+
+
+    def setPlaybackMode(self, everyFrame):
+        '''
+        setPlaybackMode sets whether playback shows every frame or holds real time
+        '''
+        if everyFrame:
+            mode = playbackEngine.PlaybackClock.EVERY_FRAME
+        else:
+            mode = playbackEngine.PlaybackClock.REAL_TIME
+        self.appSettings.setValue('playbackmode', mode)
+        if self.playbackClock is not None:
+            self.playbackClock.mode = mode
 
 
     def play(self):
         if self.playBtn.isChecked():
             self.playBtn.setStyleSheet(self.green)
-            self.playTimer.setInterval(int(1./self.playSpeedDial.value()*1000))
-            self.playTimer.start()
+
+            #  get the image times - they're in the frame table if it has been built
+            if self.frameTable is not None:
+                frameTimes = self.frameTable.times
+            else:
+                frameTimes = frameTable.getFrameTimes(self.metadata, self.cameras)
+
+            #  create the clock and start it at the current image
+            if self.actionPlayEveryFrame.isChecked():
+                mode = playbackEngine.PlaybackClock.EVERY_FRAME
+            else:
+                mode = playbackEngine.PlaybackClock.REAL_TIME
+            self.playbackClock = playbackEngine.PlaybackClock(frameTimes, mode=mode)
+            self.playbackClock.start(self.imageSlider.value(), self.getPlaybackSpeed(),
+                    time.perf_counter())
+            self.moveSlider()
         else:
             self.playBtn.setStyleSheet(self.gray)
             self.playTimer.stop()
+            self.playbackClock = None
+            self.playbackLabel.setText('')
+
+
+    def stopPlayback(self):
+        '''
+        stopPlayback stops playback if we're playing
+        '''
+        if self.playBtn.isChecked():
+            self.playBtn.setChecked(False)
+            self.play()
 
 
     def exportData(self):
@@ -1168,7 +2759,43 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
 
 
     def moveSlider(self):
-        self.imageSlider.setValue(self.imageSlider.value()+1)
+        '''
+        moveSlider is called by the playback timer. It advances the slider to the
+        frame the playback clock says should be showing and restarts the timer for
+        the next frame. We don't advance until the current frame has been displayed
+        so when decoding falls behind, real time playback skips frames and every
+        frame playback slows down.
+        '''
+
+        if self.playbackClock is None:
+            return
+
+        index = self.imageSlider.value()
+        if self.playbackClock.isFinished(index):
+            #  we've reached the end of the deployment
+            self.stopPlayback()
+            return
+
+        if self.pendingFrame is not None or self.imageLoader.queueDepth() > 0:
+            #  the current frame hasn't been displayed yet - check back shortly
+            self.playTimer.start(5)
+            return
+
+        now = time.perf_counter()
+        nDropped = self.playbackClock.nDropped
+        nextIndex = self.playbackClock.nextIndex(index, now)
+        if self.qualityGovernor.addMisses(self.playbackClock.nDropped - nDropped, now):
+            self.applyQualityLevel()
+        if nextIndex is not None:
+            self.imageSlider.setValue(nextIndex)
+            index = nextIndex
+            self.playbackLabel.setText('Playback: %.1f/%.1f fps  Dropped: %d' %
+                    (self.playbackClock.achievedRate(), self.playbackClock.requestedRate(),
+                    self.playbackClock.nDropped))
+
+        #  schedule the next frame
+        wait = self.playbackClock.timeUntilNext(index, time.perf_counter())
+        self.playTimer.start(max(1, int(wait * 1000)))
 
 
     def checkWindowLocation(self, position, size, padding=[5, 25]):
@@ -1242,6 +2869,13 @@ class CamtrawlBrowser(QMainWindow, ui_CamtrawlBrowser.Ui_CamtrawlBrowser):
 
 if __name__ == "__main__":
 
+    #  the video exporter uses worker processes which need this when frozen
+    multiprocessing.freeze_support()
+
+    #  the export commands run without the GUI
+    if len(sys.argv) > 1 and sys.argv[1] in ['export-video', 'export-manifest']:
+        sys.exit(batchExport.main(sys.argv[1:]))
+
     #  create the argument parser. Set the application description.
     parser = argparse.ArgumentParser(description='CamtrawlEchogram')
 
@@ -1255,6 +2889,8 @@ if __name__ == "__main__":
     parser.add_argument("-b", "--bio_schema", help="Specify the biological database schema to use.")
     parser.add_argument("--reset_window", default=False, action='store_true',
             help="Reset the window location(s) to their default values")
+    parser.add_argument("--decode_workers", type=int, default=None,
+            help="The number of threads used to decode images. This value is saved.")
 
     #  parse our arguments
     args = parser.parse_args()
@@ -1277,7 +2913,8 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
 
     #  create the main application window
-    window = CamtrawlBrowser(resetWindowPosition=args.reset_window)
+    window = CamtrawlBrowser(resetWindowPosition=args.reset_window,
+            decodeWorkers=args.decode_workers)
     window.show()
 
     #  start event processing
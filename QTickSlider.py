@@ -7,13 +7,15 @@ class QTickSlider(QSlider):
 
     """
     QTickSlider is an reimplementation of QSlider that draws tick marks on the slider
-    at specified positions. The marks can optionally have labels.
+    at specified positions. The marks can optionally have labels. Ranges of
+    positions can be marked with a single unlabeled band.
     """
 
     def __init__(self, *args, **kwargs):
         QSlider.__init__(self, *args, **kwargs)
 
         self.ticks = {}
+        self.tickRanges = {}
         self.font = QFont('helvetica', 8, -1, False)
         self.showLabel = True
 
@@ -31,11 +33,33 @@ class QTickSlider(QSlider):
         self.update()
 
 
+    def addTickRange(self, name, start, end, padding=10, color=[0,0,0],
+            thickness=1.0, alpha=255):
+        """
+        addTickRange marks the positions from start to end (inclusive) with a band.
+        The band is at least thickness pixels wide so a range of one position is
+        drawn like a tick.
+        """
+
+        self.tickRanges[name] = [start, end, padding/2, color, thickness, alpha]
+        self.update()
+
+
+    def removeTickRange(self, name):
+        """
+        removeTickRange removes the specified tick range from the slider. It will
+        silently ignore ranges that don't exist.
+        """
+        self.tickRanges.pop(name, None)
+        self.update()
+
+
     def removeAllTicks(self):
         """
-        removeAllTicks removes all ticks from the slider
+        removeAllTicks removes all ticks and tick ranges from the slider
         """
         self.ticks = {}
+        self.tickRanges = {}
         self.update()
 
 
@@ -96,6 +120,10 @@ class QTickSlider(QSlider):
         #  calculate the slider span
         span = float(self.maximum() - self.minimum() + 1)
 
+        #  draw the tick ranges first so the ticks are drawn on top of them
+        for tickRange in self.tickRanges.values():
+            self.drawTickRange(painter, tickRange, span)
+
         if (self.showLabel):
             #  get the font metrics and calculate text width and height
             fontMetrics = QFontMetrics(self.font)
@@ -143,15 +171,45 @@ class QTickSlider(QSlider):
             tickLine = QLineF(p1, p2)
 
             #  get the pen to draw the line
-            pen = self.getPen(self.ticks[tick][2], self.ticks[tick][4], '_', self.ticks[tick][3])
+            pen = self.getPen(self.ticks[tick][2], self.ticks[tick][4], '_',
+                    self.ticks[tick][3])
             painter.setPen(pen)
 
             #  and finally draw it
             painter.drawLine(tickLine)
 
             if (self.showLabel):
-                painter.drawText(QRectF(textX, textY, textWidth, textHeight), Qt.AlignmentFlag.AlignHCenter, str(tick))
+                painter.drawText(QRectF(textX, textY, textWidth, textHeight),
+                        Qt.AlignmentFlag.AlignHCenter, str(tick))
+
+
+
+    def drawTickRange(self, painter, tickRange, span):
+        """
+        drawTickRange draws a tick range as a filled band across the slider
+        """
+
+        start, end, padding, color, thickness, alpha = tickRange
+        if (self.orientation() == Qt.Orientation.Horizontal):
+            length = self.width()
+        else:
+            length = self.height()
+
+        #  calculate the positions of the range's ends like we do for ticks
+        pct1 = (start - self.minimum()) / span
+        pct2 = (end - self.minimum()) / span
+        p1 = (pct1 * length) - ((pct1 - 0.5) * self.sliderThickness)
+        p2 = (pct2 * length) - ((pct2 - 0.5) * self.sliderThickness)
+        if (p2 - p1 < thickness):
+            p1 -= (thickness - (p2 - p1)) / 2.0
+            p2 = p1 + thickness
+
+        if (self.orientation() == Qt.Orientation.Horizontal):
+            rect = QRectF(p1, padding, p2 - p1, self.height() - 2 * padding - 1)
+        else:
+            rect = QRectF(padding, p1, self.width() - 2 * padding - 1, p2 - p1)
 
+        painter.fillRect(rect, QColor(color[0], color[1], color[2], alpha))
 
 
     def getPen(self, color, alpha, style, width):
@@ -0,0 +1,318 @@
+'''
+batchExport exports deployment videos from the command line without opening the
+browser's window. It uses the same metadata, frame rate, and export pipeline as
+File->Export Video so overnight exports of a whole cruise can be scripted.
+
+Export a single deployment:
+
+    CamtrawlBrowser.py export-video <deployment> [--start N] [--end N] [--step N]
+            [--speed X] [--hud] [--enhance] [--height N] [--output FILE]
+
+Export every deployment listed in a manifest:
+
+    CamtrawlBrowser.py export-manifest <manifest> [--output_dir DIR]
+
+Each non-blank line of a manifest holds the arguments for one export-video
+command, for example:
+
+    D:/cruise/D20230512-T101010 --speed 2 --hud
+    D:/cruise/D20230512-T124502 --start 1200 --end 5400 --step 2
+
+Lines starting with # are ignored. If a deployment fails to export the error is
+reported and the remaining deployments are exported. Long exports that were
+interrupted resume from their last completed segment when they are run again.
+'''
+
+import sys
+import os
+import shlex
+import pickle
+import argparse
+import multiprocessing
+from PyQt6.QtCore import *
+from PyQt6.QtWidgets import *
+from MaceFunctions import CamtrawlMetadata
+from MaceFunctions.QImageViewer.QImageViewer import QImageViewer
+import imageEnhancer
+import imageLoader
+import frameTable
+import videoExporter
+
+
+#  the exported height of each camera's images if it isn't specified
+DEFAULT_HEIGHT = 720
+
+#  the ViewerProbe used to measure the enhancements. It is created when needed.
+enhanceProbe = None
+
+
+def main(argv):
+    '''
+    main runs the export-video or export-manifest command. Returns the process
+    exit status which is 0 if all of the exports completed.
+    '''
+    parser = argparse.ArgumentParser(prog='CamtrawlBrowser',
+            description='Export CamTrawl deployment videos without opening the browser.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    videoParser = commands.add_parser('export-video',
+            help='Export the video for a single deployment.')
+    addExportArguments(videoParser)
+    addProcessArguments(videoParser)
+
+    manifestParser = commands.add_parser('export-manifest',
+            help='Export the videos for the deployments listed in a manifest file.')
+    manifestParser.add_argument('manifest', help='The manifest file. Each line holds ' +
+            'the export-video arguments for one deployment.')
+    manifestParser.add_argument('--output_dir', default=None,
+            help='The directory videos are written to if a line doesn\'t specify an output.')
+    addProcessArguments(manifestParser)
+
+    args = parser.parse_args(argv)
+
+    #  the exporter is a QThread and uses signals and the enhancements are measured
+    #  with a hidden QImageViewer so we need an application instance. The offscreen
+    #  platform is used unless another is set so a display isn't needed.
+    app = QApplication.instance()
+    if app is None:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        app = QApplication(sys.argv)
+
+    if args.command == 'export-video':
+        return 0 if exportDeployment(args, args) else 1
+
+    #  parse the manifest lines with the export-video arguments
+    lineParser = argparse.ArgumentParser(prog='export-video', exit_on_error=False)
+    addExportArguments(lineParser)
+    try:
+        with open(args.manifest, 'r') as f:
+            lines = f.readlines()
+    except OSError as e:
+        print('Unable to read manifest ' + args.manifest + ': ' + str(e))
+        return 1
+
+    nFailed = 0
+    nExports = 0
+    for lineNumber, line in enumerate(lines):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        nExports += 1
+        try:
+            exportArgs = lineParser.parse_args(shlex.split(line, posix=(os.name != 'nt')))
+        except (argparse.ArgumentError, ValueError, SystemExit) as e:
+            print('Line %d of the manifest is invalid: %s' % (lineNumber + 1, str(e)))
+            nFailed += 1
+            continue
+        if exportArgs.output is None and args.output_dir is not None:
+            exportArgs.output = os.path.join(args.output_dir,
+                    getDeploymentName(exportArgs.deployment) + '.mp4')
+        if not exportDeployment(exportArgs, args):
+            nFailed += 1
+
+    print('Exported %d of %d deployments' % (nExports - nFailed, nExports))
+
+    return 1 if nFailed else 0
+
+
+def addExportArguments(parser):
+    '''
+    addExportArguments adds the arguments that describe a single export
+    '''
+    parser.add_argument('deployment', help='The deployment directory.')
+    parser.add_argument('--output', default=None, help='The video file. The default ' +
+            'is the deployment name with an mp4 extension in the current directory.')
+    parser.add_argument('--start', type=int, default=None,
+            help='The first image number exported. The default is the first image.')
+    parser.add_argument('--end', type=int, default=None,
+            help='The last image number exported. The default is the last image.')
+    parser.add_argument('--step', type=int, default=1,
+            help='Export every Nth image.')
+    parser.add_argument('--speed', type=float, default=1.0,
+            help='The playback speed relative to real time.')
+    parser.add_argument('--hud', default=False, action='store_true',
+            help='Draw the camera, image number, and time on the video.')
+    parser.add_argument('--enhance', default=False, action='store_true',
+            help='Apply the image adjustments saved in the deployment.')
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT,
+            help='The height of each camera\'s images in the video.')
+    parser.add_argument('--left', default=None,
+            help='The camera shown on the left. The default is the camera labeled left.')
+    parser.add_argument('--right', default=None,
+            help='The camera shown on the right. The default is the camera labeled right.')
+
+
+def addProcessArguments(parser):
+    '''
+    addProcessArguments adds the arguments that control how videos are encoded
+    '''
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(),
+            help='The number of processes used to encode long videos.')
+    parser.add_argument('--ffmpeg', default=None,
+            help='The path to ffmpeg which is needed to encode in parallel.')
+
+
+def exportDeployment(exportArgs, processArgs):
+    '''
+    exportDeployment exports the video for one deployment. Returns True if the
+    video was exported.
+    '''
+    dataDir = os.path.normpath(exportArgs.deployment)
+    videoFilename = exportArgs.output
+    if videoFilename is None:
+        videoFilename = getDeploymentName(dataDir) + '.mp4'
+    videoFilename = os.path.splitext(videoFilename)[0] + '.mp4'
+
+    print('Exporting ' + dataDir + ' to ' + videoFilename)
+
+    metadata = CamtrawlMetadata.CamTrawlMetadata()
+    try:
+        metadata.open(dataDir)
+        metadata.query()
+    except:
+        print('  Unable to open the deployment\'s metadata database.')
+        return False
+
+    try:
+        job = createJob(metadata, dataDir, videoFilename, exportArgs)
+    except ValueError as e:
+        print('  ' + str(e))
+        return False
+    finally:
+        metadata.close()
+
+    ffmpeg = videoExporter.findFFmpeg(processArgs.ffmpeg)
+    if ffmpeg is None and len(job.numbers) > videoExporter.CHECKPOINT_FRAMES:
+        print('  ffmpeg wasn\'t found. The video will be encoded in a single process ' +
+                'and can\'t be resumed.')
+    exporter = videoExporter.VideoExporter(job, nProcesses=processArgs.processes,
+            ffmpeg=ffmpeg)
+    lastProgress = [-10]
+
+    def reportProgress(progress):
+        if progress >= lastProgress[0] + 10:
+            print('  %d%%' % progress)
+            lastProgress[0] = progress
+
+    result = []
+    exporter.progress.connect(reportProgress)
+    exporter.exportDone.connect(lambda completed, message: result.extend([completed, message]))
+
+    #  run the export in this thread - there is no event loop to return to
+    exporter.run()
+    print('  ' + result[1])
+
+    return result[0]
+
+
+def createJob(metadata, dataDir, videoFilename, exportArgs):
+    '''
+    createJob returns the ExportJob for a deployment. A ValueError is raised if
+    the export can't be set up.
+    '''
+    leftCamera, rightCamera = getCameras(metadata, exportArgs.left, exportArgs.right)
+
+    #  get the image numbers we're exporting. They are picked the same way as when
+    #  exporting from the browser.
+    if not metadata.imageNumbers:
+        raise ValueError('The deployment doesn\'t have any images.')
+    startFrame = exportArgs.start if exportArgs.start is not None else metadata.startImage
+    endFrame = exportArgs.end if exportArgs.end is not None else metadata.endImage
+    numbers = videoExporter.getExportNumbers(frameTable.ImageIndex(metadata.imageNumbers),
+            startFrame, endFrame, exportArgs.step)
+    if not numbers:
+        raise ValueError('There are no images between %d and %d.' % (startFrame, endFrame))
+
+    videoFPS = videoExporter.getVideoBaseRate(metadata) * exportArgs.speed
+
+    sides = []
+    for camera in [leftCamera, rightCamera]:
+        paths = [videoExporter.getImageFile(metadata, dataDir, camera, n) for n in numbers]
+        fullSize = getImageSize(paths)
+        if fullSize is None:
+            raise ValueError('Unable to read any images for camera ' + camera + '.')
+        height = videoExporter.setVideoSize(exportArgs.height)
+        size = [videoExporter.setVideoSize(height * fullSize[0] / float(fullSize[1])), height]
+
+        enhancer = None
+        enhanceText = 'Enhancements: Off'
+        if exportArgs.enhance:
+            adjustments = metadata.getImageAdjustments(camera)
+            if adjustments:
+                enhancer = getEnhancer(pickle.loads(adjustments))
+                if enhancer is None:
+                    print('  The image enhancements for ' + camera + ' can\'t be ' +
+                            'applied. The video is exported without them.')
+            if enhancer is not None:
+                enhanceText = 'Enhancements: On'
+
+        sides.append(videoExporter.ExportSide(camera, size, paths,
+                [videoExporter.getTimeString(metadata, camera, n) for n in numbers],
+                enhancer=enhancer, fullSize=fullSize, enhanceText=enhanceText))
+
+    return videoExporter.ExportJob(videoFilename, videoFPS, numbers, sides,
+            showHud=exportArgs.hud)
+
+
+def getCameras(metadata, leftCamera=None, rightCamera=None):
+    '''
+    getCameras returns the left and right cameras. Cameras that aren't specified
+    are found using the camera labels, like the browser does when a deployment is
+    opened. Since we can't ask, unlabeled cameras are assigned in name order.
+    '''
+    cameras = list(metadata.cameras.keys())
+    for camera in cameras:
+        if rightCamera is None and metadata.cameras[camera]['label'].lower() == 'right':
+            rightCamera = camera
+        if leftCamera is None and metadata.cameras[camera]['label'].lower() == 'left':
+            leftCamera = camera
+
+    unassigned = sorted([camera for camera in cameras if camera not in
+            [leftCamera, rightCamera]])
+    if leftCamera is None and unassigned:
+        leftCamera = unassigned.pop(0)
+    if rightCamera is None and unassigned:
+        rightCamera = unassigned.pop(0)
+
+    for camera in [leftCamera, rightCamera]:
+        if camera not in cameras:
+            raise ValueError('The deployment doesn\'t have a camera named ' + str(camera) + '.')
+
+    return leftCamera, rightCamera
+
+
+def getEnhancer(parameters):
+    '''
+    getEnhancer returns the ImageEnhancer for the provided viewer adjustment
+    parameters or None if they can't be expressed as a lookup table. The table is
+    measured with a hidden QImageViewer, the same way the browser does.
+    '''
+    global enhanceProbe
+
+    if enhanceProbe is None:
+        enhanceProbe = imageEnhancer.ViewerProbe(QImageViewer())
+
+    return imageEnhancer.ImageEnhancer.fromViewer(enhanceProbe(parameters))
+
+
+def getImageSize(paths):
+    '''
+    getImageSize returns the full width and height of the first of the provided
+    images that can be read. The image is decoded at 1/8 scale which is enough to
+    get its size. None is returned if none of the images can be read.
+    '''
+    for path in paths:
+        if path is None:
+            continue
+        try:
+            image = imageLoader.decodeImage(path, scale=8)
+        except:
+            continue
+        return [image.shape[1] * 8, image.shape[0] * 8]
+
+    return None
+
+
+def getDeploymentName(dataDir):
+    return os.path.basename(os.path.normpath(dataDir))
+
@@ -0,0 +1,609 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import threading
+import collections
+from PyQt6.QtCore import *
+import numpy as np
+
+
+class DiskCache(object):
+    '''
+    DiskCache is a read-through cache of image files on the local disk. It is used
+    when deployments are on network shares where the per file latency dominates the
+    time it takes to load an image. Files that are read through the cache are copied
+    into the cache directory and later reads are served from the local copy. When
+    the cache exceeds its size cap, the least recently used files are deleted.
+
+    Files are stored in the cache under the deployment's key (see deploymentKey)
+    and their path relative to the deployment. The cached file name includes the
+    source file's size and modification time so a source file that is replaced
+    after it was cached is read from the source again instead of being served
+    stale. The source files aren't stat'ed for every read. When a deployment is
+    set, each source directory with cached files is listed once in a background
+    thread (see verify) and reads of the files in the listed directories are served
+    without touching the source.
+
+    The cache can also keep a local working copy of the deployment's metadata
+    database. See localizeMetadata and syncMetadata.
+
+    The cache is used by the image loader threads, the prefetch thread and the
+    video exporter so access to the index and counters is protected by a mutex.
+    The cache directory is scanned in a background thread so creating the cache
+    doesn't block the GUI.
+    '''
+
+    def __init__(self, cacheDir, maxMB=10240):
+
+        self.cacheDir = os.path.normpath(cacheDir)
+        self.maxBytes = int(maxMB * 1024 * 1024)
+        self.files = collections.OrderedDict()
+        self.nBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.sourceDir = None
+        self.deploymentKey = None
+        self.localized = {}
+        self.sourceStates = {}
+        self.verifyThread = None
+        self.lock = QMutex()
+
+        self.scanThread = threading.Thread(target=self.scan, daemon=True)
+        self.scanThread.start()
+
+
+    def scan(self):
+        '''
+        scan builds the cache index from the files in the cache directory. The files
+        are ordered by modification time which we update when a file is used. The
+        metadata database copies in the logs directories are not part of the index
+        and are never evicted. Files that were cached while the scan was running are
+        kept as the most recently used.
+        '''
+
+        entries = []
+        for root, dirs, files in os.walk(self.cacheDir):
+            if 'logs' in dirs:
+                dirs.remove('logs')
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append([stat.st_mtime, path, stat.st_size])
+        entries.sort()
+
+        self.lock.lock()
+        files = collections.OrderedDict()
+        for mtime, path, size in entries:
+            files[path] = size
+        for path, size in self.files.items():
+            files[path] = size
+            files.move_to_end(path)
+        self.files = files
+        self.nBytes = sum(files.values())
+        self.lock.unlock()
+
+        self.evict()
+
+
+    def setDeployment(self, dataDir):
+        '''
+        setDeployment sets the deployment whose files are being cached and starts
+        checking the deployment's cached files against the source files
+        '''
+        self.lock.lock()
+        self.sourceDir = os.path.normpath(dataDir)
+        self.deploymentKey = deploymentKey(self.sourceDir)
+        self.sourceStates = {}
+        self.lock.unlock()
+
+        self.verifyThread = threading.Thread(target=self.verify,
+                args=(self.sourceDir, self.deploymentKey), daemon=True)
+        self.verifyThread.start()
+
+
+    def verify(self, sourceDir, key):
+        '''
+        verify checks a deployment's cached files against the source files. Each
+        source directory with cached files is listed once and the sizes and
+        modification times of its files are kept so getCachePath doesn't have to
+        stat them. Cached copies of files that have changed or are gone are removed.
+        Directories that can't be listed are left to be checked file by file.
+        '''
+
+        #  the cache index is built by the scan thread
+        self.scanThread.join()
+
+        localDir = os.path.join(self.cacheDir, key)
+        self.lock.lock()
+        cached = [path for path in self.files if path.startswith(localDir + os.sep)]
+        self.lock.unlock()
+        directories = collections.defaultdict(list)
+        for path in cached:
+            directories[os.path.dirname(os.path.relpath(path, localDir))].append(path)
+
+        for relDir, paths in directories.items():
+            states = listDirectory(os.path.join(sourceDir, relDir))
+            if states is None:
+                continue
+
+            self.lock.lock()
+            if self.deploymentKey != key:
+                #  the deployment was changed while we were listing
+                self.lock.unlock()
+                return
+            states.update(self.sourceStates.get(relDir, {}))
+            self.sourceStates[relDir] = states
+            self.lock.unlock()
+
+            for path in paths:
+                name, state = splitCacheName(path)
+                if states.get(name) != state:
+                    self.remove(path)
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+
+    def getCachePath(self, sourcePath):
+        '''
+        getCachePath returns the path of the cached copy of a deployment file or None
+        if the file isn't in the deployment directory. The path includes the source
+        file's size and modification time which are taken from the source directory's
+        listing if it has been listed by verify. Otherwise the file is stat'ed and an
+        OSError is raised if it can't be.
+        '''
+        if self.sourceDir is None:
+            return None
+
+        relPath = os.path.relpath(os.path.normpath(sourcePath), self.sourceDir)
+        if relPath.startswith(os.pardir):
+            return None
+
+        relDir, name = os.path.split(relPath)
+        self.lock.lock()
+        state = self.sourceStates.get(relDir, {}).get(name)
+        self.lock.unlock()
+        if state is None:
+            stat = os.stat(sourcePath)
+            state = [stat.st_size, stat.st_mtime_ns]
+
+        return os.path.join(self.cacheDir, self.deploymentKey, relPath + '.%d_%d' %
+                tuple(state))
+
+
+    def read(self, sourcePath):
+        '''
+        read returns the contents of a file as a uint8 numpy array. The file is read
+        from the cache if we have a copy of the current source file. Otherwise it is
+        read from the source and added to the cache.
+        '''
+
+        cachePath = self.getCachePath(sourcePath)
+        if cachePath is None:
+            return np.fromfile(sourcePath, dtype=np.uint8)
+
+        self.lock.lock()
+        cached = cachePath in self.files
+        if cached:
+            self.files.move_to_end(cachePath)
+        self.lock.unlock()
+
+        if cached:
+            try:
+                data = np.fromfile(cachePath, dtype=np.uint8)
+                #  update the modification time so the LRU order survives a restart
+                os.utime(cachePath)
+                self.lock.lock()
+                self.hits += 1
+                self.lock.unlock()
+                return data
+            except OSError:
+                #  the cached file is gone - remove it from the index
+                self.remove(cachePath)
+
+        self.lock.lock()
+        self.misses += 1
+        self.lock.unlock()
+        data = np.fromfile(sourcePath, dtype=np.uint8)
+        self.store(cachePath, data)
+
+        return data
+
+
+    def fetch(self, sourcePath):
+        '''
+        fetch copies a file into the cache if it isn't already cached. This is used
+        by the prefetch thread.
+        '''
+        try:
+            cachePath = self.getCachePath(sourcePath)
+        except OSError:
+            return
+        if cachePath is None or self.contains(cachePath):
+            return
+
+        try:
+            data = np.fromfile(sourcePath, dtype=np.uint8)
+        except OSError:
+            return
+        self.store(cachePath, data)
+
+
+    def contains(self, cachePath):
+        self.lock.lock()
+        cached = cachePath in self.files
+        self.lock.unlock()
+
+        return cached
+
+
+    def store(self, cachePath, data):
+        '''
+        store writes data to the cache. The file is written to a temporary name and
+        then renamed so a partially written file is never used.
+        '''
+        if data.size == 0 or data.nbytes > self.maxBytes:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+            tempPath = cachePath + '.' + str(threading.get_ident()) + '.tmp'
+            data.tofile(tempPath)
+            os.replace(tempPath, cachePath)
+        except:
+            #  the cache is a convenience - if we can't write it just carry on
+            return
+
+        self.lock.lock()
+        if cachePath in self.files:
+            self.nBytes -= self.files[cachePath]
+        self.files[cachePath] = data.nbytes
+        self.nBytes += data.nbytes
+
+        #  keep the source file's state so later reads don't have to stat it
+        if self.deploymentKey is not None:
+            localDir = os.path.join(self.cacheDir, self.deploymentKey)
+            if cachePath.startswith(localDir + os.sep):
+                relDir = os.path.dirname(os.path.relpath(cachePath, localDir))
+                name, state = splitCacheName(cachePath)
+                self.sourceStates.setdefault(relDir, {})[name] = state
+        self.lock.unlock()
+
+        self.evict()
+
+
+    def remove(self, cachePath):
+        self.lock.lock()
+        if cachePath in self.files:
+            self.nBytes -= self.files.pop(cachePath)
+        self.lock.unlock()
+
+
+    def evict(self):
+        '''
+        evict deletes the least recently used files until we're within the size cap
+        '''
+        evicted = []
+        self.lock.lock()
+        while self.nBytes > self.maxBytes and self.files:
+            path, size = self.files.popitem(last=False)
+            self.nBytes -= size
+            evicted.append(path)
+        self.lock.unlock()
+
+        for path in evicted:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+    def localizeMetadata(self, dataDir):
+        '''
+        localizeMetadata copies the metadata database files in the deployment's logs
+        directory into the cache and returns the path of the local deployment directory
+        which should be used to open the metadata. None is returned if there isn't a
+        database to copy.
+
+        The size and modification time of the source and local files are recorded
+        when the files are copied so syncMetadata can tell whether either copy has
+        changed. Call findUnsyncedMetadata first to find local changes from an earlier
+        session that weren't synced. Those local copies are replaced by the source.
+        '''
+
+        dataDir = os.path.normpath(dataDir)
+        sourceLogs = os.path.join(dataDir, 'logs')
+        localDir = os.path.join(self.cacheDir, deploymentKey(dataDir))
+        localLogs = os.path.join(localDir, 'logs')
+
+        try:
+            dbFiles = [f for f in os.listdir(sourceLogs) if f.lower().endswith('.db')]
+            if len(dbFiles) == 0:
+                return None
+
+            os.makedirs(localLogs, exist_ok=True)
+            state = {'source':dataDir, 'files':{}}
+            for dbFile in dbFiles:
+                sourcePath = os.path.join(sourceLogs, dbFile)
+                localPath = os.path.join(localLogs, dbFile)
+                shutil.copy2(sourcePath, localPath)
+                state['files'][dbFile] = {'source':fileState(sourcePath),
+                        'local':fileState(localPath)}
+            saveMetadataState(localDir, state)
+        except:
+            #  we can't localize the database - use it where it is
+            return None
+
+        self.localized[dataDir] = localDir
+
+        return localDir
+
+
+    def findUnsyncedMetadata(self, dataDir):
+        '''
+        findUnsyncedMetadata returns a list of the local metadata database files for
+        the deployment that were changed after they were localized but weren't synced
+        back (for example if the application crashed). Each item is a list containing
+        the file name and a flag that is True if the deployment's copy has also changed
+        since the file was localized.
+        '''
+        dataDir = os.path.normpath(dataDir)
+        localDir = os.path.join(self.cacheDir, deploymentKey(dataDir))
+        state = loadMetadataState(localDir)
+        if state is None or state.get('source') != dataDir:
+            return []
+
+        unsynced = []
+        for dbFile, record in state['files'].items():
+            localPath = os.path.join(localDir, 'logs', dbFile)
+            sourcePath = os.path.join(dataDir, 'logs', dbFile)
+            if os.path.exists(localPath) and fileState(localPath) != record['local']:
+                unsynced.append([dbFile, fileState(sourcePath) != record['source']])
+
+        return unsynced
+
+
+    def syncMetadata(self, dataDir, force=False):
+        '''
+        syncMetadata copies the local metadata database files that have been modified
+        back to the deployment. Files are only copied if they were localized by this
+        session from the same deployment path and the deployment's copy hasn't changed
+        since. Set force to True, after asking the user, to copy the local changes even
+        if the deployment's copy has changed or the files were localized by an earlier
+        session. Returns a list of the files that weren't copied because the
+        deployment's copy changed. An IOError is raised if the files can't be copied.
+        '''
+        dataDir = os.path.normpath(dataDir)
+        localDir = self.localized.get(dataDir)
+        if localDir is None:
+            if not force:
+                #  we didn't localize this deployment - there's nothing of ours to sync
+                return []
+            localDir = os.path.join(self.cacheDir, deploymentKey(dataDir))
+
+        state = loadMetadataState(localDir)
+        if state is None or state.get('source') != dataDir:
+            raise IOError('The local metadata for ' + dataDir + ' is missing its state.')
+
+        conflicts = []
+        for dbFile, record in state['files'].items():
+            localPath = os.path.join(localDir, 'logs', dbFile)
+            sourcePath = os.path.join(dataDir, 'logs', dbFile)
+            if fileState(localPath) == record['local']:
+                #  no local changes
+                continue
+            if fileState(sourcePath) != record['source'] and not force:
+                #  the deployment's copy was changed by someone else
+                conflicts.append(dbFile)
+                continue
+            shutil.copy2(localPath, sourcePath)
+            record['source'] = fileState(sourcePath)
+            record['local'] = fileState(localPath)
+        saveMetadataState(localDir, state)
+
+        return conflicts
+
+
+    def releaseMetadata(self, dataDir):
+        '''
+        releaseMetadata forgets that this session localized the deployment's metadata.
+        Any local changes that weren't synced will be reported by findUnsyncedMetadata.
+        '''
+        self.localized.pop(os.path.normpath(dataDir), None)
+
+
+class DiskCachePrefetcher(QThread):
+    '''
+    DiskCachePrefetcher copies files into a DiskCache in a background thread. The
+    list of files is replaced each time the viewing position changes so the thread
+    is always working on the files that will be needed next.
+    '''
+
+    def __init__(self, cache, parent=None):
+        super(DiskCachePrefetcher, self).__init__(parent)
+
+        self.cache = cache
+        self.paths = collections.deque()
+        self.abort = False
+        self.lock = QMutex()
+        self.wake = QWaitCondition()
+
+
+    def setPaths(self, paths):
+        '''
+        setPaths replaces the list of files to fetch. The files are fetched in order.
+        '''
+        self.lock.lock()
+        self.paths = collections.deque(paths)
+        self.wake.wakeAll()
+        self.lock.unlock()
+
+
+    def stop(self):
+        '''
+        stop tells the thread to exit and waits for it to finish the current file
+        '''
+        self.lock.lock()
+        self.abort = True
+        self.wake.wakeAll()
+        self.lock.unlock()
+        self.wait()
+
+
+    def run(self):
+
+        while True:
+            self.lock.lock()
+            while len(self.paths) == 0 and not self.abort:
+                self.wake.wait(self.lock)
+            if self.abort:
+                self.lock.unlock()
+                break
+            path = self.paths.popleft()
+            self.lock.unlock()
+
+            self.cache.fetch(path)
+
+
+def deploymentKey(dataDir):
+    '''
+    deploymentKey returns the name of a deployment's directory in the cache. The key
+    doesn't depend on where the deployment is mounted so the same deployment opened
+    through a different drive or share path uses the same cached files. It is the
+    deployment's directory name followed by a hash of the names of the files in the
+    deployment's logs directory and the sizes of those that aren't metadata
+    databases. The logs are written when the deployment is acquired and don't change
+    afterwards, apart from the databases which the browser updates, so different
+    deployments with the same name don't share cached files or metadata.
+    '''
+    dataDir = os.path.normpath(dataDir)
+    logs = []
+    try:
+        with os.scandir(os.path.join(dataDir, 'logs')) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if isDatabaseFile(entry.name):
+                    logs.append([entry.name, 0])
+                else:
+                    logs.append([entry.name, entry.stat().st_size])
+    except OSError:
+        pass
+    logs.sort()
+    logHash = hashlib.sha1(json.dumps(logs).encode('utf-8',
+            'surrogateescape')).hexdigest()[:12]
+
+    return os.path.basename(os.path.abspath(dataDir)) + '_' + logHash
+
+
+def isDatabaseFile(name):
+    '''
+    isDatabaseFile returns True if the file name is a metadata database or one of
+    its journal files
+    '''
+    return name.lower().endswith(('.db', '.db-journal', '.db-wal', '.db-shm'))
+
+
+def listDirectory(directory):
+    '''
+    listDirectory returns a dict, keyed by file name, of the size and modification
+    time in nanoseconds of the files in a directory or None if the directory can't
+    be listed
+    '''
+    states = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                states[entry.name] = [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return None
+
+    return states
+
+
+def splitCacheName(cachePath):
+    '''
+    splitCacheName returns a list containing the source file name and its size and
+    modification time as encoded in a cached file's name. The state is None if the
+    name wasn't made by getCachePath.
+    '''
+    name, suffix = os.path.splitext(os.path.basename(cachePath))
+    try:
+        size, mtime = suffix[1:].split('_')
+        return [name, [int(size), int(mtime)]]
+    except ValueError:
+        return [name, None]
+
+
+def fileState(path):
+    '''
+    fileState returns a list containing a file's size and modification time in
+    nanoseconds or None if the file doesn't exist
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def loadMetadataState(localDir):
+    '''
+    loadMetadataState reads the state recorded when a deployment's metadata was
+    localized or None if there isn't one. The state is kept in the logs directory
+    so it is never evicted.
+    '''
+    try:
+        with open(os.path.join(localDir, 'logs', 'localized.json'), 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or not isinstance(state.get('files'), dict):
+        return None
+
+    return state
+
+
+def saveMetadataState(localDir, state):
+    '''
+    saveMetadataState writes the localized metadata state. The state is written to
+    a temporary file which replaces the old one.
+    '''
+    statePath = os.path.join(localDir, 'logs', 'localized.json')
+    with open(statePath + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(statePath + '.tmp', statePath)
+
+
+def isNetworkPath(path):
+    '''
+    isNetworkPath returns True if the provided path is on a network share. UNC paths
+    are always network paths. On Windows, mapped drives are also detected.
+    '''
+
+    path = os.path.normpath(path)
+    if path.startswith('\\\\') or path.startswith('//'):
+        return True
+
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            drive = os.path.splitdrive(path)[0]
+            if drive:
+                #  4 is DRIVE_REMOTE
+                return ctypes.windll.kernel32.GetDriveTypeW(drive + '\\') == 4
+        except:
+            pass
+
+    return False
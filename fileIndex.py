@@ -0,0 +1,258 @@
+import os
+import concurrent.futures
+from PyQt6.QtCore import *
+import numpy as np
+
+
+#  define the file status codes
+OK = 0
+MISSING = 1
+EMPTY = 2
+TRUNCATED = 3
+STATUS_TEXT = {OK:'OK', MISSING:'missing', EMPTY:'zero length', TRUNCATED:'truncated'}
+
+
+class FileIndex(object):
+    '''
+    FileIndex holds the validated image file paths for a deployment. Like the
+    FrameTable, the arrays are indexed by slider position (the index into
+    metadata.imageNumbers).
+
+    The index contains:
+
+        numbers   - the image number at each index
+        rows      - a dict mapping image number to index
+        files     - dict keyed by camera of image file paths. The path is None if
+                    the image isn't in the metadata or the file is bad.
+        status    - dict keyed by camera of uint8 arrays of file status codes
+        badRows   - a sorted array of the indexes where any camera's file is bad
+    '''
+
+    def __init__(self):
+
+        self.numbers = None
+        self.rows = {}
+        self.files = {}
+        self.status = {}
+        self.badRows = np.empty(0, dtype=np.int64)
+
+
+    def isBad(self, camera, number):
+        '''
+        isBad returns True if the camera's file for the provided image number is
+        missing, empty or truncated
+        '''
+        try:
+            return self.status[camera][self.rows[number]] != OK
+        except KeyError:
+            return False
+
+
+    def getStatusText(self, camera, number):
+        try:
+            return STATUS_TEXT[int(self.status[camera][self.rows[number]])]
+        except KeyError:
+            return STATUS_TEXT[OK]
+
+
+    def nBad(self):
+        return int(sum([np.count_nonzero(status) for status in self.status.values()]))
+
+
+    def getBadRanges(self):
+        '''
+        getBadRanges returns a list of [first, last] index pairs of the runs of
+        consecutive bad rows
+        '''
+        if self.badRows.size == 0:
+            return []
+
+        #  a run ends wherever the next bad row isn't the next index
+        breaks = np.flatnonzero(np.diff(self.badRows) != 1)
+        starts = np.concatenate([[0], breaks + 1])
+        ends = np.concatenate([breaks, [self.badRows.size - 1]])
+
+        return [[int(self.badRows[start]), int(self.badRows[end])] for start, end in
+                zip(starts, ends)]
+
+
+class FileIndexBuilder(QThread):
+    '''
+    FileIndexBuilder validates a deployment's image files in a background thread.
+    Each camera's image directory is listed once with os.scandir, which returns
+    the file sizes with the listing on most platforms, and the cameras are checked
+    in parallel. Files that are in the metadata but aren't on disk are flagged as
+    missing and files with no data are flagged as zero length. If checkContents
+    is True, JPEG files are also checked for the start and end of image markers
+    to find files that were truncated when they were written or copied. Reading
+    the files is much slower than listing the directories so the contents are
+    checked in a second pass that runs in this thread, which should be started at
+    a low priority so the check doesn't compete with the image loader.
+
+    The progress signal is emitted periodically with the number of files checked
+    and the total, and the indexReady signal is emitted with the FileIndex when
+    the scan is complete.
+    '''
+
+    #  define PyQt Signals
+    progress = pyqtSignal(int, int)
+    indexReady = pyqtSignal(object)
+
+    def __init__(self, metadata, dataDir, cameras, checkContents=True, parent=None):
+        super(FileIndexBuilder, self).__init__(parent)
+
+        #  copy what we need from the metadata so we don't touch it from the
+        #  worker threads
+        self.imageNumbers = list(metadata.imageNumbers)
+        self.imageNames = {}
+        for camera in cameras:
+            cameraData = metadata.imageData[camera]
+            self.imageNames[camera] = [cameraData[n][2] + metadata.imageExtension
+                    if n in cameraData else None for n in self.imageNumbers]
+        self.dataDir = dataDir
+        self.cameras = list(cameras)
+        self.checkContents = checkContents
+        self.nChecked = 0
+        self.abort = False
+        self.lock = QMutex()
+
+
+    def stop(self):
+        '''
+        stop tells the thread to exit and waits for it to finish
+        '''
+        self.abort = True
+        self.wait()
+
+
+    def run(self):
+
+        index = FileIndex()
+        index.numbers = np.array(self.imageNumbers, dtype=np.int64)
+        index.rows = dict(zip(self.imageNumbers, range(len(self.imageNumbers))))
+
+        total = sum([len(self.imageNames[camera]) for camera in self.cameras])
+        if self.checkContents:
+            #  the files are counted once when listed and again when read
+            total *= 2
+        self.nChecked = 0
+
+        #  scan the cameras in parallel
+        fileSizes = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(self.cameras), 1)) as pool:
+            futures = {pool.submit(self.scanCamera, camera, total):camera
+                    for camera in self.cameras}
+            for future in concurrent.futures.as_completed(futures):
+                camera = futures[future]
+                try:
+                    index.files[camera], index.status[camera], fileSizes[camera] = \
+                            future.result()
+                except:
+                    #  we couldn't scan this camera - don't flag anything
+                    pass
+
+        if self.checkContents:
+            for camera in index.files:
+                self.checkCamera(index.files[camera], index.status[camera],
+                        fileSizes[camera], total)
+
+        if self.abort:
+            return
+
+        if index.status:
+            bad = np.zeros(len(self.imageNumbers), dtype=bool)
+            for status in index.status.values():
+                bad |= status != OK
+            index.badRows = np.flatnonzero(bad)
+
+        self.progress.emit(total, total)
+        self.indexReady.emit(index)
+
+
+    def scanCamera(self, camera, total):
+        '''
+        scanCamera lists a camera's image directory and checks each of the camera's
+        files. Returns the list of file paths, the array of status codes, and the
+        list of file sizes.
+        '''
+
+        imageDir = os.path.normpath(self.dataDir + os.sep + 'images' + os.sep + camera)
+        names = self.imageNames[camera]
+        files = [None] * len(names)
+        fileSizes = [0] * len(names)
+        status = np.full(len(names), OK, dtype=np.uint8)
+
+        #  get the sizes of the files in the directory
+        sizes = {}
+        try:
+            with os.scandir(imageDir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            sizes[entry.name] = entry.stat().st_size
+                    except OSError:
+                        pass
+        except OSError:
+            #  the directory is missing - all of the files will be flagged
+            pass
+
+        for i, name in enumerate(names):
+            if self.abort:
+                break
+
+            if name is not None:
+                if name not in sizes:
+                    status[i] = MISSING
+                elif sizes[name] == 0:
+                    status[i] = EMPTY
+                else:
+                    files[i] = imageDir + os.sep + name
+                    fileSizes[i] = sizes[name]
+            self.fileChecked(total)
+
+        return files, status, fileSizes
+
+
+    def checkCamera(self, files, status, fileSizes, total):
+        '''
+        checkCamera checks that a camera's JPEG files are complete. Truncated files
+        are flagged and their paths are removed from the list of files.
+        '''
+        for i, path in enumerate(files):
+            if self.abort:
+                break
+
+            if path is not None and path.lower().endswith(('.jpg', '.jpeg')):
+                if not isCompleteJPEG(path, fileSizes[i]):
+                    status[i] = TRUNCATED
+                    files[i] = None
+            self.fileChecked(total)
+
+
+    def fileChecked(self, total):
+        '''
+        fileChecked counts a checked file and periodically emits the progress signal
+        '''
+        self.lock.lock()
+        self.nChecked += 1
+        nChecked = self.nChecked
+        self.lock.unlock()
+        if nChecked % 500 == 0:
+            self.progress.emit(nChecked, total)
+
+
+def isCompleteJPEG(path, size, tailLength=64):
+    '''
+    isCompleteJPEG returns True if the file starts with the JPEG start of image
+    marker and has an end of image marker near the end of the file. Some writers
+    pad the file after the end of image marker so we search the last few bytes.
+    '''
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(2)
+            f.seek(max(size - tailLength, 0))
+            tail = f.read(tailLength)
+    except OSError:
+        return False
+
+    return head == b'\xff\xd8' and b'\xff\xd9' in tail
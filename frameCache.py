@@ -0,0 +1,170 @@
+import collections
+
+
+class FrameCache(object):
+    '''
+    FrameCache is a least recently used cache of decoded frames with a memory budget.
+    Frames are keyed by (camera, image number, decode scale, adjustment hash) where
+    the adjustment hash is None for frames that have not been enhanced. When adding
+    a frame would exceed the budget, the frames that were used least recently are
+    discarded. The cache keeps hit, miss, and eviction counts.
+    '''
+
+    def __init__(self, maxMB=512):
+
+        self.frames = collections.OrderedDict()
+        self.nBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.setBudget(maxMB)
+
+
+    def setBudget(self, maxMB):
+        '''
+        setBudget sets the cache size in megabytes, discarding frames if needed
+        '''
+        self.maxBytes = int(maxMB * 1024 * 1024)
+        self.evict()
+
+
+    def get(self, key):
+        '''
+        get returns the cached frame for the provided key or None if the frame
+        is not in the cache.
+        '''
+        try:
+            frame = self.frames[key]
+            self.frames.move_to_end(key)
+            self.hits += 1
+        except KeyError:
+            frame = None
+            self.misses += 1
+
+        return frame
+
+
+    def find(self, keys, count=True):
+        '''
+        find returns a list containing the first of the provided keys that is in the
+        cache and its frame, or [None, None] if none of the keys are cached. The lookup
+        is counted as a single hit or miss unless count is False.
+        '''
+        for key in keys:
+            if key in self.frames:
+                self.frames.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return [key, self.frames[key]]
+
+        if count:
+            self.misses += 1
+
+        return [None, None]
+
+
+    def put(self, key, frame):
+        '''
+        put adds a frame to the cache, discarding the least recently used frames
+        if needed. Frames larger than the budget are not cached.
+        '''
+        if frame.nbytes > self.maxBytes:
+            return
+
+        if key in self.frames:
+            self.nBytes -= self.frames[key].nbytes
+        self.frames[key] = frame
+        self.frames.move_to_end(key)
+        self.nBytes += frame.nbytes
+        self.evict()
+
+
+    def evict(self):
+        '''
+        evict discards the least recently used frames until we're within budget
+        '''
+        while self.nBytes > self.maxBytes and self.frames:
+            key, frame = self.frames.popitem(last=False)
+            self.nBytes -= frame.nbytes
+            self.evictions += 1
+
+
+    def contains(self, key):
+        return key in self.frames
+
+
+    def clear(self):
+        self.frames.clear()
+        self.nBytes = 0
+
+
+    def resetCounters(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def __len__(self):
+        return len(self.frames)
+
+
+class Prefetcher(object):
+    '''
+    Prefetcher watches the slider index changes and predicts which frames will
+    be requested next. The direction and stride are taken from the most recent
+    index changes so stepping with the arrow keys (+1, -1, +10, -10), playback,
+    and exporting with a frame step are all handled the same way. A stride is
+    only predicted when the last changes agree so random jumps of the slider
+    don't trigger prefetching.
+    '''
+
+    def __init__(self, nAhead=6, historyLength=3):
+
+        self.nAhead = nAhead
+        self.history = collections.deque(maxlen=historyLength)
+
+
+    def reset(self):
+        self.history.clear()
+
+
+    def stride(self):
+        '''
+        stride returns the current predicted stride or 0 if the recent index
+        changes don't agree.
+        '''
+
+        if len(self.history) < 2:
+            return 0
+
+        #  compute the deltas between the recent indexes
+        history = list(self.history)
+        deltas = [history[i + 1] - history[i] for i in range(len(history) - 1)]
+
+        #  the stride must be consistent and non-zero
+        if deltas[-1] == 0 or deltas.count(deltas[-1]) != len(deltas):
+            return 0
+
+        return deltas[-1]
+
+
+    def update(self, index, minIndex, maxIndex):
+        '''
+        update is called with the new slider index. It returns a list of the
+        indexes that should be prefetched ordered by how soon they will be needed.
+        '''
+
+        self.history.append(index)
+
+        stride = self.stride()
+        if stride == 0:
+            return []
+
+        indexes = []
+        for i in range(1, self.nAhead + 1):
+            nextIndex = index + stride * i
+            if nextIndex < minIndex or nextIndex > maxIndex:
+                break
+            indexes.append(nextIndex)
+
+        return indexes
@@ -0,0 +1,70 @@
+from PyQt6.QtCore import *
+from PyQt6.QtGui import *
+from PyQt6 import sip
+import numpy as np
+
+
+class FrameCompositor(object):
+    '''
+    FrameCompositor renders image viewers side by side into a single BGR buffer.
+    The buffer and a QImage for each viewer's region of it are created once so
+    exporting a frame paints the viewers directly into the output buffer with no
+    per frame allocation, concatenation, or color conversion. The buffer can be
+    passed straight to cv2.VideoWriter.write or cv2.imwrite.
+    '''
+
+    def __init__(self, sizes):
+
+        self.buffer, regions = createFrameBuffer(sizes)
+        self.height, self.width = self.buffer.shape[:2]
+
+        #  create the QImages that wrap each viewer's region of the buffer. The regions
+        #  share the buffer's row stride so they can be painted in place.
+        self.regions = []
+        for region in regions:
+            image = QImage(sip.voidptr(region.ctypes.data), region.shape[1], region.shape[0],
+                    self.buffer.strides[0], QImage.Format.Format_BGR888)
+            self.regions.append([region, image])
+
+
+    def compose(self, viewers, showHud=True):
+        '''
+        compose renders the viewers into their regions of the buffer and returns the
+        buffer. If showHud is True, the viewers are rendered as they appear on screen
+        including the HUD. Otherwise only the scene (the image) is rendered.
+        '''
+
+        for viewer, [region, image] in zip(viewers, self.regions):
+            target = QRectF(0, 0, image.width(), image.height())
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            painter.fillRect(target, Qt.GlobalColor.black)
+            if showHud:
+                viewer.render(painter, target, viewer.viewport().rect(),
+                        Qt.AspectRatioMode.IgnoreAspectRatio)
+            else:
+                viewer.scene().render(painter, target, viewer.sceneRect(),
+                        Qt.AspectRatioMode.IgnoreAspectRatio)
+            painter.end()
+
+        return self.buffer
+
+
+def createFrameBuffer(sizes):
+    '''
+    createFrameBuffer returns a list containing a BGR buffer that holds images of
+    the provided sizes ([width, height]) side by side and a list of the views of the
+    buffer for each image. The images are placed left to right and the buffer is
+    as tall as the tallest image.
+    '''
+    width = int(sum([size[0] for size in sizes]))
+    height = int(max([size[1] for size in sizes]))
+    buffer = np.zeros((height, width, 3), dtype=np.uint8)
+
+    regions = []
+    x = 0
+    for width, height in sizes:
+        regions.append(buffer[:int(height), x:x + int(width)])
+        x += int(width)
+
+    return [buffer, regions]
@@ -0,0 +1,393 @@
+import os
+from PyQt6.QtCore import *
+import numpy as np
+import cv2
+import imageLoader
+
+
+class FrameStore(object):
+    '''
+    FrameStore is a packed file of fixed size frames for a single camera. The
+    frames are stored in a numpy .npy file that is memory mapped so reading a frame
+    is just a slice of the mapped array. The store is made up of five files:
+
+        <name>.frames.npy   - (nFrames, height, width, 3) uint8 BGR frames
+        <name>.index.npy    - the image number of each frame
+        <name>.done.npy     - a boolean array flagging the frames that have been written
+        <name>.sources.npy  - (nFrames, 2) int64 size and modification time (in ns)
+                              of the image file each frame was made from
+        <name>.scale.npy    - the ratio of the full image width to the frame width
+
+    The done array is saved periodically while the store is being built so an
+    interrupted build can be resumed. Use verify to find frames whose image file
+    has been replaced since the frame was stored.
+
+    The store is built in a background thread and read from the GUI thread so
+    access to the store's arrays is protected by a mutex.
+    '''
+
+    def __init__(self, directory, name):
+
+        self.basePath = os.path.normpath(directory + os.sep + name)
+        self.frames = None
+        self.numbers = None
+        self.done = None
+        self.sources = None
+        self.rows = {}
+        self.scale = 1.
+        self.lock = QMutex()
+
+
+    def open(self, imageNumbers=None):
+        '''
+        open maps an existing store. If imageNumbers is provided, the store is only
+        opened if it contains all of the provided image numbers. Returns True if the
+        store was opened.
+        '''
+
+        try:
+            numbers = np.load(self.basePath + '.index.npy')
+            done = np.load(self.basePath + '.done.npy')
+            sources = np.load(self.basePath + '.sources.npy')
+            frames = np.load(self.basePath + '.frames.npy', mmap_mode='r+')
+            scale = float(np.load(self.basePath + '.scale.npy'))
+        except:
+            return False
+
+        if (frames.shape[0] != numbers.shape[0] or done.shape[0] != numbers.shape[0] or
+                sources.shape != (numbers.shape[0], 2)):
+            #  the files don't agree - the store is damaged
+            return False
+
+        rows = {}
+        for row in range(numbers.shape[0]):
+            rows[int(numbers[row])] = row
+        if imageNumbers is not None:
+            for number in imageNumbers:
+                if number not in rows:
+                    #  the store is stale
+                    return False
+
+        self.lock.lock()
+        self.frames = frames
+        self.numbers = numbers
+        self.done = done
+        self.sources = sources
+        self.rows = rows
+        self.scale = scale
+        self.lock.unlock()
+
+        return True
+
+
+    def create(self, imageNumbers, width, height, scale):
+        '''
+        create creates a new, empty store for the provided image numbers. The
+        frames will be width x height pixels and scale is the ratio of the full
+        resolution image width to the stored frame width.
+        '''
+
+        directory = os.path.dirname(self.basePath)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        numbers = np.array(imageNumbers, dtype=np.int64)
+        frames = np.lib.format.open_memmap(self.basePath + '.frames.npy',
+                mode='w+', dtype=np.uint8, shape=(numbers.shape[0], height, width, 3))
+        rows = {}
+        for row in range(numbers.shape[0]):
+            rows[int(numbers[row])] = row
+        np.save(self.basePath + '.index.npy', numbers)
+        np.save(self.basePath + '.scale.npy', np.array(float(scale)))
+
+        self.lock.lock()
+        self.numbers = numbers
+        self.done = np.zeros(numbers.shape[0], dtype=bool)
+        self.sources = np.zeros((numbers.shape[0], 2), dtype=np.int64)
+        self.frames = frames
+        self.scale = float(scale)
+        self.rows = rows
+        self.lock.unlock()
+
+        self.saveProgress()
+
+
+    def isOpen(self):
+        return self.frames is not None
+
+
+    def isComplete(self):
+        self.lock.lock()
+        complete = self.done is not None and bool(self.done.all())
+        self.lock.unlock()
+
+        return complete
+
+
+    def nDone(self):
+        self.lock.lock()
+        nDone = 0 if self.done is None else int(self.done.sum())
+        self.lock.unlock()
+
+        return nDone
+
+
+    def getImageSize(self):
+        '''
+        getImageSize returns the full resolution image size ([width, height]) the
+        frames were made from or None if the store isn't open
+        '''
+        self.lock.lock()
+        size = None
+        if self.frames is not None:
+            size = [int(round(self.frames.shape[2] * self.scale)),
+                    int(round(self.frames.shape[1] * self.scale))]
+        self.lock.unlock()
+
+        return size
+
+
+    def getFrame(self, number):
+        '''
+        getFrame returns the stored frame for the provided image number or None if
+        the frame isn't available. The returned array is a view into the mapped file.
+        '''
+
+        frame = None
+        self.lock.lock()
+        try:
+            row = self.rows[number]
+            if self.done[row]:
+                frame = self.frames[row]
+        except:
+            pass
+        self.lock.unlock()
+
+        return frame
+
+
+    def setFrame(self, row, frame, source):
+        '''
+        setFrame writes a frame into the store. The frame must already be the
+        correct size. source is the [size, modification time] of the image file
+        the frame was made from.
+        '''
+        self.lock.lock()
+        self.frames[row] = frame
+        self.sources[row] = source
+        self.done[row] = True
+        self.lock.unlock()
+
+
+    def verify(self, imagePaths):
+        '''
+        verify compares the size and modification time of each stored frame's image
+        file, in the same order as the store's image numbers, with the file the frame
+        was made from. Frames whose file has changed or is missing are flagged as not
+        done so they are rebuilt. Each image directory is listed once. Returns the
+        number of frames that were flagged.
+        '''
+        self.lock.lock()
+        if self.frames is None:
+            self.lock.unlock()
+            return 0
+        done = self.done.copy()
+        sources = self.sources.copy()
+        self.lock.unlock()
+
+        #  list the image directories
+        states = {}
+        directories = set([os.path.dirname(path) for path in imagePaths if path])
+        for directory in directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        states[os.path.join(directory, entry.name)] = [stat.st_size,
+                                stat.st_mtime_ns]
+            except OSError:
+                pass
+
+        stale = []
+        for row in np.flatnonzero(done):
+            path = imagePaths[row] if row < len(imagePaths) else None
+            if path is None or states.get(path) != sources[row].tolist():
+                stale.append(row)
+
+        if stale:
+            self.lock.lock()
+            if self.done is not None:
+                self.done[stale] = False
+            self.lock.unlock()
+            self.saveProgress()
+
+        return len(stale)
+
+
+    def saveProgress(self):
+        '''
+        saveProgress flushes the mapped frames to disk and then saves the sources
+        and done arrays. We flush the frames first so we never flag a frame as done
+        that hasn't been written.
+        '''
+        self.lock.lock()
+        if self.frames is not None:
+            self.frames.flush()
+            np.save(self.basePath + '.sources.npy', self.sources)
+            np.save(self.basePath + '.done.npy', self.done)
+        self.lock.unlock()
+
+
+    def close(self):
+        '''
+        close releases the memory map
+        '''
+        self.lock.lock()
+        self.frames = None
+        self.numbers = None
+        self.done = None
+        self.sources = None
+        self.rows = {}
+        self.lock.unlock()
+
+
+class FrameStoreBuilder(QThread):
+    '''
+    FrameStoreBuilder fills one or more FrameStores in a background thread. Each
+    job is a list containing the store, the list of image numbers, the list of
+    image file paths, the frame width, and a flag that is False if the store should
+    only be verified. Open stores are verified first so frames whose image file
+    has been replaced are rebuilt. Frames that are already flagged as done are
+    skipped so an interrupted build picks up where it left off. Images are decoded
+    at the smallest scale that is still at least as wide as the frames.
+    '''
+
+    #  define PyQt Signals
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, width, saveInterval=100, parent=None):
+        super(FrameStoreBuilder, self).__init__(parent)
+
+        self.width = width
+        self.saveInterval = saveInterval
+        self.jobs = []
+        self.abort = False
+
+
+    def addJob(self, store, imageNumbers, imagePaths, width=None, build=True):
+        '''
+        addJob adds a store to be built. If width isn't provided, the builder's
+        width is used. If build is False, the store is only verified.
+        '''
+        if width is None:
+            width = self.width
+        self.jobs.append([store, imageNumbers, imagePaths, width, build])
+
+
+    def getDecodeScale(self, fullWidth, width):
+        '''
+        getDecodeScale returns the largest decode scale where the decoded image is
+        at least the provided width
+        '''
+        for scale in [8, 4, 2]:
+            if fullWidth / scale >= width:
+                return scale
+
+        return 1
+
+
+    def stop(self):
+        '''
+        stop tells the builder to stop and waits for it to finish. The progress
+        is saved so the build can be resumed later.
+        '''
+        self.abort = True
+        self.wait()
+
+
+    def run(self):
+
+        #  flag the frames whose image files have changed
+        for store, imageNumbers, imagePaths, width, build in self.jobs:
+            if self.abort:
+                return
+            store.verify(imagePaths)
+
+        #  count the frames we need to build
+        total = 0
+        nDone = 0
+        for store, imageNumbers, imagePaths, width, build in self.jobs:
+            if build:
+                total += len(imageNumbers)
+                nDone += store.nDone()
+
+        for store, imageNumbers, imagePaths, width, build in self.jobs:
+            if not build:
+                continue
+
+            #  if we're resuming, we know the full image size from the store
+            decodeScale = None
+            if store.isOpen():
+                decodeScale = self.getDecodeScale(store.scale * store.frames.shape[2], width)
+
+            nSinceSave = 0
+            for i in range(len(imageNumbers)):
+                if self.abort:
+                    break
+
+                if store.isOpen() and store.getFrame(imageNumbers[i]) is not None:
+                    #  we already have this one
+                    continue
+
+                #  decode the image at the smallest scale that is larger than our frame
+                try:
+                    stat = os.stat(imagePaths[i])
+                    image = None
+                    if decodeScale is None:
+                        #  this is the first image - decode it at the smallest scale
+                        #  to determine the full image size and then pick our scale
+                        image = imageLoader.decodeImage(imagePaths[i], scale=8)
+                        decodeScale = self.getDecodeScale(image.shape[1] * 8, width)
+                        if decodeScale != 8:
+                            image = None
+                    if image is None:
+                        image = imageLoader.decodeImage(imagePaths[i], scale=decodeScale)
+                except:
+                    #  skip images we can't read
+                    continue
+
+                if not store.isOpen():
+                    #  this is a new store - use the first image to determine
+                    #  the stored frame size
+                    fullWidth = image.shape[1] * decodeScale
+                    height = int(round(image.shape[0] * width / float(image.shape[1])))
+                    try:
+                        store.create(imageNumbers, width, height,
+                                fullWidth / float(width))
+                    except:
+                        #  we can't write the store (read only share?) - skip this camera
+                        break
+
+                frameHeight, frameWidth = store.frames.shape[1:3]
+                frame = cv2.resize(image, (frameWidth, frameHeight),
+                        interpolation=cv2.INTER_AREA)
+                store.setFrame(store.rows[imageNumbers[i]], frame,
+                        [stat.st_size, stat.st_mtime_ns])
+
+                nDone += 1
+                nSinceSave += 1
+                if nSinceSave >= self.saveInterval:
+                    store.saveProgress()
+                    nSinceSave = 0
+                    self.progress.emit(nDone, total)
+
+            #  save the progress for this store
+            store.saveProgress()
+
+            if self.abort:
+                break
+
+        self.progress.emit(nDone, total)
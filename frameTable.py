@@ -0,0 +1,235 @@
+import os
+from PyQt6.QtCore import *
+import numpy as np
+
+
+class FrameTable(object):
+    '''
+    FrameTable holds the per frame display data for a deployment in arrays that
+    are indexed by slider position (the index into metadata.imageNumbers). The
+    table is built once when a deployment is loaded so displaying a frame only
+    requires array lookups instead of formatting times, splitting sensor strings,
+    and building paths for every frame.
+
+    The table contains:
+
+        numbers        - the image number at each index
+        rows           - a dict mapping image number to index
+        timeStrings    - dict keyed by camera of image time strings
+        times          - the time of each index in seconds (the earliest of the
+                         cameras' image times, NaN if no camera has an image)
+        files          - dict keyed by camera of full image file paths (or None)
+        yaw, pitch,
+        roll, depth    - sensor values as floats (NaN if not available)
+        sensorStrings  - dict keyed by 'yaw', 'pitch', 'roll', and 'depth' of the
+                         formatted sensor values
+    '''
+
+    def __init__(self):
+
+        self.numbers = None
+        self.rows = {}
+        self.timeStrings = {}
+        self.times = None
+        self.files = {}
+        self.yaw = None
+        self.pitch = None
+        self.roll = None
+        self.depth = None
+        self.sensorStrings = {}
+
+
+    def build(self, metadata, dataDir, cameras, format='%.1f', badVal='--.-'):
+        '''
+        build populates the table from a CamtrawlMetadata object that has been
+        queried or a MetadataSnapshot of one.
+        '''
+
+        imageNumbers = list(metadata.imageNumbers)
+        nFrames = len(imageNumbers)
+        self.numbers = np.array(imageNumbers, dtype=np.int64)
+        self.rows = dict(zip(imageNumbers, range(nFrames)))
+
+        self.times = np.full(nFrames, np.nan)
+        for camera in cameras:
+            cameraData = metadata.imageData[camera]
+            imageDir = os.path.normpath(dataDir + os.sep + 'images' + os.sep + camera)
+
+            #  build the time strings. We convert the times to datetime64 so we can
+            #  format them all at once.
+            times = getImageTimes(cameraData, imageNumbers)
+            timeStrings = np.datetime_as_string(times, unit='ms')
+            self.timeStrings[camera] = np.char.replace(timeStrings, 'T', ' ')
+            self.times = np.fmin(self.times, timesToSeconds(times))
+
+            #  and the image file paths
+            self.files[camera] = [imageDir + os.sep + cameraData[n][2] +
+                    metadata.imageExtension if n in cameraData else None
+                    for n in imageNumbers]
+
+        #  parse the attitude and depth sensor strings
+        sensorValues = np.full((nFrames, 4), np.nan)
+        try:
+            sensorData = metadata.sensorData['CTControl']['$OHPR']
+        except:
+            #  there probably isn't any sensor data available...
+            sensorData = {}
+        for i in range(nFrames):
+            try:
+                parts = sensorData[imageNumbers[i]].split(',')
+            except:
+                continue
+            for j, k in enumerate([1, 2, 3, 5]):
+                try:
+                    sensorValues[i, j] = float(parts[k])
+                except:
+                    pass
+
+        self.yaw = sensorValues[:, 0]
+        self.pitch = sensorValues[:, 1]
+        self.roll = sensorValues[:, 2]
+        self.depth = sensorValues[:, 3]
+
+        #  and format the sensor values for display
+        for name, values in [['yaw', self.yaw], ['pitch', self.pitch],
+                ['roll', self.roll], ['depth', self.depth]]:
+            strings = np.char.mod(format, values).astype('U16')
+            strings[np.isnan(values)] = badVal
+            self.sensorStrings[name] = strings
+
+
+class ImageIndex(object):
+    '''
+    ImageIndex maps image numbers to slider positions (the index into
+    metadata.imageNumbers). It replaces metadata.imageNumbers.index() which is a
+    linear search. The index must be rebuilt with update whenever the metadata is
+    queried since the image numbers change when a deployment is trimmed.
+    '''
+
+    def __init__(self, imageNumbers=[]):
+
+        self.update(imageNumbers)
+
+
+    def update(self, imageNumbers):
+        '''
+        update rebuilds the index from the metadata's image numbers
+        '''
+        imageNumbers = list(imageNumbers)
+        self.numbers = np.array(imageNumbers, dtype=np.int64)
+        self.rows = dict(zip(imageNumbers, range(len(imageNumbers))))
+
+
+    def index(self, number):
+        '''
+        index returns the slider position of an image number. A KeyError is raised
+        if the number isn't in the deployment.
+        '''
+        return self.rows[number]
+
+
+    def nearestIndex(self, number):
+        '''
+        nearestIndex returns the slider position of an image number or, if the number
+        isn't in the deployment, the position of the next image after it. The last
+        position is returned if the number is past the end of the deployment.
+        '''
+        try:
+            return self.rows[number]
+        except KeyError:
+            index = int(np.searchsorted(self.numbers, number, side='left'))
+            return max(min(index, self.numbers.size - 1), 0)
+
+
+    def __contains__(self, number):
+        return number in self.rows
+
+
+    def __len__(self):
+        return self.numbers.size
+
+
+def getImageTimes(cameraData, imageNumbers):
+    '''
+    getImageTimes returns a datetime64 array of a camera's image times for the provided
+    image numbers. Missing images are given a NaT time.
+    '''
+    return np.array([cameraData[n][1] if n in cameraData else None
+            for n in imageNumbers], dtype='datetime64[us]')
+
+
+def timesToSeconds(times):
+    '''
+    timesToSeconds converts a datetime64 array to seconds since the epoch. NaT
+    times are returned as NaN.
+    '''
+    seconds = times.astype('datetime64[us]').astype(np.int64) / 1e6
+    seconds[np.isnat(times)] = np.nan
+
+    return seconds
+
+
+def getFrameTimes(metadata, cameras):
+    '''
+    getFrameTimes returns the time, in seconds, of each index in metadata.imageNumbers.
+    This is the same as FrameTable.times and is used when the table hasn't been built.
+    '''
+    imageNumbers = list(metadata.imageNumbers)
+    frameTimes = np.full(len(imageNumbers), np.nan)
+    for camera in cameras:
+        times = getImageTimes(metadata.imageData[camera], imageNumbers)
+        frameTimes = np.fmin(frameTimes, timesToSeconds(times))
+
+    return frameTimes
+
+
+class MetadataSnapshot(object):
+    '''
+    MetadataSnapshot copies the parts of a queried CamtrawlMetadata object that
+    FrameTable.build uses. The metadata's dicts are rebuilt when it is queried so
+    a background thread must work from a copy.
+    '''
+
+    def __init__(self, metadata, cameras):
+
+        self.imageNumbers = list(metadata.imageNumbers)
+        self.imageExtension = metadata.imageExtension
+        self.imageData = {}
+        for camera in cameras:
+            self.imageData[camera] = {n:[None, data[1], data[2]] for n, data in
+                    metadata.imageData[camera].items()}
+        try:
+            self.sensorData = {'CTControl':{'$OHPR':dict(
+                    metadata.sensorData['CTControl']['$OHPR'])}}
+        except:
+            self.sensorData = {}
+
+
+class FrameTableBuilder(QThread):
+    '''
+    FrameTableBuilder builds a FrameTable in a background thread and emits the
+    tableReady signal when it is done. The metadata is copied when the builder
+    is created so the GUI can query the metadata while the table is built.
+    '''
+
+    #  define PyQt Signals
+    tableReady = pyqtSignal(object)
+
+    def __init__(self, metadata, dataDir, cameras, parent=None):
+        super(FrameTableBuilder, self).__init__(parent)
+
+        self.metadata = MetadataSnapshot(metadata, cameras)
+        self.dataDir = dataDir
+        self.cameras = cameras
+
+
+    def run(self):
+
+        table = FrameTable()
+        try:
+            table.build(self.metadata, self.dataDir, self.cameras)
+        except:
+            #  we'll just fall back to computing the display data per frame
+            return
+
+        self.tableReady.emit(table)
@@ -0,0 +1,78 @@
+import math
+from PyQt6.QtCore import *
+from PyQt6.QtGui import *
+from PyQt6.QtWidgets import *
+from MaceFunctions.QImageViewer.QImageViewer import QImageViewer
+
+
+class GridViewDlg(QDialog):
+    '''
+    GridViewDlg is a window that shows the images from all of a deployment's
+    cameras in a grid. The dialog only holds the viewers. The browser loads the
+    grid's images along with the left and right viewers' images, using the same
+    decode workers, prefetcher and frame cache, so every camera is shown at the
+    same image number.
+
+    The browser refers to the grid viewers using keys of the form 'grid:<camera>'.
+    '''
+
+    #  define PyQt Signals
+    closed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(GridViewDlg, self).__init__(parent)
+
+        self.setWindowTitle('Grid View')
+        self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowMinMaxButtonsHint)
+        self.layout = QGridLayout(self)
+        self.layout.setContentsMargins(2, 2, 2, 2)
+        self.layout.setSpacing(2)
+        self.cameras = []
+        self.viewers = {}
+        self.cameraLabels = {}
+
+
+    def setCameras(self, cameras):
+        '''
+        setCameras creates a viewer for each of the provided cameras. The viewers
+        are arranged in a grid that is as close to square as possible.
+        '''
+        self.clear()
+
+        self.cameras = list(cameras)
+        nColumns = max(int(math.ceil(math.sqrt(len(self.cameras)))), 1)
+        for i, camera in enumerate(self.cameras):
+            viewer = QImageViewer(parent=self)
+            viewer.setName(camera)
+            self.cameraLabels[camera] = viewer.addHudText(QPointF(0.5,0.001),
+                    camera, size=11, color=[0,250,0], alpha=150,
+                    halign='center', valign='top')
+            self.layout.addWidget(viewer, i // nColumns, i % nColumns)
+            self.viewers[camera] = viewer
+
+
+    def clear(self):
+        '''
+        clear removes the viewers
+        '''
+        for camera in self.cameras:
+            viewer = self.viewers[camera]
+            self.layout.removeWidget(viewer)
+            viewer.clearViewer()
+            viewer.deleteLater()
+        self.cameras = []
+        self.viewers = {}
+        self.cameraLabels = {}
+
+
+    def viewerKeys(self):
+        '''
+        viewerKeys returns the browser's keys for the grid viewers
+        '''
+        return ['grid:' + camera for camera in self.cameras]
+
+
+    def closeEvent(self, event):
+
+        self.closed.emit()
+        event.accept()
@@ -0,0 +1,134 @@
+import pickle
+import hashlib
+import numpy as np
+import cv2
+
+
+class ImageEnhancer(object):
+    '''
+    ImageEnhancer applies the image viewer's enhancements to decoded images using a
+    lookup table so enhancing an image is a single vectorized pass with cv2.LUT
+    that can run in the decode workers.
+
+    The lookup table isn't computed from the viewer's parameters. It is measured
+    by passing probe images through the viewer's own enhancement code (see
+    fromViewer and ViewerProbe) so the enhanced images match what the viewer
+    displays. Only enhancements that are point operations, where each output pixel
+    depends only on the same input pixel's value, can be expressed as a lookup
+    table. fromViewer checks for this and returns None for enhancements that
+    aren't, in which case the viewer applies the enhancements itself.
+    '''
+
+    def __init__(self, lut):
+
+        #  the table is (1, 256, 3) so each channel has its own table
+        self.lut = np.ascontiguousarray(lut, dtype=np.uint8).reshape(1, 256, 3)
+
+
+    @classmethod
+    def fromViewer(cls, enhance, tolerance=1):
+        '''
+        fromViewer returns an ImageEnhancer that matches the provided enhance function
+        or None if the enhancement can't be expressed as a lookup table. enhance is
+        called with a BGR image and returns the image enhanced by the viewer. A
+        ramp image is enhanced to measure the table and images with the values
+        rearranged and with different histograms are used to check that the
+        enhancement is a point operation. tolerance is the largest difference
+        allowed between the viewer's output and the table's.
+        '''
+        ramp, checks = getProbeImages()
+        try:
+            rampOut = enhance(ramp)
+            checkOuts = [enhance(check) for check in checks]
+        except:
+            return None
+        for image, output in zip([ramp] + checks, [rampOut] + checkOuts):
+            if output is None or output.shape != image.shape:
+                return None
+
+        #  each value appears more than once in the ramp. The outputs for a value
+        #  must agree or the enhancement depends on more than the pixel's value.
+        values = ramp[:, :, 0].ravel()
+        outputs = rampOut.reshape(-1, 3).astype(np.int16)
+        lut = np.zeros((256, 3), dtype=np.int16)
+        lut[values] = outputs
+        if np.abs(lut[values] - outputs).max() > tolerance:
+            return None
+
+        enhancer = cls(lut.astype(np.uint8))
+        for check, checkOut in zip(checks, checkOuts):
+            difference = np.abs(enhancer.apply(check).astype(np.int16) -
+                    checkOut.astype(np.int16))
+            if difference.max() > tolerance:
+                return None
+
+        return enhancer
+
+
+    def apply(self, image):
+        '''
+        apply returns a new enhanced image. The provided image is not modified.
+        '''
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+        return cv2.LUT(image, self.lut)
+
+
+class ViewerProbe(object):
+    '''
+    ViewerProbe runs images through a QImageViewer's own enhancement code. The
+    viewer must be a hidden viewer that is only used for probing since its image
+    and parameters are replaced. Call the probe with the parameters returned by a
+    viewer's image.getParameters() to get the enhance function for fromViewer.
+    '''
+
+    def __init__(self, viewer):
+
+        self.viewer = viewer
+
+
+    def __call__(self, parameters):
+
+        def enhance(image):
+            self.viewer.image.setParameters(parameters)
+            self.viewer.image.enhancementsEnabled = True
+            self.viewer.setImageFromNumpy(image)
+            rendered = self.viewer.renderScene(width=image.shape[1], height=image.shape[0],
+                    asNDarray=True)
+            return np.ascontiguousarray(rendered[:, :, :3])
+
+        return enhance
+
+
+def getProbeImages(size=64):
+    '''
+    getProbeImages returns the images used to measure an enhancement. It returns a
+    list containing a gray ramp where each value appears size * size / 256 times
+    and a list of check images. The first check image is a color image with
+    shuffled, channel shifted values and a block of black pixels. The second is a
+    low contrast image which catches enhancements that stretch the histogram.
+    '''
+    values = (np.arange(size * size) % 256).astype(np.uint8).reshape(size, size)
+    ramp = np.dstack([values, values, values])
+
+    shuffled = np.random.RandomState(0).permutation(values.ravel()).reshape(size, size)
+    check = np.dstack([shuffled, shuffled + np.uint8(85), shuffled + np.uint8(170)])
+    check[:size // 4, :size // 4] = 0
+    lowContrast = shuffled // 4 + 96
+    lowContrast = np.dstack([lowContrast, lowContrast, lowContrast])
+
+    return [ramp, [check, lowContrast]]
+
+
+def parameterHash(parameters):
+    '''
+    parameterHash returns a short hash of the viewer's adjustment parameters which
+    is used to key the enhanced frames in the frame cache
+    '''
+    try:
+        data = pickle.dumps(parameters, 2)
+    except:
+        data = repr(parameters).encode()
+
+    return hashlib.sha1(data).hexdigest()[:16]
@@ -0,0 +1,459 @@
+import time
+import queue
+from PyQt6.QtCore import *
+import numpy as np
+import cv2
+
+
+#  define the reduced decode scales and the OpenCV flags that implement them. JPEG
+#  images are decoded at reduced scale using DCT scaling which is much faster than
+#  decoding at full resolution and then resizing.
+DECODE_FLAGS = {1:cv2.IMREAD_COLOR,
+                2:cv2.IMREAD_REDUCED_COLOR_2,
+                4:cv2.IMREAD_REDUCED_COLOR_4,
+                8:cv2.IMREAD_REDUCED_COLOR_8}
+
+
+class ImageRequest(object):
+    '''
+    ImageRequest is a simple container that describes a single camera's image
+    within a FrameRequest. The loader fills in the image (or error) attributes.
+    The times dict holds the perf_counter times when decoding started ('start'),
+    the file was read ('read'), and the image was decoded ('decoded'). fromStore
+    is set when the image is a view into a thumbnail or review store.
+
+    If an enhancer is set, the decoded image is also enhanced and the result is
+    stored in the enhanced attribute. enhanceKey is the hash of the adjustment
+    parameters the enhancer was measured from.
+    '''
+
+    def __init__(self, frame, viewer, filename, scale=1):
+
+        self.frame = frame
+        self.viewer = viewer
+        self.filename = filename
+        self.scale = scale
+        self.image = None
+        self.error = None
+        self.finishedTime = None
+        self.times = {}
+        self.fromStore = False
+        self.enhancer = None
+        self.enhanceKey = None
+        self.enhanced = None
+
+
+    def needsDecode(self):
+        return (self.filename is not None and self.image is None and
+                self.enhanced is None and self.error is None)
+
+
+    def enhance(self):
+        '''
+        enhance applies the enhancer to the image, recording the time it took
+        '''
+        if self.enhancer is None or self.image is None:
+            return
+
+        startTime = time.perf_counter()
+        try:
+            self.enhanced = self.enhancer.apply(self.image)
+        except:
+            #  we'll show the unenhanced image
+            self.enhanced = None
+        self.times['enhance'] = time.perf_counter() - startTime
+
+
+    def decode(self, cache=None):
+        '''
+        decode reads and decodes the image, recording the time taken by each step.
+        If a DiskCache is provided the file is read through it.
+        '''
+        self.times['start'] = time.perf_counter()
+        try:
+            data = readImageFile(self.filename, cache=cache)
+            self.times['read'] = time.perf_counter()
+            self.image = decodeImageData(data, self.filename, scale=self.scale)
+            self.times['decoded'] = time.perf_counter()
+        except Exception as e:
+            self.error = e
+
+
+class FrameRequest(object):
+    '''
+    FrameRequest describes the images from all of the cameras for a single image
+    number. The images are decoded in parallel by the loader's workers but the
+    frame is only returned when all of its images are done so the viewers can be
+    updated together. The loader sets the skew attribute to the time (in seconds)
+    between the first and last image of the frame finishing. The eventTime and
+    queuedTime attributes are the perf_counter times of the request (for example
+    the slider event) and of the frame being handed to the loader.
+    '''
+
+    def __init__(self, number, sequence, prefetch=False):
+
+        self.number = number
+        self.sequence = sequence
+        self.prefetch = prefetch
+        self.images = {}
+        self.count = 0
+        self.nRemaining = 0
+        self.cancelled = False
+        self.skew = 0.
+        self.eventTime = time.perf_counter()
+        self.queuedTime = self.eventTime
+
+
+    def addImage(self, viewer, filename, scale=1, image=None):
+        '''
+        addImage adds an image to the frame. If the image has already been loaded
+        (for example it was cached) it can be passed in and it won't be decoded.
+        '''
+        request = ImageRequest(self, viewer, filename, scale=scale)
+        request.image = image
+        self.images[viewer] = request
+
+        return request
+
+
+    def needsDecode(self):
+        '''
+        needsDecode returns True if any of the frame's images need to be decoded
+        '''
+        for viewer in self.images:
+            if self.images[viewer].needsDecode():
+                return True
+
+        return False
+
+
+    def decode(self, cache=None):
+        '''
+        decode decodes the frame's images in the calling thread
+        '''
+        self.queuedTime = time.perf_counter()
+        for viewer in self.images:
+            request = self.images[viewer]
+            if request.needsDecode():
+                request.decode(cache=cache)
+                request.enhance()
+
+
+class ImageLoader(QObject):
+    '''
+    ImageLoader manages a small pool of worker threads that read and decode
+    image files off of the GUI thread. Frames are queued with loadFrame and
+    the decoded frames are returned via the frameLoaded signal. Since the signal
+    is emitted from the worker threads, Qt will queue it and the connected slot
+    will run in the GUI thread so all the GUI has to do is blit the pixels.
+
+    The images within a frame are decoded in parallel but the frame is only
+    returned when all of them are done. This way the stereo pair (and the sensor
+    data for that image number) are always presented together.
+
+    Prefetch frames are queued at a lower priority than display frames so
+    the workers will always decode an image that is needed right now before
+    decoding images that might be needed soon.
+
+    Display frames are "latest wins". When a new display frame is queued, any
+    older display frames that haven't been started are cancelled. Workers check
+    for this before decoding so after a fast slider drag the workers only decode
+    the frame the user stopped on. Queued prefetch frames can be cancelled with
+    cancelPrefetch.
+
+    If a DiskCache is set with setDiskCache, the image files are read through it.
+    '''
+
+    #  define PyQt Signals
+    frameLoaded = pyqtSignal(object)
+    queueChanged = pyqtSignal(int)
+
+    #  define the request priorities. Lower values are handled first.
+    STOP = 0
+    DISPLAY = 1
+    PREFETCH = 2
+
+    def __init__(self, nWorkers=2, parent=None):
+        super(ImageLoader, self).__init__(parent)
+
+        self.requests = queue.PriorityQueue()
+        self.requestCount = 0
+        self.workers = []
+        self.nPending = 0
+        self.nPrefetching = 0
+        self.nCancelled = 0
+        self.latestSequence = -1
+        self.prefetchCutoff = 0
+        self.pendingLock = QMutex()
+        self.diskCache = None
+
+        self.setWorkerCount(nWorkers)
+
+
+    def setWorkerCount(self, nWorkers):
+        '''
+        setWorkerCount sets the number of decoding threads. Existing workers
+        are stopped and a new pool is started.
+        '''
+
+        #  we always want at least one worker
+        nWorkers = max(1, int(nWorkers))
+
+        self.stop()
+        for i in range(nWorkers):
+            worker = LoaderWorker(self)
+            worker.start()
+            self.workers.append(worker)
+
+
+    def workerCount(self):
+        return len(self.workers)
+
+
+    def setDiskCache(self, cache):
+        '''
+        setDiskCache sets the DiskCache the workers read image files through. Set
+        it to None to read the files directly.
+        '''
+        self.diskCache = cache
+
+
+    def loadFrame(self, frame):
+        '''
+        loadFrame queues the images in a FrameRequest for decoding. Only the images
+        that need to be decoded are queued. Prefetch frames are queued at a lower
+        priority.
+        '''
+
+        frame.queuedTime = time.perf_counter()
+        self.pendingLock.lock()
+        if frame.prefetch:
+            self.nPrefetching += 1
+            priority = self.PREFETCH
+        else:
+            #  this frame supersedes any queued display frames
+            self.nPending += 1
+            self.latestSequence = frame.sequence
+            priority = self.DISPLAY
+        self.requestCount += 1
+        frame.count = self.requestCount
+
+        for viewer in frame.images:
+            request = frame.images[viewer]
+            if request.needsDecode():
+                frame.nRemaining += 1
+                self.requestCount += 1
+                self.requests.put((priority, self.requestCount, request))
+        self.pendingLock.unlock()
+
+        self.queueChanged.emit(self.nPending)
+
+        return frame
+
+
+    def queueDepth(self):
+        '''
+        queueDepth returns the number of display frames that have been queued but
+        not yet returned. This includes the frames currently being decoded.
+        '''
+        return self.nPending
+
+
+    def prefetchDepth(self):
+        '''
+        prefetchDepth returns the number of prefetch frames that have been queued
+        but not yet returned.
+        '''
+        return self.nPrefetching
+
+
+    def cancelPrefetch(self):
+        '''
+        cancelPrefetch cancels all of the prefetch frames that are currently queued.
+        Prefetch frames that are being decoded will still be returned.
+        '''
+        self.pendingLock.lock()
+        self.prefetchCutoff = self.requestCount
+        self.pendingLock.unlock()
+
+
+    def isObsolete(self, frame):
+        '''
+        isObsolete returns True if a frame has been superseded or cancelled. This
+        is called by the workers before they start decoding.
+        '''
+        if frame.cancelled:
+            return True
+        elif frame.prefetch:
+            return frame.count <= self.prefetchCutoff
+        else:
+            return frame.sequence < self.latestSequence
+
+
+    def imageFinished(self, request, cancelled=False):
+        '''
+        imageFinished is called by the workers when they finish an image or discard an
+        obsolete one. When all of a frame's images are finished, the frame is returned
+        unless it was cancelled.
+        '''
+
+        frame = request.frame
+        request.finishedTime = time.perf_counter()
+
+        self.pendingLock.lock()
+        if cancelled:
+            frame.cancelled = True
+        frame.nRemaining -= 1
+        frameDone = frame.nRemaining == 0
+        if frameDone:
+            if frame.prefetch:
+                self.nPrefetching -= 1
+            else:
+                self.nPending -= 1
+            if frame.cancelled:
+                self.nCancelled += 1
+        nPending = self.nPending
+        self.pendingLock.unlock()
+
+        if not frameDone:
+            return
+
+        if not frame.cancelled:
+            #  compute the time between the first and last image finishing
+            times = [frame.images[v].finishedTime for v in frame.images
+                    if frame.images[v].finishedTime is not None]
+            frame.skew = max(times) - min(times)
+            self.frameLoaded.emit(frame)
+
+        self.queueChanged.emit(nPending)
+
+
+    def cancelledCount(self):
+        '''
+        cancelledCount returns the number of frames that were discarded before
+        being decoded
+        '''
+        return self.nCancelled
+
+
+    def stop(self):
+        '''
+        stop tells the workers to exit and waits for them to finish. Any queued
+        frames that haven't been started are discarded.
+        '''
+
+        #  discard pending requests
+        self.pendingLock.lock()
+        try:
+            while True:
+                priority, count, request = self.requests.get_nowait()
+                frame = request.frame
+                frame.cancelled = True
+                frame.nRemaining -= 1
+                if frame.nRemaining == 0:
+                    if frame.prefetch:
+                        self.nPrefetching -= 1
+                    else:
+                        self.nPending -= 1
+        except queue.Empty:
+            pass
+
+        #  send each worker the sentinel and wait for them to exit
+        for worker in self.workers:
+            self.requestCount += 1
+            self.requests.put((self.STOP, self.requestCount, None))
+        nPending = self.nPending
+        self.pendingLock.unlock()
+        for worker in self.workers:
+            worker.wait()
+        self.workers = []
+
+        #  the discarded frames are no longer pending
+        self.queueChanged.emit(nPending)
+
+
+class LoaderWorker(QThread):
+    '''
+    LoaderWorker pulls image requests off of the loader's queue and decodes them.
+    '''
+
+    def __init__(self, loader):
+        super(LoaderWorker, self).__init__()
+        self.loader = loader
+
+
+    def run(self):
+
+        while True:
+            priority, count, request = self.loader.requests.get()
+            if request is None:
+                #  we've been told to exit
+                break
+
+            if self.loader.isObsolete(request.frame):
+                #  a newer frame has replaced this one - don't bother decoding it
+                self.loader.imageFinished(request, cancelled=True)
+                continue
+
+            request.decode(cache=self.loader.diskCache)
+            request.enhance()
+
+            self.loader.imageFinished(request)
+
+
+def decodeImage(filename, scale=1):
+    '''
+    decodeImage reads an image file and returns it as a BGR numpy array. We read
+    the bytes ourselves and decode from memory since cv2.imread doesn't handle
+    non-ascii paths on Windows. OpenCV releases the GIL while decoding so multiple
+    workers can decode in parallel. Set scale to 2, 4, or 8 to decode the image at
+    1/2, 1/4, or 1/8 resolution.
+    '''
+
+    return decodeImageData(readImageFile(filename), filename, scale=scale)
+
+
+def readImageFile(filename, cache=None):
+    '''
+    readImageFile reads an image file and returns the raw bytes as a numpy array.
+    If a DiskCache is provided the file is read through it.
+    '''
+
+    if cache is not None:
+        data = cache.read(filename)
+    else:
+        data = np.fromfile(filename, dtype=np.uint8)
+    if data.size == 0:
+        raise IOError('Image file ' + filename + ' is empty.')
+
+    return data
+
+
+def decodeImageData(data, filename, scale=1):
+    '''
+    decodeImageData decodes the raw bytes of an image file at the provided scale.
+    The filename is only used in the error message.
+    '''
+
+    image = cv2.imdecode(data, DECODE_FLAGS[scale])
+    if image is None:
+        raise IOError('Unable to decode image file ' + filename)
+
+    return image
+
+
+def selectDecodeScale(imageWidth, imageHeight, viewWidth, viewHeight):
+    '''
+    selectDecodeScale returns the largest decode scale where the reduced image is
+    still at least as large as the view it is displayed in. If the image or view
+    size is unknown, 1 (full resolution) is returned.
+    '''
+
+    if imageWidth <= 0 or imageHeight <= 0 or viewWidth <= 0 or viewHeight <= 0:
+        return 1
+
+    for scale in [8, 4, 2]:
+        if (imageWidth / scale >= viewWidth) and (imageHeight / scale >= viewHeight):
+            return scale
+
+    return 1
@@ -0,0 +1,357 @@
+import os
+import csv
+import json
+import time
+import functools
+import collections
+from PyQt6.QtCore import *
+from PyQt6.QtGui import *
+from PyQt6.QtWidgets import *
+import numpy as np
+
+
+#  define the pipeline stages in the order they occur. Stages that don't apply to
+#  a frame (for example the decode stages when the image was cached) are NaN.
+#
+#    request - from the slider event to the frame being handed to the loader
+#    queue   - from the frame being queued to a worker starting on the image
+#    read    - reading the image file
+#    decode  - decoding the image
+#    enhance - applying the image enhancements
+#    scene   - updating the viewer's scene with the new image
+#    hud     - updating the HUD text
+#    paint   - from the HUD update until the viewer has repainted
+#
+#  Video exports don't use the viewers. Their stage utilization is reported by the
+#  video exporter.
+STAGES = ['request', 'queue', 'read', 'decode', 'enhance', 'scene', 'hud', 'paint']
+VIEWERS = ['left', 'right']
+
+
+class PipelineStats(QObject):
+    '''
+    PipelineStats collects per frame timings of the image pipeline for both viewers.
+    The timings of the most recent frames are kept so rolling percentiles and the
+    achieved display rate can be reported. Each frame can also be written to a log
+    file. The log format is chosen by the file extension: .csv files get one row
+    per viewer per frame and any other extension gets one JSON object per line.
+
+    A frame's record is started when it is presented and is finished when both
+    viewers have repainted (or when the next frame is presented).
+    '''
+
+    #  define PyQt Signals
+    updated = pyqtSignal()
+
+    def __init__(self, windowLength=200, parent=None):
+        super(PipelineStats, self).__init__(parent)
+
+        self.enabled = False
+        self.windowLength = windowLength
+        self.times = {}
+        self.displayTimes = collections.deque(maxlen=windowLength)
+        self.nFrames = 0
+        self.record = None
+        self.viewports = {}
+        self.logFile = None
+        self.logWriter = None
+        self.logFilename = None
+        self.reset()
+
+
+    def reset(self):
+        '''
+        reset discards the collected timings
+        '''
+        self.times = {}
+        for viewer in VIEWERS:
+            self.times[viewer] = {}
+            for stage in STAGES:
+                self.times[viewer][stage] = collections.deque(maxlen=self.windowLength)
+        self.displayTimes.clear()
+        self.nFrames = 0
+        self.record = None
+
+
+    def setEnabled(self, enabled):
+        '''
+        setEnabled turns the collection of timings on and off. Timings are only
+        collected when the stats panel is shown or a log is being written.
+        '''
+        if not enabled:
+            self.finishFrame()
+        self.enabled = enabled
+
+
+    def watchViewer(self, viewer, viewport):
+        '''
+        watchViewer installs an event filter on a viewer's viewport so we can tell
+        when the viewer has repainted.
+        '''
+        self.viewports[viewport] = viewer
+        viewport.installEventFilter(self)
+
+
+    def eventFilter(self, obj, event):
+
+        if (self.record is not None and event.type() == QEvent.Type.Paint and
+                obj in self.viewports):
+            viewer = self.viewports[obj]
+            if viewer in self.record['pendingPaint']:
+                #  the paint event is handled after we return, so we note the
+                #  time once the event loop gets back to us
+                self.record['pendingPaint'].discard(viewer)
+                QTimer.singleShot(0, functools.partial(self.paintFinished, self.record,
+                        viewer))
+
+        return False
+
+
+    def paintFinished(self, record, viewer):
+        '''
+        paintFinished is called after a viewer has repainted
+        '''
+        if record is not self.record:
+            #  this frame has already been finished
+            return
+
+        record['times'][viewer]['paint'] = (time.perf_counter() -
+                record['presented'][viewer])
+        record['painted'].add(viewer)
+        if record['painted'] >= set(record['times'].keys()):
+            self.finishFrame()
+
+
+    def framePresented(self, frame, presentTimes):
+        '''
+        framePresented is called when a frame has been displayed. presentTimes is a
+        dict keyed by viewer of dicts containing the 'start', 'scene', and 'hud' times
+        recorded while presenting the image.
+        '''
+        if not self.enabled:
+            return
+
+        #  finish the previous frame if its viewers haven't repainted yet
+        self.finishFrame()
+
+        record = {'number':frame.number, 'sequence':frame.sequence, 'times':{},
+                'presented':{}, 'painted':set(), 'pendingPaint':set(),
+                'wallTime':time.time()}
+        for viewer in frame.images:
+            if viewer not in presentTimes:
+                continue
+            request = frame.images[viewer]
+            times = dict.fromkeys(STAGES, np.nan)
+            times['request'] = frame.queuedTime - frame.eventTime
+            if 'start' in request.times:
+                times['queue'] = request.times['start'] - frame.queuedTime
+            if 'read' in request.times:
+                times['read'] = request.times['read'] - request.times['start']
+            if 'decoded' in request.times:
+                times['decode'] = request.times['decoded'] - request.times['read']
+            if 'enhance' in request.times:
+                times['enhance'] = request.times['enhance']
+            present = presentTimes[viewer]
+            times['scene'] = present['scene'] - present['start']
+            times['hud'] = present['hud'] - present['scene']
+
+            record['times'][viewer] = times
+            record['presented'][viewer] = present['hud']
+            record['pendingPaint'].add(viewer)
+
+        if record['times']:
+            self.record = record
+            self.displayTimes.append(time.perf_counter())
+
+
+    def finishFrame(self):
+        '''
+        finishFrame adds the current frame's timings to the rolling windows and
+        writes them to the log.
+        '''
+        if self.record is None:
+            return
+
+        record = self.record
+        self.record = None
+        for viewer in record['times']:
+            for stage in STAGES:
+                self.times[viewer][stage].append(record['times'][viewer][stage])
+        self.nFrames += 1
+
+        if self.logFile is not None:
+            self.writeRecord(record)
+
+        self.updated.emit()
+
+
+    def percentiles(self, viewer, stage, percentiles=[50, 90, 99]):
+        '''
+        percentiles returns a list of the requested percentiles (in milliseconds) of
+        the timings in the rolling window. NaNs are returned if there are no timings.
+        '''
+        values = np.array(self.times[viewer][stage], dtype=float)
+        if values.size == 0 or np.all(np.isnan(values)):
+            return [np.nan] * len(percentiles)
+
+        return list(np.nanpercentile(values, percentiles) * 1000.)
+
+
+    def displayRate(self):
+        '''
+        displayRate returns the achieved display rate in frames per second over the
+        rolling window
+        '''
+        if len(self.displayTimes) < 2:
+            return 0.
+
+        elapsed = self.displayTimes[-1] - self.displayTimes[0]
+        if elapsed <= 0:
+            return 0.
+
+        return (len(self.displayTimes) - 1) / elapsed
+
+
+    def startLog(self, filename):
+        '''
+        startLog starts writing the frame timings to the provided file. Returns
+        True if the file was opened.
+        '''
+        self.stopLog()
+        try:
+            self.logFile = open(filename, 'w', newline='')
+        except:
+            self.logFile = None
+            return False
+
+        self.logFilename = filename
+        if os.path.splitext(filename)[1].lower() == '.csv':
+            self.logWriter = csv.writer(self.logFile)
+            self.logWriter.writerow(['time', 'sequence', 'number', 'viewer'] +
+                    [stage + '_ms' for stage in STAGES])
+        else:
+            self.logWriter = None
+
+        return True
+
+
+    def stopLog(self):
+        '''
+        stopLog closes the log file
+        '''
+        if self.logFile is not None:
+            self.logFile.close()
+        self.logFile = None
+        self.logWriter = None
+        self.logFilename = None
+
+
+    def isLogging(self):
+        return self.logFile is not None
+
+
+    def writeRecord(self, record):
+        '''
+        writeRecord writes a frame's timings to the log file
+        '''
+        for viewer in record['times']:
+            times = record['times'][viewer]
+            values = [None if np.isnan(times[stage]) else round(times[stage] * 1000., 3)
+                    for stage in STAGES]
+            if self.logWriter is not None:
+                self.logWriter.writerow([round(record['wallTime'], 3), record['sequence'],
+                        record['number'], viewer] + ['' if v is None else v for v in values])
+            else:
+                line = {'time':round(record['wallTime'], 3), 'sequence':record['sequence'],
+                        'number':record['number'], 'viewer':viewer}
+                for stage, value in zip(STAGES, values):
+                    line[stage + '_ms'] = value
+                self.logFile.write(json.dumps(line) + '\n')
+
+
+class PipelineStatsPanel(QDockWidget):
+    '''
+    PipelineStatsPanel is a dock widget that displays the rolling percentiles of
+    the pipeline stage timings for both viewers along with the achieved display rate.
+    '''
+
+    #  define PyQt Signals
+    logToggled = pyqtSignal(bool)
+
+    def __init__(self, stats, parent=None):
+        super(PipelineStatsPanel, self).__init__('Pipeline Stats', parent)
+
+        self.stats = stats
+        self.setObjectName('pipelineStatsPanel')
+
+        widget = QWidget(self)
+        layout = QVBoxLayout(widget)
+
+        self.rateLabel = QLabel(widget)
+        layout.addWidget(self.rateLabel)
+
+        #  create the table - one row per stage and p50/p90/p99 columns for each viewer
+        self.columns = ['p50', 'p90', 'p99']
+        self.table = QTableWidget(len(STAGES), len(VIEWERS) * len(self.columns), widget)
+        self.table.setVerticalHeaderLabels(STAGES)
+        self.table.setHorizontalHeaderLabels([viewer[0].upper() + ' ' + column
+                for viewer in VIEWERS for column in self.columns])
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        for row in range(self.table.rowCount()):
+            for column in range(self.table.columnCount()):
+                item = QTableWidgetItem('')
+                item.setTextAlignment(Qt.AlignmentFlag.AlignRight |
+                        Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+        layout.addWidget(self.table)
+
+        buttonLayout = QHBoxLayout()
+        self.pbLog = QPushButton('Log...', widget)
+        self.pbLog.setCheckable(True)
+        self.pbLog.clicked.connect(self.logToggled)
+        buttonLayout.addWidget(self.pbLog)
+        self.pbReset = QPushButton('Reset', widget)
+        self.pbReset.clicked.connect(self.resetStats)
+        buttonLayout.addWidget(self.pbReset)
+        layout.addLayout(buttonLayout)
+
+        self.setWidget(widget)
+
+        #  the panel is updated at most a few times a second
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.setSingleShot(True)
+        self.refreshTimer.timeout.connect(self.refresh)
+        self.stats.updated.connect(self.scheduleRefresh)
+
+        self.refresh()
+
+
+    def scheduleRefresh(self):
+        if self.isVisible() and not self.refreshTimer.isActive():
+            self.refreshTimer.start(250)
+
+
+    def resetStats(self):
+        self.stats.reset()
+        self.refresh()
+
+
+    def refresh(self):
+        '''
+        refresh updates the table with the current percentiles
+        '''
+        self.rateLabel.setText('Display rate: %.1f fps   Frames: %d' %
+                (self.stats.displayRate(), self.stats.nFrames))
+
+        for row, stage in enumerate(STAGES):
+            for i, viewer in enumerate(VIEWERS):
+                values = self.stats.percentiles(viewer, stage)
+                for j, value in enumerate(values):
+                    if np.isnan(value):
+                        text = '--'
+                    else:
+                        text = '%.1f' % value
+                    self.table.item(row, i * len(self.columns) + j).setText(text)
+
+        self.pbLog.setChecked(self.stats.isLogging())
@@ -0,0 +1,150 @@
+import collections
+import numpy as np
+
+
+class PlaybackClock(object):
+    '''
+    PlaybackClock schedules playback using the image times instead of a fixed
+    interval. The deployment time advances at the wall clock rate times the speed
+    multiplier and the clock returns the index of the frame that should be showing.
+
+    There are two modes:
+
+        REAL_TIME   - hold wall clock pace. If the display falls behind, the frames
+                      that are late are skipped and counted as dropped.
+        EVERY_FRAME - show every frame. If the display falls behind, the clock is
+                      pulled back so playback runs slow instead of skipping frames.
+
+    Gaps between images longer than maxGap seconds (for example when the system
+    stopped recording) are shortened to maxGap so playback doesn't stall.
+    '''
+
+    REAL_TIME = 'realtime'
+    EVERY_FRAME = 'everyframe'
+
+    def __init__(self, frameTimes, mode=REAL_TIME, maxGap=2.0, rateWindow=30):
+
+        self.mode = mode
+        self.speed = 1.
+        self.wallStart = 0.
+        self.playStart = 0.
+        self.nDropped = 0
+        self.shownTimes = collections.deque(maxlen=rateWindow)
+
+        #  build the playback time of each frame from the clipped intervals. Frames
+        #  without a time are given the time of the previous frame.
+        frameTimes = np.asarray(frameTimes, dtype=float)
+        fill = np.where(np.isfinite(frameTimes), np.arange(frameTimes.size), 0)
+        frameTimes = frameTimes[np.maximum.accumulate(fill)]
+        deltas = np.diff(frameTimes, prepend=frameTimes[0] if frameTimes.size else 0)
+        deltas[~np.isfinite(deltas)] = 0.
+        deltas = np.clip(deltas, 0., maxGap)
+        self.times = np.cumsum(deltas)
+
+        #  the nominal interval is used to report the requested rate
+        positive = deltas[deltas > 0]
+        if positive.size > 0:
+            self.interval = float(np.median(positive))
+        else:
+            self.interval = 1.
+
+
+    def start(self, index, speed, now):
+        '''
+        start starts the clock at the provided index
+        '''
+        self.speed = speed
+        self.nDropped = 0
+        self.shownTimes.clear()
+        self.rebase(index, now)
+
+
+    def rebase(self, index, now):
+        '''
+        rebase sets the clock so the provided index is due now
+        '''
+        self.wallStart = now
+        self.playStart = self.times[index]
+
+
+    def setSpeed(self, speed, index, now):
+        '''
+        setSpeed changes the speed multiplier. The clock is rebased at the current
+        index so the change takes effect immediately.
+        '''
+        self.speed = speed
+        self.rebase(index, now)
+
+
+    def playTime(self, now):
+        '''
+        playTime returns the deployment time (relative to the first frame) at the
+        provided wall clock time
+        '''
+        return self.playStart + (now - self.wallStart) * self.speed
+
+
+    def nextIndex(self, index, now):
+        '''
+        nextIndex returns the index that should be shown at the provided wall clock
+        time or None if the next frame isn't due yet. The caller should only call
+        this when the current frame has been displayed.
+        '''
+        if index + 1 >= self.times.size:
+            return None
+
+        playTime = self.playTime(now)
+        if self.times[index + 1] > playTime:
+            #  the next frame isn't due
+            return None
+
+        if self.mode == self.EVERY_FRAME:
+            nextIndex = index + 1
+            if nextIndex + 1 < self.times.size and self.times[nextIndex + 1] <= playTime:
+                #  we're behind - pull the clock back instead of skipping frames
+                self.rebase(nextIndex, now)
+        else:
+            #  find the last frame that is due - anything between is dropped
+            nextIndex = int(np.searchsorted(self.times, playTime, side='right')) - 1
+            nextIndex = min(max(nextIndex, index + 1), self.times.size - 1)
+            self.nDropped += nextIndex - index - 1
+
+        self.shownTimes.append(now)
+
+        return nextIndex
+
+
+    def timeUntilNext(self, index, now):
+        '''
+        timeUntilNext returns the wall clock time, in seconds, until the frame after
+        the provided index is due
+        '''
+        if index + 1 >= self.times.size or self.speed <= 0:
+            return 0.
+
+        return max(0., (self.times[index + 1] - self.playTime(now)) / self.speed)
+
+
+    def isFinished(self, index):
+        return index + 1 >= self.times.size
+
+
+    def requestedRate(self):
+        '''
+        requestedRate returns the nominal frame rate at the current speed
+        '''
+        return self.speed / self.interval
+
+
+    def achievedRate(self):
+        '''
+        achievedRate returns the rate frames have been shown at over the recent frames
+        '''
+        if len(self.shownTimes) < 2:
+            return 0.
+
+        elapsed = self.shownTimes[-1] - self.shownTimes[0]
+        if elapsed <= 0:
+            return 0.
+
+        return (len(self.shownTimes) - 1) / elapsed
@@ -0,0 +1,121 @@
+import time
+import collections
+import numpy as np
+
+
+class QualityGovernor(object):
+    '''
+    QualityGovernor adjusts the image quality used while scrubbing and playing back
+    so the display keeps up on slower machines. The browser reports the latency of
+    each displayed frame (from the request to the frame being presented) along with
+    the deadline the frame had to meet. When too many of the recent frames miss
+    their deadline, the quality is lowered one level. When the recent frames are
+    comfortably within their deadline, the quality is raised one level.
+
+    Each level defines:
+
+        name      - the name shown on the HUD
+        minScale  - the minimum decode scale used while scrubbing
+        enhance   - if False, image enhancements are skipped while scrubbing
+        prefetch  - the multiplier applied to the number of frames prefetched
+
+    The quality level only applies while the images are changing quickly. Once
+    the slider settles the images are reloaded at full quality.
+    '''
+
+    LEVELS = [{'name':'Full', 'minScale':1, 'enhance':True, 'prefetch':1.0},
+              {'name':'High', 'minScale':2, 'enhance':True, 'prefetch':1.5},
+              {'name':'Medium', 'minScale':4, 'enhance':True, 'prefetch':2.0},
+              {'name':'Low', 'minScale':4, 'enhance':False, 'prefetch':2.0},
+              {'name':'Lowest', 'minScale':8, 'enhance':False, 'prefetch':3.0}]
+
+    def __init__(self, windowLength=20, missFraction=0.25, headroom=0.5, holdTime=1.0):
+
+        self.windowLength = windowLength
+        self.missFraction = missFraction
+        self.headroom = headroom
+        self.holdTime = holdTime
+        self.enabled = True
+        self.level = 0
+        self.lastChange = 0.
+        self.ratios = collections.deque(maxlen=windowLength)
+
+
+    def reset(self):
+        '''
+        reset returns to full quality and discards the recent frame latencies
+        '''
+        self.level = 0
+        self.ratios.clear()
+
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+        if not enabled:
+            self.reset()
+
+
+    def current(self):
+        '''
+        current returns the dict describing the current quality level
+        '''
+        return self.LEVELS[self.level]
+
+
+    def addFrame(self, latency, deadline, now=None):
+        '''
+        addFrame adds the latency of a displayed frame and the deadline, both in
+        seconds, it had to meet. Returns True if the quality level changed.
+        '''
+        if not self.enabled or deadline <= 0:
+            return False
+
+        self.ratios.append(latency / deadline)
+
+        return self.update(now)
+
+
+    def addMisses(self, nMissed, now=None):
+        '''
+        addMisses counts frames that weren't displayed at all (for example frames
+        that were dropped during playback) as missed deadlines. Returns True if the
+        quality level changed.
+        '''
+        if not self.enabled or nMissed <= 0:
+            return False
+
+        for i in range(min(nMissed, self.windowLength)):
+            self.ratios.append(np.inf)
+
+        return self.update(now)
+
+
+    def update(self, now=None):
+        '''
+        update changes the quality level if the recent frames call for it. The
+        level is held for at least holdTime seconds after a change so the new
+        level's latencies are measured before changing again.
+        '''
+        if now is None:
+            now = time.perf_counter()
+        if now - self.lastChange < self.holdTime:
+            return False
+
+        nFrames = len(self.ratios)
+        ratios = np.array(self.ratios, dtype=float)
+        if (nFrames >= self.windowLength // 2 and self.level < len(self.LEVELS) - 1 and
+                np.count_nonzero(ratios > 1.) >= self.missFraction * nFrames):
+            #  too many frames are late - lower the quality
+            self.level += 1
+        elif (nFrames >= self.windowLength and self.level > 0 and
+                np.count_nonzero(ratios < self.headroom) >= 0.9 * nFrames):
+            #  90% of the frames have plenty of headroom - raise the quality. Dropped
+            #  frames are infinite ratios so we count instead of taking a percentile.
+            self.level -= 1
+        else:
+            return False
+
+        self.lastChange = now
+        self.ratios.clear()
+
+        return True
@@ -0,0 +1,104 @@
+import sys
+import types
+import pytest
+
+QtCore = pytest.importorskip('PyQt6.QtCore')
+QtWidgets = pytest.importorskip('PyQt6.QtWidgets')
+pytest.importorskip('matplotlib')
+
+
+class ImageItem(object):
+    #  the parts of the viewer's image item the browser uses
+
+    def __init__(self):
+        self.enhancementsEnabled = False
+        self.parameters = {}
+
+    def getParameters(self):
+        return dict(self.parameters)
+
+    def setParameters(self, parameters):
+        self.parameters = dict(parameters)
+
+
+class FakeMetadata(object):
+    #  a stand in for the deployment metadata database with no deployment open
+
+    def close(self):
+        pass
+
+
+class FakeImageViewer(QtWidgets.QGraphicsView):
+    #  a stand in for MaceFunctions' QImageViewer when it isn't installed
+
+    keyPress = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, parent=None):
+        super(FakeImageViewer, self).__init__(parent)
+        self.setScene(QtWidgets.QGraphicsScene(self))
+        self.image = ImageItem()
+
+    def __getattr__(self, name):
+        #  the viewer methods that only draw do nothing
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+
+def installViewerDoubles(monkeypatch):
+    '''
+    installViewerDoubles adds stand ins for the MaceFunctions modules the browser
+    imports if the package isn't installed
+    '''
+    try:
+        import MaceFunctions.QImageViewer.QImageViewer
+        import MaceFunctions.CamtrawlMetadata
+        return
+    except ImportError:
+        pass
+
+    package = types.ModuleType('MaceFunctions')
+    viewerPackage = types.ModuleType('MaceFunctions.QImageViewer')
+    viewerModule = types.ModuleType('MaceFunctions.QImageViewer.QImageViewer')
+    viewerModule.QImageViewer = FakeImageViewer
+    metadataModule = types.ModuleType('MaceFunctions.CamtrawlMetadata')
+    metadataModule.CamTrawlMetadata = FakeMetadata
+    package.QImageViewer = viewerPackage
+    package.CamtrawlMetadata = metadataModule
+    viewerPackage.QImageViewer = viewerModule
+    for name, module in [['MaceFunctions', package],
+            ['MaceFunctions.QImageViewer', viewerPackage],
+            ['MaceFunctions.QImageViewer.QImageViewer', viewerModule],
+            ['MaceFunctions.CamtrawlMetadata', metadataModule]]:
+        monkeypatch.setitem(sys.modules, name, module)
+    for name in ['CamtrawlBrowser', 'gridView', 'batchExport', 'ui.ui_CamtrawlBrowser']:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('QT_QPA_PLATFORM', 'offscreen')
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path / 'config'))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    application = QtWidgets.QApplication.instance() or QtWidgets.QApplication(['test'])
+    QtCore.QCoreApplication.setOrganizationName('CamtrawlBrowserTest')
+
+    return application
+
+
+def testMainWindowStarts(app, monkeypatch):
+    installViewerDoubles(monkeypatch)
+    import CamtrawlBrowser
+
+    window = CamtrawlBrowser.CamtrawlBrowser(resetWindowPosition=True)
+    try:
+        assert window.exportProcesses >= 1
+        assert window.appSettings is not None
+
+        #  the viewers' enhancements are off so the loader doesn't enhance
+        assert window.getEnhancement('left') == [None, None]
+        assert window.getCacheKey('left', 1, 2) == ('left', 1, 2, None)
+    finally:
+        window.close()
+        window.deleteLater()
+        app.processEvents()
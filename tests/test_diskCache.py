@@ -0,0 +1,156 @@
+import os
+import numpy as np
+import pytest
+import diskCache
+
+
+def makeDeployment(share, name='D20240101-T000000', nImages=3):
+    #  write a small deployment with a metadata database and a few image files
+    dataDir = share / name
+    (dataDir / 'logs').mkdir(parents=True)
+    (dataDir / 'logs' / (name + '.db')).write_bytes(b'metadata')
+    (dataDir / 'logs' / 'acquisition.log').write_text('started\n')
+    imageDir = dataDir / 'images' / 'left'
+    imageDir.mkdir(parents=True)
+    paths = []
+    for i in range(nImages):
+        path = imageDir / ('image_%03d.jpg' % i)
+        path.write_bytes(bytes([i]) * (100 + i))
+        paths.append(str(path))
+
+    return str(dataDir), paths
+
+
+def makeCache(cacheDir, dataDir):
+    cache = diskCache.DiskCache(str(cacheDir))
+    cache.setDeployment(dataDir)
+    cache.verifyThread.join()
+
+    return cache
+
+
+def wrapFromFile(fromfile, dataDir):
+    def checkedFromFile(path, *args, **kwargs):
+        assert not str(path).startswith(dataDir), 'the source was read'
+        return fromfile(path, *args, **kwargs)
+
+    return checkedFromFile
+
+
+@pytest.fixture
+def deployment(tmp_path):
+    return makeDeployment(tmp_path / 'share')
+
+
+def testMissThenHit(tmp_path, deployment):
+    dataDir, paths = deployment
+    cache = makeCache(tmp_path / 'cache', dataDir)
+
+    data = cache.read(paths[0])
+    assert data.tobytes() == open(paths[0], 'rb').read()
+    assert [cache.hits, cache.misses] == [0, 1]
+
+    data = cache.read(paths[0])
+    assert data.tobytes() == open(paths[0], 'rb').read()
+    assert [cache.hits, cache.misses] == [1, 1]
+
+
+def testHitsDontTouchTheSource(tmp_path, deployment, monkeypatch):
+    dataDir, paths = deployment
+    cache = makeCache(tmp_path / 'cache', dataDir)
+    cache.read(paths[1])
+
+    #  a new session lists the source directory once when the deployment is set
+    cache = makeCache(tmp_path / 'cache', dataDir)
+    monkeypatch.setattr(diskCache.os, 'stat', lambda *args, **kwargs:
+            pytest.fail('the source was stat\'ed'))
+    monkeypatch.setattr(np, 'fromfile', wrapFromFile(np.fromfile, dataDir))
+    assert cache.read(paths[1]).size == 101
+    assert cache.hits == 1
+
+
+def testStaleSourceIsReadAgain(tmp_path, deployment):
+    dataDir, paths = deployment
+    cache = makeCache(tmp_path / 'cache', dataDir)
+    cache.read(paths[2])
+
+    #  replace the source file after it was cached
+    with open(paths[2], 'wb') as f:
+        f.write(b'replaced')
+    stat = os.stat(paths[2])
+    os.utime(paths[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    #  the next session drops the stale copy and reads the new file
+    cache = makeCache(tmp_path / 'cache', dataDir)
+    assert len(cache.files) == 0
+    assert cache.read(paths[2]).tobytes() == b'replaced'
+    assert [cache.hits, cache.misses] == [0, 1]
+
+
+def testFetch(tmp_path, deployment):
+    dataDir, paths = deployment
+    cache = makeCache(tmp_path / 'cache', dataDir)
+    cache.fetch(paths[0])
+    cache.fetch(os.path.join(dataDir, 'images', 'left', 'missing.jpg'))
+    assert len(cache.files) == 1
+
+    cache.read(paths[0])
+    assert [cache.hits, cache.misses] == [1, 0]
+
+
+def testKeyDoesntDependOnThePath(tmp_path, deployment):
+    dataDir, paths = deployment
+    key = diskCache.deploymentKey(dataDir)
+
+    #  the same deployment mounted somewhere else
+    os.rename(os.path.dirname(dataDir), str(tmp_path / 'mount'))
+    moved = str(tmp_path / 'mount' / os.path.basename(dataDir))
+    assert diskCache.deploymentKey(moved) == key
+
+    #  updating the metadata database doesn't change the key
+    with open(os.path.join(moved, 'logs', os.path.basename(moved) + '.db'), 'ab') as f:
+        f.write(b'adjustments')
+    assert diskCache.deploymentKey(moved) == key
+
+    #  a different deployment with the same name has its own key
+    other, otherPaths = makeDeployment(tmp_path / 'other')
+    with open(os.path.join(other, 'logs', 'acquisition.log'), 'a') as f:
+        f.write('stopped\n')
+    assert diskCache.deploymentKey(other) != key
+
+
+def testCopyOnOpen(tmp_path, deployment):
+    dataDir, paths = deployment
+    cache = makeCache(tmp_path / 'cache', dataDir)
+    sourceDb = os.path.join(dataDir, 'logs', os.path.basename(dataDir) + '.db')
+
+    #  the metadata database is copied into the cache when the deployment is opened
+    localDir = cache.localizeMetadata(dataDir)
+    localDb = os.path.join(localDir, 'logs', os.path.basename(sourceDb))
+    assert open(localDb, 'rb').read() == b'metadata'
+    assert cache.findUnsyncedMetadata(dataDir) == []
+
+    #  local changes are copied back when the deployment is closed
+    with open(localDb, 'ab') as f:
+        f.write(b' changed')
+    assert cache.findUnsyncedMetadata(dataDir) == [[os.path.basename(sourceDb), False]]
+    assert cache.syncMetadata(dataDir) == []
+    assert open(sourceDb, 'rb').read() == b'metadata changed'
+
+
+def testSyncConflict(tmp_path, deployment):
+    dataDir, paths = deployment
+    cache = makeCache(tmp_path / 'cache', dataDir)
+    sourceDb = os.path.join(dataDir, 'logs', os.path.basename(dataDir) + '.db')
+    localDir = cache.localizeMetadata(dataDir)
+    localDb = os.path.join(localDir, 'logs', os.path.basename(sourceDb))
+
+    #  both copies change - the deployment's copy isn't overwritten unless forced
+    with open(localDb, 'ab') as f:
+        f.write(b' local')
+    with open(sourceDb, 'ab') as f:
+        f.write(b' someone else')
+    assert cache.syncMetadata(dataDir) == [os.path.basename(sourceDb)]
+    assert open(sourceDb, 'rb').read() == b'metadata someone else'
+    assert cache.syncMetadata(dataDir, force=True) == []
+    assert open(sourceDb, 'rb').read() == b'metadata local'
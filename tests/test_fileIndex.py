@@ -0,0 +1,62 @@
+import types
+import numpy as np
+import pytest
+import fileIndex
+
+
+def makeIndex(badRows):
+    index = fileIndex.FileIndex()
+    index.badRows = np.array(badRows, dtype=np.int64)
+
+    return index
+
+
+def testBadRanges():
+    assert makeIndex([]).getBadRanges() == []
+    assert makeIndex([4]).getBadRanges() == [[4, 4]]
+    assert makeIndex([0, 1, 2, 5, 7, 8]).getBadRanges() == [[0, 2], [5, 5], [7, 8]]
+
+
+def makeDeployment(tmp_path, nImages=8):
+    #  write a deployment where image 2 is missing, 3 is empty and 5 is truncated
+    imageDir = tmp_path / 'images' / 'left'
+    imageDir.mkdir(parents=True)
+    imageData = {}
+    for number in range(nImages):
+        name = 'image_%03d' % number
+        imageData[number] = [None, None, name]
+        if number == 2:
+            continue
+        elif number == 3:
+            data = b''
+        elif number == 5:
+            data = b'\xff\xd8' + b'\x00' * 100
+        else:
+            data = b'\xff\xd8' + b'\x00' * 100 + b'\xff\xd9'
+        (imageDir / (name + '.jpg')).write_bytes(data)
+
+    return types.SimpleNamespace(imageNumbers=list(range(nImages)),
+            imageData={'left':imageData}, imageExtension='.jpg')
+
+
+@pytest.mark.parametrize('checkContents', [False, True])
+def testBuilder(tmp_path, checkContents):
+    metadata = makeDeployment(tmp_path)
+    builder = fileIndex.FileIndexBuilder(metadata, str(tmp_path), ['left'],
+            checkContents=checkContents)
+    indexes = []
+    builder.indexReady.connect(indexes.append)
+    builder.run()
+
+    index = indexes[0]
+    assert index.isBad('left', 2) and index.isBad('left', 3)
+    assert index.getStatusText('left', 2) != index.getStatusText('left', 3)
+    if checkContents:
+        assert index.isBad('left', 5)
+        assert index.files['left'][5] is None
+        assert index.getBadRanges() == [[2, 3], [5, 5]]
+    else:
+        assert not index.isBad('left', 5)
+        assert index.getBadRanges() == [[2, 3]]
+    assert not index.isBad('left', 0)
+    assert index.files['left'][0].endswith('image_000.jpg')
@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import cv2
+from frameStore import FrameStore, FrameStoreBuilder
+
+
+def writeImages(tmp_path, nImages=4):
+    #  write an image for each frame with its number as the pixel value
+    imageDir = tmp_path / 'images'
+    imageDir.mkdir()
+    paths = []
+    for i in range(nImages):
+        path = str(imageDir / ('image_%03d.png' % i))
+        cv2.imwrite(path, np.full((64, 96, 3), i * 40, dtype=np.uint8))
+        paths.append(path)
+
+    return paths
+
+
+def sourceState(path):
+    stat = os.stat(path)
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def buildStore(tmp_path, paths):
+    store = FrameStore(str(tmp_path / 'stores'), 'left')
+    store.create(list(range(len(paths))), 48, 32, 2.)
+    for row, path in enumerate(paths):
+        store.setFrame(row, np.full((32, 48, 3), row * 40, dtype=np.uint8),
+                sourceState(path))
+    store.saveProgress()
+    store.close()
+
+    return store
+
+
+def testOpen(tmp_path):
+    paths = writeImages(tmp_path)
+    buildStore(tmp_path, paths)
+
+    store = FrameStore(str(tmp_path / 'stores'), 'left')
+    assert store.open([0, 1, 2, 3])
+    assert store.isComplete()
+    assert store.getImageSize() == [96, 64]
+    assert store.getFrame(2)[0, 0, 0] == 80
+    assert store.getFrame(7) is None
+
+    #  a store without all of the requested images is stale
+    assert not FrameStore(str(tmp_path / 'stores'), 'left').open([0, 1, 2, 3, 4])
+    assert not FrameStore(str(tmp_path / 'stores'), 'right').open()
+
+
+def testOpenDamagedStore(tmp_path):
+    paths = writeImages(tmp_path)
+    buildStore(tmp_path, paths)
+    np.save(str(tmp_path / 'stores' / 'left.done.npy'), np.ones(2, dtype=bool))
+
+    assert not FrameStore(str(tmp_path / 'stores'), 'left').open()
+
+
+def testVerify(tmp_path):
+    paths = writeImages(tmp_path)
+    buildStore(tmp_path, paths)
+    store = FrameStore(str(tmp_path / 'stores'), 'left')
+    assert store.open()
+    assert store.verify(paths) == 0
+
+    #  replace one image and remove another
+    cv2.imwrite(paths[1], np.full((64, 96, 3), 255, dtype=np.uint8))
+    stat = os.stat(paths[1])
+    os.utime(paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    os.remove(paths[3])
+    assert store.verify(paths) == 2
+    assert store.getFrame(1) is None and store.getFrame(3) is None
+    assert store.nDone() == 2
+
+    #  the flags are saved so a reopened store rebuilds the frames
+    store.close()
+    assert store.open()
+    assert store.nDone() == 2
+
+
+def testBuilderRebuildsChangedFrames(tmp_path):
+    paths = writeImages(tmp_path)
+    store = FrameStore(str(tmp_path / 'stores'), 'left')
+    builder = FrameStoreBuilder(48)
+    builder.addJob(store, [0, 1, 2, 3], paths)
+    builder.run()
+    assert store.isComplete()
+    assert store.getImageSize() == [96, 64]
+    assert store.getFrame(3)[0, 0, 0] == 120
+
+    cv2.imwrite(paths[2], np.full((64, 96, 3), 200, dtype=np.uint8))
+    stat = os.stat(paths[2])
+    os.utime(paths[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    builder = FrameStoreBuilder(48)
+    builder.addJob(store, [0, 1, 2, 3], paths)
+    builder.run()
+    assert store.isComplete()
+    assert store.getFrame(2)[0, 0, 0] == 200
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import cv2
+import imageEnhancer
+from imageEnhancer import ImageEnhancer
+
+
+def gammaEnhance(image):
+    #  a point operation with a different curve for each channel
+    curves = [np.clip(255. * (np.arange(256) / 255.) ** gamma, 0, 255)
+            for gamma in [0.5, 0.8, 1.4]]
+    lut = np.round(np.dstack(curves)).astype(np.uint8)
+    return cv2.LUT(image, lut)
+
+
+def autoLevelsEnhance(image):
+    #  the output depends on the image's histogram
+    low = int(image.min())
+    high = int(image.max())
+    scaled = (image.astype(np.float32) - low) * 255. / max(high - low, 1)
+    return np.clip(scaled + 10, 0, 255).astype(np.uint8)
+
+
+def sharpenEnhance(image):
+    #  the output depends on the neighboring pixels
+    return cv2.GaussianBlur(image, (3, 3), 0)
+
+
+def testPointOperationIsReproduced():
+    enhancer = ImageEnhancer.fromViewer(gammaEnhance)
+    assert enhancer is not None
+
+    image = np.random.RandomState(1).randint(0, 256, (48, 80, 3)).astype(np.uint8)
+    assert np.array_equal(enhancer.apply(image), gammaEnhance(image))
+
+
+def testGrayImagesAreConverted():
+    enhancer = ImageEnhancer.fromViewer(gammaEnhance)
+    gray = np.arange(256, dtype=np.uint8).reshape(16, 16)
+
+    enhanced = enhancer.apply(gray)
+    assert enhanced.shape == (16, 16, 3)
+    assert np.array_equal(enhanced, gammaEnhance(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)))
+
+
+def testImageDependentEnhancementsAreRejected():
+    assert ImageEnhancer.fromViewer(autoLevelsEnhance) is None
+    assert ImageEnhancer.fromViewer(sharpenEnhance) is None
+
+
+def testFailedEnhancementsAreRejected():
+    def failingEnhance(image):
+        raise RuntimeError('no viewer')
+
+    assert ImageEnhancer.fromViewer(failingEnhance) is None
+    assert ImageEnhancer.fromViewer(lambda image: image[:10]) is None
+
+
+def testParameterHash():
+    parameters = {'brightness':10, 'contrast':1.2}
+    assert imageEnhancer.parameterHash(parameters) == imageEnhancer.parameterHash(dict(parameters))
+    assert imageEnhancer.parameterHash(parameters) != imageEnhancer.parameterHash({'brightness':11})
+
+
+def testMatchesViewer():
+    #  compare the lookup table with the viewer's own enhancement code. This needs
+    #  the MaceFunctions package.
+    viewerModule = pytest.importorskip('MaceFunctions.QImageViewer.QImageViewer')
+    QtWidgets = pytest.importorskip('PyQt6.QtWidgets')
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(['test'])
+
+    probe = imageEnhancer.ViewerProbe(viewerModule.QImageViewer())
+    viewer = viewerModule.QImageViewer()
+    image = cv2.resize(np.random.RandomState(2).randint(0, 256, (12, 20, 3)).astype(np.uint8),
+            (160, 96), interpolation=cv2.INTER_NEAREST)
+
+    parameters = viewer.image.getParameters()
+    enhance = probe(parameters)
+    enhancer = ImageEnhancer.fromViewer(enhance)
+    if enhancer is None:
+        pytest.skip('the viewer\'s enhancements are not a point operation')
+
+    difference = np.abs(enhancer.apply(image).astype(np.int16) - enhance(image).astype(np.int16))
+    assert difference.max() <= 1
+
+
+def testLoaderEnhancesDecodedImages(tmp_path):
+    import imageLoader
+
+    path = str(tmp_path / 'image.png')
+    image = np.random.RandomState(2).randint(0, 256, (32, 48, 3)).astype(np.uint8)
+    cv2.imwrite(path, image)
+
+    #  the enhancer is applied to the decoded image and timed
+    frame = imageLoader.FrameRequest(1, 1)
+    request = frame.addImage('left', path)
+    request.enhancer = ImageEnhancer.fromViewer(gammaEnhance)
+    request.enhanceKey = imageEnhancer.parameterHash({'gamma':[0.5, 0.8, 1.4]})
+    frame.decode()
+    assert np.array_equal(request.image, image)
+    assert np.array_equal(request.enhanced, gammaEnhance(image))
+    assert request.times['enhance'] >= 0
+
+    #  an image with its enhanced version doesn't need decoding
+    cached = frame.addImage('right', path)
+    cached.enhanced = request.enhanced
+    assert not cached.needsDecode()
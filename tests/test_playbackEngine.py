@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from playbackEngine import PlaybackClock
+
+
+def testFramesFollowTheImageTimes():
+    #  images every 0.5 s with a 10 s gap that is shortened to 2 s
+    clock = PlaybackClock([0., 0.5, 1., 11., 11.5], maxGap=2.0)
+    assert np.allclose(clock.times, [0., 0.5, 1., 3., 3.5])
+    assert clock.requestedRate() == pytest.approx(2.)
+
+    clock.start(0, 1., now=100.)
+    assert clock.nextIndex(0, now=100.4) is None
+    assert clock.timeUntilNext(0, now=100.4) == pytest.approx(0.1)
+    assert clock.nextIndex(0, now=100.5) == 1
+
+
+def testMissingTimesUseThePreviousFrame():
+    clock = PlaybackClock([0., np.nan, 1., np.nan])
+    assert np.allclose(clock.times, [0., 0., 1., 1.])
+
+
+def testRealTimeDropsLateFrames():
+    clock = PlaybackClock(np.arange(10) * 0.1, mode=PlaybackClock.REAL_TIME)
+    clock.start(0, 1., now=0.)
+
+    #  the display fell 0.35 s behind - the frames in between are dropped
+    assert clock.nextIndex(0, now=0.35) == 3
+    assert clock.nDropped == 2
+    assert clock.nextIndex(3, now=0.4) == 4
+    assert clock.nDropped == 2
+
+
+def testEveryFrameRunsSlow():
+    clock = PlaybackClock(np.arange(10) * 0.1, mode=PlaybackClock.EVERY_FRAME)
+    clock.start(0, 1., now=0.)
+
+    #  the display fell behind - the next frame is shown and the clock pulled back
+    assert clock.nextIndex(0, now=0.35) == 1
+    assert clock.nDropped == 0
+    assert clock.nextIndex(1, now=0.4) is None
+    assert clock.nextIndex(1, now=0.45) == 2
+
+
+def testSpeed():
+    clock = PlaybackClock(np.arange(10) * 0.1)
+    clock.start(0, 2., now=0.)
+    assert clock.requestedRate() == pytest.approx(20.)
+    assert clock.nextIndex(0, now=0.05) == 1
+
+    #  changing the speed rebases at the current frame
+    clock.setSpeed(0.5, 1, now=1.)
+    assert clock.nextIndex(1, now=1.1) is None
+    assert clock.nextIndex(1, now=1.25) == 2
+
+
+def testAchievedRateAndEnd():
+    clock = PlaybackClock(np.arange(5) * 0.1)
+    clock.start(0, 1., now=0.)
+    index = 0
+    for i in range(1, 5):
+        index = clock.nextIndex(index, now=i * 0.1)
+    assert index == 4
+    assert clock.isFinished(index)
+    assert clock.nextIndex(index, now=10.) is None
+    assert clock.achievedRate() == pytest.approx(10.)
@@ -0,0 +1,67 @@
+import qualityGovernor
+
+
+def makeGovernor():
+    return qualityGovernor.QualityGovernor(windowLength=10, missFraction=0.25,
+            headroom=0.5, holdTime=1.0)
+
+
+def testStepDown():
+    governor = makeGovernor()
+
+    #  half a window of late frames lowers the quality one level
+    changed = [governor.addFrame(0.1, 0.05, now=10. + i * 0.01) for i in range(5)]
+    assert changed == [False] * 4 + [True]
+    assert governor.level == 1
+    assert governor.current()['minScale'] == 2
+
+
+def testOnTimeFramesDontStepDown():
+    governor = makeGovernor()
+    for i in range(20):
+        assert not governor.addFrame(0.04, 0.05, now=10. + i * 0.01)
+    assert governor.level == 0
+
+
+def testStepUp():
+    governor = makeGovernor()
+    governor.addMisses(10, now=10.)
+    assert governor.level == 1
+
+    #  a full window of fast frames after the hold time raises the quality
+    changed = [governor.addFrame(0.01, 0.05, now=12. + i * 0.01) for i in range(10)]
+    assert changed == [False] * 9 + [True]
+    assert governor.level == 0
+
+
+def testHoldTime():
+    governor = makeGovernor()
+    governor.addMisses(10, now=10.)
+    assert governor.level == 1
+
+    #  the level is held while the new level's latencies are measured
+    for i in range(10):
+        assert not governor.addFrame(0.1, 0.05, now=10.5 + i * 0.01)
+    assert governor.level == 1
+
+    #  after the hold time the next late frame lowers the quality again
+    assert governor.addFrame(0.1, 0.05, now=11.5)
+    assert governor.level == 2
+
+
+def testLevelLimits():
+    governor = makeGovernor()
+    for i in range(len(governor.LEVELS) + 2):
+        governor.addMisses(10, now=10. + i * 2.)
+    assert governor.level == len(governor.LEVELS) - 1
+
+    governor.reset()
+    assert governor.level == 0
+    assert not governor.addFrame(0.01, 0.05, now=100.)
+
+
+def testDisabled():
+    governor = makeGovernor()
+    governor.setEnabled(False)
+    assert not governor.addMisses(10, now=10.)
+    assert governor.level == 0
@@ -0,0 +1,149 @@
+import os
+import numpy as np
+import pytest
+import cv2
+import frameTable
+import videoExporter
+
+
+def makeJob(tmp_path, nFrames=20, filename='export.avi'):
+    #  write a small image for each frame and describe a two camera export of them
+    imageDir = tmp_path / 'images'
+    imageDir.mkdir(exist_ok=True)
+    paths = []
+    for i in range(nFrames):
+        path = str(imageDir / ('image_%03d.jpg' % i))
+        cv2.imwrite(path, np.full((48, 64, 3), i * 10, dtype=np.uint8))
+        paths.append(path)
+
+    sides = [videoExporter.ExportSide(camera, [32, 24], paths, [''] * nFrames,
+            fullSize=[64, 48]) for camera in ['left', 'right']]
+
+    return videoExporter.ExportJob(str(tmp_path / filename), 10., list(range(nFrames)),
+            sides, showHud=False, fourcc='MJPG')
+
+
+def countFrames(filename):
+    capture = cv2.VideoCapture(filename)
+    nFrames = 0
+    while capture.read()[0]:
+        nFrames += 1
+    capture.release()
+
+    return nFrames
+
+
+def joinVideos(ffmpeg, filenames, outputFilename):
+    #  join the segments with OpenCV in place of ffmpeg
+    writer = None
+    for filename in filenames:
+        capture = cv2.VideoCapture(filename)
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            if writer is None:
+                writer = cv2.VideoWriter(outputFilename, cv2.VideoWriter_fourcc(*'MJPG'),
+                        10., (frame.shape[1], frame.shape[0]))
+            writer.write(frame)
+        capture.release()
+    writer.release()
+
+
+@pytest.fixture
+def segmented(monkeypatch):
+    monkeypatch.setattr(videoExporter, 'CHECKPOINT_FRAMES', 5)
+    monkeypatch.setattr(videoExporter, 'concatenateVideos', joinVideos)
+
+
+def writeSegment(segment):
+    videoExporter.writeJob(segment)
+
+    return segment
+
+
+def testJournalLoad(tmp_path):
+    job = makeJob(tmp_path)
+    segment = writeSegment(job.segment(0, 5, str(tmp_path / 'segment_0000.avi')))
+
+    journal = videoExporter.ExportJournal(str(tmp_path), job.signature())
+    assert not journal.load()
+    journal.addSegment(segment)
+
+    journal = videoExporter.ExportJournal(str(tmp_path), job.signature())
+    assert journal.load()
+    assert journal.isComplete(segment)
+    assert not journal.isComplete(job.segment(5, 10, str(tmp_path / 'segment_0001.avi')))
+
+
+def testJournalSignatureMismatch(tmp_path):
+    job = makeJob(tmp_path)
+    segment = writeSegment(job.segment(0, 5, str(tmp_path / 'segment_0000.avi')))
+    journal = videoExporter.ExportJournal(str(tmp_path), job.signature())
+    journal.addSegment(segment)
+
+    #  a faster export of the same frames is a different job
+    otherJob = makeJob(tmp_path)
+    otherJob.fps = 20.
+    assert otherJob.signature() != job.signature()
+    journal = videoExporter.ExportJournal(str(tmp_path), otherJob.signature())
+    assert not journal.load()
+    assert not journal.isComplete(segment)
+
+
+def testJournalSizeCheck(tmp_path):
+    job = makeJob(tmp_path)
+    segment = writeSegment(job.segment(0, 5, str(tmp_path / 'segment_0000.avi')))
+    journal = videoExporter.ExportJournal(str(tmp_path), job.signature())
+    journal.addSegment(segment)
+
+    #  a segment file that was truncated isn't reused
+    with open(segment.filename, 'r+b') as f:
+        f.truncate(os.path.getsize(segment.filename) // 2)
+    assert not journal.isComplete(segment)
+
+
+def testSegmentsOnlyDependOnTheJob(tmp_path, segmented):
+    job = makeJob(tmp_path, nFrames=12)
+    for nProcesses in [1, 4]:
+        exporter = videoExporter.VideoExporter(job, nProcesses=nProcesses, ffmpeg='ffmpeg')
+        assert exporter.getSegmentCount() == 3
+    assert [segment.numbers for segment in job.split(str(tmp_path))] == [
+            list(range(0, 5)), list(range(5, 10)), [10, 11]]
+
+
+def testResumeAfterPartialRun(tmp_path, segmented):
+    job = makeJob(tmp_path)
+    results = []
+
+    #  cancel the first run part way through the second segment
+    exporter = videoExporter.VideoExporter(job, nProcesses=1, ffmpeg='ffmpeg')
+    exporter.progress.connect(lambda progress: exporter.stop() if progress >= 40 else None)
+    exporter.exportDone.connect(lambda completed, message: results.append(completed))
+    exporter.run()
+    assert results == [False]
+    assert exporter.nSaved == 5
+    segmentDir = videoExporter.getSegmentDir(job.filename)
+    journal = videoExporter.ExportJournal(segmentDir, job.signature())
+    assert journal.load()
+    assert list(journal.segments.keys()) == ['segment_0000.avi']
+
+    #  the second run only writes the remaining segments
+    exporter = videoExporter.VideoExporter(job, nProcesses=1, ffmpeg='ffmpeg')
+    exporter.exportDone.connect(lambda completed, message: results.append(completed))
+    exporter.run()
+    assert results == [False, True]
+    assert exporter.nResumed == 5
+    assert exporter.nExported == 20
+    assert countFrames(job.filename) == 20
+    assert not os.path.exists(segmentDir)
+
+
+def testExportNumbers():
+    imageIndex = frameTable.ImageIndex([1, 2, 3, 6, 7, 8])
+
+    #  numbers in gaps are replaced by the next image so the timing is kept
+    assert videoExporter.getExportNumbers(imageIndex, 1, 8) == [1, 2, 3, 6, 6, 6, 7, 8]
+    assert videoExporter.getExportNumbers(imageIndex, 2, 8, 3) == [2, 6, 8]
+    assert videoExporter.getExportNumbers(imageIndex, 7, 20, 5) == [7, 8, 8]
+    assert videoExporter.getExportNumbers(imageIndex, 5, 4) == []
@@ -0,0 +1,808 @@
+import os
+import json
+import time
+import queue
+import shutil
+import hashlib
+import threading
+import subprocess
+import multiprocessing
+import concurrent.futures
+from PyQt6.QtCore import *
+import cv2
+import imageLoader
+import frameCompositor
+
+
+#  define the HUD text properties. The HUD is drawn to match the viewers' HUD.
+HUD_COLOR = (0, 250, 0)
+HUD_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+#  long exports are split into segments of this many frames so an interrupted
+#  export can be resumed from the last completed segment. The segments only
+#  depend on the job so a resumed export finds the same segments.
+CHECKPOINT_FRAMES = 500
+
+#  define the export pipeline stages. Reading and decoding run in the same thread
+#  so their combined utilization can't exceed 100%.
+STAGES = ['read', 'decode', 'compose', 'encode']
+
+
+class ExportSide(object):
+    '''
+    ExportSide describes one camera's half of an exported video. paths and
+    timeStrings are lists with an entry for each exported frame. A path is None
+    if the camera doesn't have an image for that frame. The image is resized to
+    size ([width, height]) and, if an enhancer is provided, enhanced. fullSize is
+    the full resolution image size if it is known and is used to pick the decode
+    scale.
+    '''
+
+    def __init__(self, camera, size, paths, timeStrings, enhancer=None, fullSize=None,
+            enhanceText=''):
+
+        self.camera = camera
+        self.size = [int(size[0]), int(size[1])]
+        self.paths = paths
+        self.timeStrings = timeStrings
+        self.enhancer = enhancer
+        self.fullSize = fullSize
+        self.enhanceText = enhanceText
+
+
+class ExportJob(object):
+    '''
+    ExportJob describes a video export. numbers is the list of image numbers to
+    export and sides is the list of ExportSides which are placed left to right in
+    the video. The job only contains plain data so it can be handed to a worker
+    thread.
+    '''
+
+    def __init__(self, filename, fps, numbers, sides, showHud=True, fourcc='mp4v'):
+
+        self.filename = filename
+        self.fps = fps
+        self.numbers = numbers
+        self.sides = sides
+        self.showHud = showHud
+        self.fourcc = fourcc
+
+        self.width = sum([side.size[0] for side in sides])
+        self.height = max([side.size[1] for side in sides])
+
+
+    def segment(self, start, end, filename):
+        '''
+        segment returns a new job that exports the frames from index start up to but
+        not including index end to the provided file
+        '''
+        sides = [ExportSide(side.camera, side.size, side.paths[start:end],
+                side.timeStrings[start:end], enhancer=side.enhancer, fullSize=side.fullSize,
+                enhanceText=side.enhanceText) for side in self.sides]
+
+        return ExportJob(filename, self.fps, self.numbers[start:end], sides,
+                showHud=self.showHud, fourcc=self.fourcc)
+
+
+    def split(self, segmentDir):
+        '''
+        split divides the job into contiguous jobs of CHECKPOINT_FRAMES frames (the
+        last may be shorter) that write their frames to files in segmentDir
+        '''
+        extension = os.path.splitext(self.filename)[1]
+
+        return [self.segment(start, start + CHECKPOINT_FRAMES, os.path.join(segmentDir,
+                'segment_%04d%s' % (i, extension))) for i, start in
+                enumerate(range(0, len(self.numbers), CHECKPOINT_FRAMES))]
+
+
+    def signature(self):
+        '''
+        signature returns a hash of everything that affects the exported frames. The
+        output filename isn't included.
+        '''
+        description = [float(self.fps), self.fourcc, bool(self.showHud), self.width,
+                self.height, [int(number) for number in self.numbers]]
+        for side in self.sides:
+            if side.enhancer is None:
+                enhancement = None
+            else:
+                enhancement = side.enhancer.lut.tolist()
+            description.append([side.camera, side.size, side.paths, side.timeStrings,
+                    side.enhanceText, enhancement])
+
+        return hashlib.sha1(json.dumps(description).encode()).hexdigest()
+
+
+class ExportJournal(object):
+    '''
+    ExportJournal records the segments of a segmented export that have been
+    completely written so an interrupted export can be resumed. The journal is
+    a small JSON file in the segment directory and is rewritten after each segment
+    is finished. It holds the job's signature and, for each completed segment
+    file, the first and last image numbers, the number of frames, and the file
+    size. If the journal was written for a different job, it is discarded.
+    '''
+
+    def __init__(self, segmentDir, signature):
+
+        self.filename = os.path.join(segmentDir, 'journal.json')
+        self.signature = signature
+        self.segments = {}
+
+
+    def load(self):
+        '''
+        load reads the journal. Returns True if a journal for this job was found.
+        '''
+        self.segments = {}
+        try:
+            with open(self.filename, 'r') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if not isinstance(journal, dict) or journal.get('signature') != self.signature:
+            return False
+        self.segments = journal.get('segments', {})
+
+        return True
+
+
+    def save(self):
+        '''
+        save writes the journal. The journal is written to a temporary file which
+        replaces the old journal so an interruption can't leave a partial journal.
+        '''
+        tempFilename = self.filename + '.tmp'
+        with open(tempFilename, 'w') as f:
+            json.dump({'signature':self.signature, 'segments':self.segments}, f)
+        os.replace(tempFilename, self.filename)
+
+
+    def addSegment(self, segment):
+        '''
+        addSegment records a segment job as completed and saves the journal
+        '''
+        self.segments[os.path.basename(segment.filename)] = {
+                'first':int(segment.numbers[0]), 'last':int(segment.numbers[-1]),
+                'frames':len(segment.numbers), 'size':os.path.getsize(segment.filename)}
+        self.save()
+
+
+    def isComplete(self, segment):
+        '''
+        isComplete returns True if the segment job was completed by a previous export
+        and its file is still intact
+        '''
+        record = self.segments.get(os.path.basename(segment.filename))
+        if record is None:
+            return False
+        try:
+            size = os.path.getsize(segment.filename)
+        except OSError:
+            return False
+
+        return (record.get('first') == int(segment.numbers[0]) and
+                record.get('last') == int(segment.numbers[-1]) and
+                record.get('frames') == len(segment.numbers) and record.get('size') == size)
+
+
+def getSegmentDir(filename):
+    '''
+    getSegmentDir returns the directory the segments of the provided video file
+    are written to. The directory is next to the video so exporting to the same
+    file again finds the segments.
+    '''
+    filename = os.path.abspath(filename)
+
+    return os.path.join(os.path.dirname(filename), '.' + os.path.basename(filename) + '.export')
+
+
+class FrameRenderer(object):
+    '''
+    FrameRenderer renders the frames of an ExportJob without the viewers. Each
+    camera's image is decoded at the smallest scale that covers the output size,
+    enhanced, resized directly into its region of a reusable BGR output buffer
+    and the HUD text is drawn on top.
+
+    Decoding and composing are separate steps so they can run in different threads.
+    The renderer has nBuffers output buffers so a frame can be composed while the
+    previous frames are still being encoded. bytesWritten is the number of bytes
+    the last call to compose wrote to the output buffer. The times dict holds
+    the total time, in seconds, spent reading and decoding images.
+    '''
+
+    def __init__(self, job, cache=None, nBuffers=1):
+
+        self.job = job
+        self.cache = cache
+        self.bytesWritten = 0
+        self.times = {'read':0., 'decode':0.}
+
+        self.buffers = []
+        self.regions = []
+        for i in range(nBuffers):
+            buffer, regions = frameCompositor.createFrameBuffer([side.size for side in
+                    job.sides])
+            self.buffers.append(buffer)
+            self.regions.append(regions)
+
+        #  the full image size of each side - this is updated as images are decoded
+        self.fullSizes = [side.fullSize for side in job.sides]
+
+
+    def decode(self, index):
+        '''
+        decode returns a list of the decoded and enhanced images of each side for the
+        provided frame index (the index into job.numbers). Images that don't exist
+        or can't be read are None.
+        '''
+        images = []
+        for i, side in enumerate(self.job.sides):
+            path = side.paths[index]
+            if not path:
+                images.append(None)
+                continue
+
+            if self.fullSizes[i]:
+                scale = imageLoader.selectDecodeScale(self.fullSizes[i][0], self.fullSizes[i][1],
+                        side.size[0], side.size[1])
+            else:
+                scale = 1
+            startTime = time.perf_counter()
+            try:
+                data = imageLoader.readImageFile(path, cache=self.cache)
+                readTime = time.perf_counter()
+                self.times['read'] += readTime - startTime
+                image = imageLoader.decodeImageData(data, path, scale=scale)
+            except:
+                images.append(None)
+                continue
+            if not self.fullSizes[i]:
+                self.fullSizes[i] = [image.shape[1] * scale, image.shape[0] * scale]
+
+            if side.enhancer is not None:
+                image = side.enhancer.apply(image)
+            images.append(image)
+            self.times['decode'] += time.perf_counter() - readTime
+
+        return images
+
+
+    def compose(self, index, images, slot=0):
+        '''
+        compose resizes the provided images into the output buffer with the provided
+        slot number, draws the HUD and returns the buffer
+        '''
+        self.bytesWritten = 0
+        for side, region, image in zip(self.job.sides, self.regions[slot], images):
+            if image is None:
+                region[:] = 0
+            else:
+                resized = cv2.resize(image, (side.size[0], side.size[1]), dst=region,
+                        interpolation=cv2.INTER_AREA)
+                if resized is not region:
+                    #  OpenCV couldn't write into the region
+                    region[:] = resized
+            self.bytesWritten += region.nbytes
+
+            if self.job.showHud:
+                drawHud(region, side.camera, 'Frame: ' + str(self.job.numbers[index]),
+                        side.timeStrings[index], side.enhanceText)
+
+        return self.buffers[slot]
+
+
+def drawHud(image, cameraText, frameText, timeText, enhanceText):
+    '''
+    drawHud draws the HUD text on an image. The layout matches the viewers' HUD
+    with the camera name at the top center, the enhancement state top left, the
+    frame number bottom left and the time bottom right.
+    '''
+    height, width = image.shape[:2]
+    fontScale = max(height / 1000., 0.35)
+    margin = int(round(width * 0.02))
+
+    drawText(image, cameraText, width / 2., 2, fontScale, 'center', 'top')
+    drawText(image, enhanceText, margin, 2, fontScale, 'left', 'top')
+    drawText(image, frameText, margin, height - 2, fontScale, 'left', 'bottom')
+    drawText(image, timeText, width - margin, height - 2, fontScale, 'right', 'bottom')
+
+
+def drawText(image, text, x, y, fontScale, halign, valign):
+    '''
+    drawText draws text on an image aligned to the provided point
+    '''
+    if not text:
+        return
+
+    (textWidth, textHeight), baseline = cv2.getTextSize(text, HUD_FONT, fontScale, 1)
+    if halign == 'center':
+        x -= textWidth / 2.
+    elif halign == 'right':
+        x -= textWidth
+    if valign == 'top':
+        y += textHeight
+    else:
+        y -= baseline
+
+    cv2.putText(image, text, (int(round(x)), int(round(y))), HUD_FONT, fontScale,
+            HUD_COLOR, 1, cv2.LINE_AA)
+
+
+def writeJob(job, cache=None, frameDone=None, isAborted=None, depth=2):
+    '''
+    writeJob renders an ExportJob and writes it to its video file. The work is
+    split into pipelined stages that run at the same time: a thread reads and
+    decodes frame N+2 while another composes frame N+1 and the calling thread
+    encodes frame N. The queues between the stages hold at most depth frames so a
+    fast stage waits for the slower ones instead of running ahead.
+
+    frameDone is called after each frame is written with a dict, keyed by stage,
+    of the fraction of the elapsed time each stage has been busy. isAborted is
+    called before each frame and the export stops if it returns True. Returns a
+    list containing the number of frames written and the total number of bytes
+    composed into the output buffers. An IOError is raised if the video file can't be opened.
+    '''
+    writer = cv2.VideoWriter(job.filename, cv2.VideoWriter_fourcc(*job.fourcc),
+            job.fps, (job.width, job.height))
+    if not writer.isOpened():
+        raise IOError('Unable to open video file ' + job.filename)
+
+    #  each frame in the pipeline needs its own output buffer
+    nBuffers = depth + 2
+    renderer = FrameRenderer(job, cache=cache, nBuffers=nBuffers)
+    decoded = queue.Queue(maxsize=depth)
+    composed = queue.Queue(maxsize=depth)
+    freeSlots = queue.Queue()
+    for slot in range(nBuffers):
+        freeSlots.put(slot)
+    stop = threading.Event()
+    errors = []
+    busy = {'compose':0., 'encode':0.}
+
+    def decodeFrames():
+        try:
+            for index in range(len(job.numbers)):
+                if not putItem(decoded, [index, renderer.decode(index)], stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        putItem(decoded, None, stop)
+
+    def composeFrames():
+        try:
+            while True:
+                item = getItem(decoded, stop)
+                if item is None:
+                    break
+                slot = getItem(freeSlots, stop)
+                if slot is None:
+                    return
+                startTime = time.perf_counter()
+                frame = renderer.compose(item[0], item[1], slot)
+                busy['compose'] += time.perf_counter() - startTime
+                if not putItem(composed, [slot, frame, renderer.bytesWritten], stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        putItem(composed, None, stop)
+
+    threads = [threading.Thread(target=decodeFrames, daemon=True),
+            threading.Thread(target=composeFrames, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    nExported = 0
+    bytesWritten = 0
+    pipelineStart = time.perf_counter()
+    try:
+        while True:
+            if isAborted is not None and isAborted():
+                break
+            item = getItem(composed, stop)
+            if item is None:
+                break
+            slot, frame, nBytes = item
+
+            startTime = time.perf_counter()
+            writer.write(frame)
+            busy['encode'] += time.perf_counter() - startTime
+            freeSlots.put(slot)
+
+            bytesWritten += nBytes
+            nExported += 1
+            if frameDone is not None:
+                elapsed = max(time.perf_counter() - pipelineStart, 1e-6)
+                utilization = {'read':renderer.times['read'] / elapsed,
+                        'decode':renderer.times['decode'] / elapsed,
+                        'compose':busy['compose'] / elapsed,
+                        'encode':busy['encode'] / elapsed}
+                frameDone(utilization)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        writer.release()
+
+    if errors:
+        raise errors[0]
+
+    return [nExported, bytesWritten]
+
+
+def putItem(itemQueue, item, stop):
+    '''
+    putItem puts an item on a pipeline queue, waiting while the queue is full.
+    Returns False if the pipeline was stopped before the item could be queued.
+    '''
+    while not stop.is_set():
+        try:
+            itemQueue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def getItem(itemQueue, stop):
+    '''
+    getItem gets an item from a pipeline queue, waiting while the queue is empty.
+    Returns None if the pipeline was stopped.
+    '''
+    while not stop.is_set():
+        try:
+            return itemQueue.get(timeout=0.1)
+        except queue.Empty:
+            pass
+
+    return None
+
+
+def writeSegment(job, segment, progressQueue, abortEvent, reportInterval=10):
+    '''
+    writeSegment is run in the export processes to write one segment of a job.
+    The segment number, the number of frames written since the last report, and
+    the stage utilization are periodically put on the progress queue.
+    '''
+    #  the segments are already encoded in parallel so keep OpenCV from starting
+    #  its own threads in each process and oversubscribing the cores
+    cv2.setNumThreads(1)
+
+    counter = [0, None]
+
+    def frameDone(utilization):
+        counter[0] += 1
+        counter[1] = utilization
+        if counter[0] == reportInterval:
+            progressQueue.put([segment, counter[0], utilization])
+            counter[0] = 0
+
+    result = writeJob(job, frameDone=frameDone, isAborted=abortEvent.is_set)
+    if counter[0] > 0:
+        progressQueue.put([segment, counter[0], counter[1]])
+
+    return result
+
+
+def getVideoBaseRate(metadata):
+    '''
+    getVideoBaseRate returns the frame rate, in frames per second, that plays a
+    deployment's images back in real time. The rate is based on the camera with
+    the shortest average interval between images.
+    '''
+    #  first get the average interval
+    camIntervals = metadata.getIntervalAverage()
+
+    #  then determine the minimum interval (which is the maximum rate)
+    minInterval = 9999999
+    for camera in camIntervals:
+        if minInterval > camIntervals[camera]:
+            minInterval = camIntervals[camera]
+
+    #  and then compute FPS
+    return 1.0 / minInterval
+
+
+def getExportNumbers(imageIndex, startFrame, endFrame, frameStep=1):
+    '''
+    getExportNumbers returns the image numbers exported from startFrame to endFrame
+    (inclusive) when every frameStep'th number is exported. imageIndex is the
+    deployment's frameTable.ImageIndex. A number that isn't in the deployment is
+    replaced by the next image after it, like the slider does, so gaps in the
+    deployment don't change the video's timing.
+    '''
+    numbers = []
+    for number in range(startFrame, endFrame + 1, max(int(frameStep), 1)):
+        numbers.append(int(imageIndex.numbers[imageIndex.nearestIndex(number)]))
+
+    return numbers
+
+
+def getImageFile(metadata, dataDir, camera, number):
+    '''
+    getImageFile returns the full path, including the extension, of the image for
+    the provided camera and image number or None if the image isn't in the metadata
+    '''
+    try:
+        imageName = metadata.imageData[camera][number][2]
+    except KeyError:
+        return None
+
+    return os.path.normpath(dataDir + os.sep + 'images' + os.sep + camera + os.sep +
+            imageName + metadata.imageExtension)
+
+
+def getTimeString(metadata, camera, number):
+    '''
+    getTimeString returns the time string drawn on the HUD for an exported image or
+    an empty string if the camera doesn't have an image for that number
+    '''
+    try:
+        imageTime = metadata.imageData[camera][number][1]
+    except KeyError:
+        return ''
+
+    return (imageTime.strftime('%Y-%m-%d %H:%M:%S') +
+            '.%03d' % (imageTime.microsecond / 1000.))
+
+
+def setVideoSize(size):
+    #  this method just makes sure the size is divisible by 4
+    #  which some codecs require
+    return max(int(round(size / 4.)) * 4, 4)
+
+
+def concatenateVideos(ffmpeg, filenames, outputFilename):
+    '''
+    concatenateVideos joins video files with ffmpeg's concat demuxer. The streams
+    are copied, not re-encoded, so the join is lossless and fast. An IOError is
+    raised if ffmpeg fails.
+    '''
+    listFilename = outputFilename + '.segments.txt'
+    with open(listFilename, 'w') as listFile:
+        for filename in filenames:
+            listFile.write("file '" + filename.replace("'", "'\\''") + "'\n")
+
+    try:
+        result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat',
+                '-safe', '0', '-i', listFilename, '-c', 'copy', outputFilename],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finally:
+        os.remove(listFilename)
+
+    if result.returncode != 0:
+        raise IOError('Unable to join the video segments: ' +
+                result.stderr.decode(errors='replace').strip())
+
+
+def findFFmpeg(path=None):
+    '''
+    findFFmpeg returns the path to the ffmpeg executable or None if it can't be found
+    '''
+    if path and os.path.isfile(path):
+        return path
+
+    return shutil.which('ffmpeg')
+
+
+class VideoExporter(QThread):
+    '''
+    VideoExporter writes an ExportJob to a video file in a background thread. The
+    frames are rendered by a FrameRenderer so the export doesn't touch the viewers
+    and the user can keep browsing while it runs.
+
+    If ffmpeg is available, exports longer than CHECKPOINT_FRAMES are split into
+    contiguous segments of CHECKPOINT_FRAMES frames which are joined into the final
+    video without re-encoding. The segments are written, along with an
+    ExportJournal, to a directory next to the video. If a segmented export is
+    cancelled or interrupted, the directory is kept and exporting the same frames
+    to the same file again only renders the segments that weren't completed.
+
+    ffmpeg is an external program, not a Python package, and is not installed with
+    the browser. Pass the path returned by findFFmpeg as the ffmpeg argument. If
+    ffmpeg is None, getSegmentCount returns 1 and every export is written as a
+    single video in this thread so it isn't encoded in parallel and can't be
+    resumed.
+
+    Encoding a single video stream only uses one core so the segments are rendered
+    and encoded in up to nProcesses separate processes. The export processes read
+    the image files directly since the disk cache can't be shared between
+    processes. When only one process would be used, the segments are written in
+    this thread, one after the other, using the disk cache.
+
+    The progress signal is emitted with the percent complete and the utilization
+    signal is emitted about twice a second with a dict, keyed by stage, of the
+    fraction of the time each pipeline stage is busy. When the export is split, the
+    utilization is the average of the segments. The exportDone signal is emitted
+    with a flag that is True if the export completed and a message describing the
+    result.
+    '''
+
+    #  define PyQt Signals
+    progress = pyqtSignal(int)
+    utilization = pyqtSignal(object)
+    exportDone = pyqtSignal(bool, str)
+
+    def __init__(self, job, cache=None, nProcesses=1, ffmpeg=None, parent=None):
+        super(VideoExporter, self).__init__(parent)
+
+        self.job = job
+        self.cache = cache
+        self.nProcesses = max(1, int(nProcesses))
+        self.ffmpeg = ffmpeg
+        self.abort = False
+        self.nExported = 0
+        self.lastProgress = -1
+        self.lastUtilization = 0.
+        self.segmentUtilization = {}
+        self.nResumed = 0
+        self.nSaved = 0
+
+
+    def stop(self):
+        '''
+        stop tells the exporter to stop after the current frame
+        '''
+        self.abort = True
+
+
+    def isAborted(self):
+        return self.abort
+
+
+    def framesDone(self, nFrames=1, utilization=None, segment=0):
+        '''
+        framesDone updates the exported frame count and emits the progress signal
+        when the percent complete changes. The utilization signal is emitted at
+        most twice a second.
+        '''
+        self.nExported += nFrames
+        progress = int(self.nExported * 100 / max(len(self.job.numbers), 1))
+        if progress != self.lastProgress:
+            self.progress.emit(progress)
+            self.lastProgress = progress
+
+        if utilization is not None:
+            self.segmentUtilization[segment] = utilization
+            now = time.perf_counter()
+            if now - self.lastUtilization > 0.5:
+                self.lastUtilization = now
+                nSegments = len(self.segmentUtilization)
+                self.utilization.emit({stage:sum([u[stage] for u in
+                        self.segmentUtilization.values()]) / nSegments for stage in STAGES})
+
+
+    def getSegmentCount(self):
+        '''
+        getSegmentCount returns the number of segments the export is split into. One
+        means the export isn't split.
+        '''
+        if self.ffmpeg is None:
+            return 1
+
+        return max(1, -(-len(self.job.numbers) // CHECKPOINT_FRAMES))
+
+
+    def run(self):
+
+        self.nExported = 0
+        self.lastProgress = -1
+        self.lastUtilization = 0.
+        self.segmentUtilization = {}
+        self.nResumed = 0
+        self.nSaved = 0
+        startTime = time.perf_counter()
+        try:
+            if self.getSegmentCount() > 1:
+                nExported, bytesWritten = self.writeSegmented()
+            else:
+                nExported, bytesWritten = writeJob(self.job, cache=self.cache,
+                        frameDone=lambda utilization: self.framesDone(1, utilization),
+                        isAborted=self.isAborted)
+        except Exception as e:
+            self.exportDone.emit(False, str(e))
+            return
+
+        elapsed = max(time.perf_counter() - startTime, 1e-6)
+        message = ('Exported %d frames at %.1f fps - %.1f MB written per frame' %
+                (nExported, nExported / elapsed, bytesWritten / max(nExported, 1) / 1048576.))
+        if self.nResumed > 0:
+            message += ' (resumed after %d frames)' % self.nResumed
+        if self.abort:
+            message = 'Export cancelled. ' + message
+            if self.nSaved > 0:
+                message += ('. %d frames were saved and the export will resume if it ' +
+                        'is exported to the same file again.') % self.nSaved
+            self.exportDone.emit(False, message)
+        else:
+            self.exportDone.emit(True, message)
+
+
+    def writeSegmented(self):
+        '''
+        writeSegmented renders the job's segments and joins them. Segments completed
+        by an earlier run of the same export are reused.
+        The segment directory is removed once the video is joined and kept if the
+        export is cancelled or fails so it can be resumed.
+        '''
+        segmentDir = getSegmentDir(self.job.filename)
+        os.makedirs(segmentDir, exist_ok=True)
+        segments = self.job.split(segmentDir)
+
+        #  find the segments we've already written
+        journal = ExportJournal(segmentDir, self.job.signature())
+        journal.load()
+        pending = [i for i, segment in enumerate(segments) if not journal.isComplete(segment)]
+        self.nResumed = sum([len(segment.numbers) for segment in segments]) - sum(
+                [len(segments[i].numbers) for i in pending])
+        self.nSaved = self.nResumed
+        if self.nResumed > 0:
+            self.framesDone(self.nResumed)
+        else:
+            #  start a new journal, discarding any left by a different export
+            journal.segments = {}
+            journal.save()
+
+        nExported = 0
+        bytesWritten = 0
+        if pending and min(self.nProcesses, len(pending)) == 1:
+            #  write the segments in this thread so the disk cache is used
+            for i in pending:
+                if self.abort:
+                    break
+                result = writeJob(segments[i], cache=self.cache,
+                        frameDone=lambda utilization: self.framesDone(1, utilization, i),
+                        isAborted=self.isAborted)
+                nExported += result[0]
+                bytesWritten += result[1]
+                self.segmentUtilization.pop(i, None)
+                if result[0] == len(segments[i].numbers):
+                    journal.addSegment(segments[i])
+                    self.nSaved += result[0]
+        elif pending:
+            #  we use spawned processes so the workers don't inherit the Qt state
+            context = multiprocessing.get_context('spawn')
+            with context.Manager() as manager:
+                progressQueue = manager.Queue()
+                abortEvent = manager.Event()
+                with concurrent.futures.ProcessPoolExecutor(max_workers=min(self.nProcesses,
+                        len(pending)), mp_context=context) as pool:
+                    futures = {pool.submit(writeSegment, segments[i], i, progressQueue,
+                            abortEvent):i for i in pending}
+
+                    #  report progress and record the segments as they are finished
+                    running = list(futures)
+                    try:
+                        while running:
+                            done, running = concurrent.futures.wait(running, timeout=0.2)
+                            if self.abort:
+                                abortEvent.set()
+                            while not progressQueue.empty():
+                                segment, nFrames, utilization = progressQueue.get()
+                                self.framesDone(nFrames, utilization, segment)
+                            for future in done:
+                                i = futures[future]
+                                result = future.result()
+                                nExported += result[0]
+                                bytesWritten += result[1]
+                                self.segmentUtilization.pop(i, None)
+                                if result[0] == len(segments[i].numbers):
+                                    journal.addSegment(segments[i])
+                                    self.nSaved += result[0]
+                    except:
+                        #  stop the other segments - the finished ones are journaled
+                        abortEvent.set()
+                        raise
+
+        if not self.abort:
+            concatenateVideos(self.ffmpeg, [segment.filename for segment in segments],
+                    self.job.filename)
+            shutil.rmtree(segmentDir, ignore_errors=True)
+        elif self.nSaved == 0:
+            #  nothing to resume from
+            shutil.rmtree(segmentDir, ignore_errors=True)
+
+        return [nExported, bytesWritten]